@@ -14,10 +14,16 @@ FOR (t:Tag) REQUIRE t.name IS UNIQUE;
 CREATE CONSTRAINT link_imdbId_unique IF NOT EXISTS
 FOR (l:Link) REQUIRE l.imdbId IS UNIQUE;
 
+// Id counters (engine/new_user_recommendation.py allocate_user_ids)
+CREATE CONSTRAINT counter_name_unique IF NOT EXISTS
+FOR (c:Counter) REQUIRE c.name IS UNIQUE;
+
 
 // Indexes
-CREATE INDEX FOR (u:User) ON (u.userId);
-CREATE INDEX FOR (m:Movie) ON (m.movieId);
-CREATE INDEX FOR (g:Genre) ON (g.name);
-CREATE INDEX FOR (t:Tag) ON (t.tag);
-CREATE INDEX FOR (l:Link) ON (l.movieId);
\ No newline at end of file
+// User.userId, Movie.movieId and Genre.name are already backed by the
+// uniqueness constraints above.
+CREATE INDEX tag_tag_index IF NOT EXISTS FOR (t:Tag) ON (t.tag);
+CREATE INDEX link_movie_id_index IF NOT EXISTS FOR (l:Link) ON (l.movieId);
+
+// Context recommendations expand candidates from the user's tags
+CREATE INDEX tagged_tag_index IF NOT EXISTS FOR ()-[t:TAGGED]-() ON (t.tag);
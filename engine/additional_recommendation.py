@@ -1,39 +1,137 @@
-def recommend_by_movie_ids(tx, movie_ids, limit=10):
-    """Recommend movies based on a list of movieIds using collaborative filtering."""
+from engine.collaborative_recommendations import budget_params
+from engine.content_index import content_candidates
+from engine.item_similarity import recommend_from_index
+from engine.instrumentation import run_query
+
+# Ranked on scalars only; MOVIE_IDS_EXPLANATION_QUERY builds paths for the top-N
+MOVIE_IDS_QUERY = """
+MATCH (m:Movie)
+WHERE m.movieId IN $movie_ids
+MATCH (m)<-[:RATED]-(u:User)-[r:RATED]->(rec:Movie)
+WHERE NOT rec.movieId IN $movie_ids
+WITH rec, AVG(toFloat(r.rating)) AS avg_rating, COUNT(DISTINCT u) AS common_count
+RETURN rec.movieId AS movieId, rec.title AS title, avg_rating, common_count,
+       avg_rating * log10(common_count + 1) AS score
+ORDER BY score DESC
+LIMIT $limit
+"""
+
+# Budgeted form: at most $max_coraters_per_movie raters of each seed, sampled
+# in (userId * 2654435761) % 2^32 order, then the $max_neighbors users who
+# rated the most seeds
+BOUNDED_MOVIE_IDS_QUERY = """
+MATCH (m:Movie)
+WHERE m.movieId IN $movie_ids
+CALL {
+    WITH m
+    MATCH (m)<-[:RATED]-(u:User)
+    RETURN u
+    ORDER BY (u.userId * 2654435761) % 4294967296
+    LIMIT $max_coraters_per_movie
+}
+WITH u, COUNT(*) AS shared
+ORDER BY shared DESC, (u.userId * 2654435761) % 4294967296
+LIMIT $max_neighbors
+MATCH (u)-[r:RATED]->(rec:Movie)
+WHERE NOT rec.movieId IN $movie_ids
+// AVG(toFloat(r.rating)) over the seed paths: each rating counts once per
+// sampled seed its rater shares
+WITH rec, SUM(shared * toFloat(r.rating)) / SUM(shared) AS avg_rating, COUNT(u) AS common_count
+RETURN rec.movieId AS movieId, rec.title AS title, avg_rating, common_count,
+       avg_rating * log10(common_count + 1) AS score
+ORDER BY score DESC
+LIMIT $limit
+"""
+
+# Up to three (userId, seed title, rating of the candidate) tuples per candidate
+MOVIE_IDS_EXPLANATION_QUERY = """
+UNWIND $candidate_ids AS movieId
+MATCH (rec:Movie {movieId: movieId})
+CALL {
+    WITH rec
+    MATCH (m:Movie)<-[:RATED]-(u:User)-[r:RATED]->(rec)
+    WHERE m.movieId IN $movie_ids
+    RETURN [u.userId, m.title, r.rating] AS path
+    LIMIT 3
+}
+RETURN movieId, COLLECT(path) AS paths
+"""
+
+MOVIE_AVG_RATINGS_QUERY = """
+UNWIND $movie_ids AS movieId
+MATCH (m:Movie {movieId: movieId})
+RETURN movieId, COALESCE(m.avgRating, 0.0) AS avg_rating
+"""
+
+def recommend_by_content(tx, content_index, movie_ids, limit=10):
+    """Recommend the movies whose genres and tags are closest (TF-IDF cosine) to the seeds.
+
+    Records are shaped like recommend_by_movie_ids; score is the similarity
+    and common_count the number of genres and tags shared with the seeds.
+    """
+    candidates = content_candidates(content_index, movie_ids, limit)
+    if not candidates:
+        print(f"No recommendations found for movieIds {movie_ids}")
+        return []
+    avg_ratings = {record["movieId"]: record["avg_rating"] for record in run_query(
+        tx, 'movie_avg_ratings', MOVIE_AVG_RATINGS_QUERY, movie_ids=[c["movieId"] for c in candidates])}
+    records = []
+    for candidate in candidates:
+        genres, tags = candidate["overlappingGenres"], candidate["overlappingTags"]
+        path_descriptions = []
+        if genres:
+            path_descriptions.append(f"Shares genres {', '.join(genres)} with the selected movies")
+        if tags:
+            path_descriptions.append(f"Shares tags {', '.join(tags)} with the selected movies")
+        records.append({
+            "movieId": candidate["movieId"],
+            "title": candidate["title"],
+            "avg_rating": avg_ratings.get(candidate["movieId"], 0.0),
+            "common_count": len(genres) + len(tags),
+            "score": candidate["similarity"],
+            "path_descriptions": path_descriptions,
+        })
+    return records
+
+def format_movie_id_records(records, explanations=()):
+    """Turn movie-id query records into recommendations with path descriptions."""
+    paths_by_movie = {record["movieId"]: record["paths"] for record in explanations}
+    recommendations = []
+    for record in records:
+        record_data = record.data()
+        record_data["path_descriptions"] = [
+            f"User {user_id} rated '{shared_movie}' and gave '{record['title']}' a {rating}/5"
+            for user_id, shared_movie, rating in paths_by_movie.get(record["movieId"], [])
+        ]
+        recommendations.append(record_data)
+    return recommendations
+
+def recommend_by_movie_ids(tx, movie_ids, limit=10, index=None, explain=True, content_index=None,
+                           max_neighbors=None, max_coraters_per_movie=None):
+    """Recommend movies based on a list of movieIds using collaborative filtering.
+
+    When a precomputed SimilarityIndex is given, its neighbor lists are merged
+    instead of running the live co-rating query; with a ContentIndex movies are
+    ranked by genre/tag similarity instead. With explain=False the live path
+    leaves path_descriptions empty. Setting `max_neighbors` or
+    `max_coraters_per_movie` runs BOUNDED_MOVIE_IDS_QUERY.
+    """
+    if index is not None:
+        return recommend_from_index(index, movie_ids, limit)
+    if content_index is not None:
+        return recommend_by_content(tx, content_index, movie_ids, limit)
     print('Executing query ...')
     try:
-        result = tx.run(
-            """
-            MATCH (m:Movie)
-            WHERE m.movieId IN $movie_ids
-            MATCH path = (m)<-[:RATED]-(u:User)-[r:RATED]->(rec:Movie)
-            WHERE NOT rec.movieId IN $movie_ids
-            WITH rec, AVG(toFloat(r.rating)) AS avg_rating, COUNT(DISTINCT u) AS common_count, 
-                 AVG(toFloat(r.rating)) * log10(COUNT(DISTINCT u) + 1) AS score, 
-                 COLLECT(DISTINCT path)[0..3] AS paths
-            RETURN rec.movieId AS movieId, rec.title AS title, avg_rating, common_count, score, 
-                   paths
-            ORDER BY score DESC
-            LIMIT $limit
-            """,
-            movie_ids=movie_ids,
-            limit=limit
-        )
-        records = []
-
-        for record in result:
-            path_descriptions = []
-            for path in record["paths"]:
-                nodes = path.nodes
-                user_id = nodes[1]["userId"]
-                shared_movie = nodes[0]["title"]
-                rating = path.relationships[1]["rating"]
-                path_desc = f"User {user_id} rated '{shared_movie}' and gave '{record['title']}' a {rating}/5"
-                path_descriptions.append(path_desc)
-
-            record_data = record.data()
-            record_data["path_descriptions"] = path_descriptions
-            records.append(record_data)
+        if max_neighbors is None and max_coraters_per_movie is None:
+            result = run_query(tx, 'movie_ids', MOVIE_IDS_QUERY, movie_ids=movie_ids, limit=limit)
+        else:
+            result = run_query(tx, 'movie_ids_bounded', BOUNDED_MOVIE_IDS_QUERY, movie_ids=movie_ids, limit=limit,
+                               **budget_params(max_neighbors, max_coraters_per_movie))
+        explanations = []
+        if explain and result:
+            explanations = run_query(tx, 'movie_ids_explain', MOVIE_IDS_EXPLANATION_QUERY, movie_ids=movie_ids,
+                                     candidate_ids=[record["movieId"] for record in result])
+        records = format_movie_id_records(result, explanations)
 
         if not records:
             print(f"No recommendations found for movieIds {movie_ids}")
@@ -0,0 +1,212 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from engine.instrumentation import run_query
+
+MODEL_DIR = './data/index/als'
+ARRAYS = ['user_ids', 'movie_ids', 'user_factors', 'item_factors', 'avg_ratings']
+# A like carries no rating, so it is folded in as a top rating
+LIKE_RATING = 5.0
+
+SEEN_MOVIES_QUERY = """
+MATCH (u:User {userId: $userId})
+RETURN [(u)-[r:RATED]->(m:Movie) | [m.movieId, toFloat(r.rating)]] AS rated,
+       [(u)-[:LIKES]->(m:Movie) | m.movieId] AS liked
+"""
+
+
+def _solve_rows(fixed, ratings, reg, implicit, alpha):
+    """One ALS half-step: solve every row of `ratings` (CSR) against the `fixed` factors.
+
+    Explicit: weighted-lambda regularized least squares on the observed ratings.
+    Implicit: confidence 1 + alpha * rating on a binary preference, using the
+    precomputed Gram matrix so each row only touches its observed entries.
+    """
+    factors = fixed.shape[1]
+    solved = np.zeros((ratings.shape[0], factors), dtype=np.float32)
+    eye = np.eye(factors, dtype=np.float32)
+    gram = fixed.T @ fixed if implicit else None
+    for row in range(ratings.shape[0]):
+        start, end = ratings.indptr[row], ratings.indptr[row + 1]
+        if start == end:
+            continue
+        solved[row] = _solve_one(fixed, gram, eye, ratings.indices[start:end], ratings.data[start:end],
+                                 reg, implicit, alpha)
+    return solved
+
+
+def _solve_one(fixed, gram, eye, columns, values, reg, implicit, alpha):
+    observed = fixed[columns]
+    if implicit:
+        confidence = 1.0 + alpha * values
+        a = gram + (observed.T * (confidence - 1.0)) @ observed + reg * eye
+        b = observed.T @ confidence
+    else:
+        a = observed.T @ observed + reg * len(columns) * eye
+        b = observed.T @ values
+    return np.linalg.solve(a, b)
+
+
+class ALSModel:
+    """User and movie factor matrices stored as .npy files and memory-mapped on load."""
+
+    def __init__(self, user_ids, movie_ids, user_factors, item_factors, avg_ratings, titles, meta):
+        self.user_ids = user_ids
+        self.movie_ids = movie_ids
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.avg_ratings = avg_ratings
+        self.titles = titles
+        self.meta = meta
+        # Reused by every implicit fold-in
+        self._gram = None
+
+    @classmethod
+    def train(cls, matrix, factors=64, iterations=15, reg=0.1, implicit=False, alpha=40.0, seed=42):
+        """Alternate user and movie solves over a SparseRatingMatrix."""
+        rng = np.random.default_rng(seed)
+        item_factors = rng.normal(0, 0.1, (len(matrix.movie_ids), factors)).astype(np.float32)
+        user_factors = np.zeros((len(matrix.user_ids), factors), dtype=np.float32)
+        ratings, ratings_t = matrix.ratings.astype(np.float32), matrix.ratings_t.astype(np.float32)
+        for iteration in range(1, iterations + 1):
+            user_factors = _solve_rows(item_factors, ratings, reg, implicit, alpha)
+            item_factors = _solve_rows(user_factors, ratings_t, reg, implicit, alpha)
+            if not implicit:
+                print(f"Iteration {iteration}: train RMSE {rmse(user_factors, item_factors, ratings):.4f}")
+            else:
+                print(f"Iteration {iteration} done.")
+        meta = {'factors': factors, 'iterations': iterations, 'reg': reg, 'implicit': implicit,
+                'alpha': alpha, 'trained_at': int(time.time())}
+        return cls(matrix.user_ids.astype(np.int32), matrix.movie_ids.astype(np.int32), user_factors, item_factors,
+                   matrix.avg_ratings, {int(m): t for m, t in matrix.titles.items()}, meta)
+
+    @classmethod
+    def load(cls, model_dir=MODEL_DIR, mmap=True):
+        arrays = {name: np.load(os.path.join(model_dir, f'{name}.npy'), mmap_mode='r' if mmap else None)
+                  for name in ARRAYS}
+        with open(os.path.join(model_dir, 'titles.json')) as f:
+            titles = {int(m): t for m, t in json.load(f).items()}
+        with open(os.path.join(model_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        return cls(titles=titles, meta=meta, **arrays)
+
+    def save(self, model_dir=MODEL_DIR):
+        """Write every file through a temp name so readers never see a partial model."""
+        os.makedirs(model_dir, exist_ok=True)
+        for name in ARRAYS:
+            path = os.path.join(model_dir, f'{name}.npy')
+            np.save(path + '.tmp.npy', np.asarray(getattr(self, name)))
+            os.replace(path + '.tmp.npy', path)
+        for name, data in [('titles', self.titles), ('meta', self.meta)]:
+            path = os.path.join(model_dir, f'{name}.json')
+            with open(path + '.tmp', 'w') as f:
+                json.dump(data, f)
+            os.replace(path + '.tmp', path)
+
+    def user_vector(self, userId):
+        """Trained factors of a user, or None when the user was not in the training data."""
+        position = np.searchsorted(self.user_ids, userId)
+        if position < len(self.user_ids) and self.user_ids[position] == userId:
+            vector = np.asarray(self.user_factors[position])
+            return vector if vector.any() else None
+        return None
+
+    def _known_positions(self, movie_ids):
+        """Factor rows of `movie_ids` and a mask of the movies the model knows."""
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.movie_ids, movie_ids), len(self.movie_ids) - 1)
+        return positions, np.asarray(self.movie_ids)[positions] == movie_ids
+
+    def movie_positions(self, movie_ids):
+        """Map movieIds to factor rows; movies unknown to the model are dropped."""
+        positions, known = self._known_positions(movie_ids)
+        return positions[known]
+
+    def fold_in(self, movie_ids, ratings):
+        """Solve a user vector from (movieId, rating) pairs against the fixed movie factors.
+
+        A single k x k solve, so new users are served without retraining.
+        """
+        positions, known = self._known_positions(movie_ids)
+        if not known.any():
+            return None
+        item_factors = np.asarray(self.item_factors)
+        implicit = self.meta['implicit']
+        if implicit and self._gram is None:
+            self._gram = item_factors.T @ item_factors
+        eye = np.eye(item_factors.shape[1], dtype=np.float32)
+        return _solve_one(item_factors, self._gram, eye, positions[known],
+                          np.asarray(ratings, dtype=np.float32)[known], self.meta['reg'], implicit,
+                          self.meta['alpha'])
+
+
+def rmse(user_factors, item_factors, ratings):
+    """Root mean squared error of the factors on the observed entries of a CSR matrix."""
+    coo = ratings.tocoo()
+    predictions = np.einsum('ij,ij->i', user_factors[coo.row], item_factors[coo.col])
+    return float(np.sqrt(np.mean((predictions - coo.data) ** 2)))
+
+
+def recommend_from_vector(model, vector, seen_movie_ids, limit=10):
+    """Score every movie with one matrix-vector product and keep the top `limit` unseen ones."""
+    item_factors = np.asarray(model.item_factors)
+    scores = item_factors @ vector
+    seen = np.unique(model.movie_positions(seen_movie_ids))
+    scores[seen] = -np.inf
+    limit = min(limit, len(scores) - len(seen))
+    if limit <= 0:
+        return []
+    top = np.argpartition(-scores, limit - 1)[:limit]
+    top = top[np.argsort(-scores[top], kind='stable')]
+
+    # Explain each pick by the seen movie closest to it in the factor space
+    closest = None
+    if len(seen):
+        closest = seen[np.argmax(item_factors[top] @ item_factors[seen].T, axis=1)]
+    records = []
+    for i, position in enumerate(top):
+        movie_id = int(model.movie_ids[position])
+        path_descriptions = []
+        if closest is not None:
+            path_descriptions.append(
+                f"Close to '{model.titles.get(int(model.movie_ids[closest[i]]))}' in the embedding space")
+        records.append({
+            "movieId": movie_id,
+            "title": model.titles.get(movie_id),
+            "avg_rating": float(model.avg_ratings[position]),
+            "score": float(scores[position]),
+            "path_descriptions": path_descriptions,
+        })
+    return records
+
+
+def get_als_recommendations(tx, userId, model, limit=10):
+    """Recommend from ALS factors, masking the movies the user rated or liked.
+
+    Users missing from the trained model (e.g. created with create_new_user)
+    are folded in from their ratings and likes.
+    """
+    print('Executing query ...')
+    try:
+        records = run_query(tx, 'als_seen', SEEN_MOVIES_QUERY, userId=userId)
+        if not records:
+            print(f"No ALS recommendations found for userId {userId}")
+            return []
+        rated, liked = records[0]["rated"], records[0]["liked"]
+        seen = [movie_id for movie_id, _ in rated] + liked
+        vector = model.user_vector(userId)
+        if vector is None:
+            rated_ids = {movie_id for movie_id, _ in rated}
+            pairs = rated + [[movie_id, LIKE_RATING] for movie_id in liked if movie_id not in rated_ids]
+            if pairs:
+                vector = model.fold_in([movie_id for movie_id, _ in pairs], [rating for _, rating in pairs])
+        if vector is None:
+            print(f"No ALS recommendations found for userId {userId}")
+            return []
+        return recommend_from_vector(model, vector, seen, limit)
+    except Exception as e:
+        print(f"ALS recommendation failed for userId {userId}: {e}")
+        return []
@@ -0,0 +1,153 @@
+import re
+
+from neo4j import Record
+
+from engine.cold_start import USER_ACTIVITY_QUERY
+from engine.collaborative_recommendations import (
+    BOUNDED_COLLABORATIVE_QUERY, COLLABORATIVE_QUERY, COLLABORATIVE_EXPLANATION_QUERY, budget_params,
+    format_collaborative_records,
+    format_cold_start_records as format_collaborative_cold_start
+)
+from engine.context_recommendation import (
+    CONTEXT_QUERY, CONTEXT_EXPLANATION_QUERY, format_context_records,
+    format_cold_start_records as format_context_cold_start
+)
+from engine.instrumentation import run_query
+
+CHUNK_SIZE = 100
+
+COLLABORATIVE_COLUMNS = ['movieId', 'title', 'avg_rating', 'common_count', 'score']
+CONTEXT_COLUMNS = ['movieId', 'title', 'overlappingGenres', 'overlappingTags', 'avgRating', 'ratingCount',
+                   'baseScore', 'recencyBoost', 'finalScore']
+COLLABORATIVE_EXPLANATION_COLUMNS = ['movieId', 'paths']
+CONTEXT_EXPLANATION_COLUMNS = ['movieId', 'genre_paths', 'tag_paths', 'candidate_genre_paths', 'tag_rel_paths',
+                               'rating_paths']
+ACTIVITY_COLUMNS = ['ratingCount', 'seen', 'genres']
+
+
+def bind(query, outer_params, **variables):
+    """Replace the `$name` parameters of a single-user query with per-row expressions.
+
+    Only whole parameter names are replaced, and each one must occur at
+    least once. `outer_params` are the wrapper's own parameters; the inner
+    query must not use them, or they would silently mean the whole batch.
+    """
+    for name in outer_params:
+        if re.search(rf'\${name}\b', query):
+            raise ValueError(f"query uses ${name}, which the batch wrapper binds")
+    for name, expression in variables.items():
+        query, count = re.subn(rf'\${name}\b', expression, query)
+        if not count:
+            raise ValueError(f"query does not use ${name}")
+    return query
+
+
+def indent(query):
+    return '\n'.join(f'    {line}' for line in query.strip().splitlines())
+
+
+def per_user(query, columns):
+    """Wrap a single-user query in a CALL subquery run once per entry of $userIds.
+
+    ORDER BY/LIMIT inside the subquery apply per user, so every user gets its
+    own top-N in one round trip.
+    """
+    body = indent(bind(query, ['userIds'], userId='userId'))
+    return f"UNWIND $userIds AS userId\nCALL {{\n    WITH userId\n{body}\n}}\nRETURN userId, {', '.join(columns)}\n"
+
+
+def per_user_explanation(query, columns):
+    """Wrap an explanation query so it runs once per {userId, candidate_ids} entry of $rows."""
+    body = indent(bind(query, ['rows'], userId='row.userId', candidate_ids='row.candidate_ids'))
+    return (f"UNWIND $rows AS row\nCALL {{\n    WITH row\n{body}\n}}\n"
+            f"RETURN row.userId AS userId, {', '.join(columns)}\n")
+
+
+BATCH_COLLABORATIVE_QUERY = per_user(COLLABORATIVE_QUERY, COLLABORATIVE_COLUMNS)
+BATCH_BOUNDED_COLLABORATIVE_QUERY = per_user(BOUNDED_COLLABORATIVE_QUERY, COLLABORATIVE_COLUMNS)
+BATCH_COLLABORATIVE_EXPLANATION_QUERY = per_user_explanation(COLLABORATIVE_EXPLANATION_QUERY,
+                                                             COLLABORATIVE_EXPLANATION_COLUMNS)
+BATCH_CONTEXT_QUERY = per_user(CONTEXT_QUERY, CONTEXT_COLUMNS)
+BATCH_CONTEXT_EXPLANATION_QUERY = per_user_explanation(CONTEXT_EXPLANATION_QUERY, CONTEXT_EXPLANATION_COLUMNS)
+BATCH_ACTIVITY_QUERY = per_user(USER_ACTIVITY_QUERY, ACTIVITY_COLUMNS)
+
+
+def strip_user_id(record):
+    """The record without the batch's userId column, so it formats like a single-user result."""
+    return Record((key, record[key]) for key in record.keys() if key != 'userId')
+
+
+def cold_start_chunk(tx, cold_start, user_ids, limit):
+    """ColdStartTier picks for the users of a chunk below its rating threshold; {userId: picks}."""
+    picks = {}
+    for record in run_query(tx, 'cold_start_activity_batch', BATCH_ACTIVITY_QUERY, userIds=user_ids,
+                            max_ratings=cold_start.max_ratings):
+        if cold_start.is_cold(record):
+            picks[record["userId"]] = cold_start.rank(cold_start.get_rankings(tx), record, limit)
+    return picks
+
+
+def recommend_chunk(tx, name, query, explanation_query, formatter, user_ids, limit, explain, cold_start=None,
+                    cold_formatter=None, params=None):
+    """Rank (and optionally explain) one chunk of users; returns {userId: recommendations}.
+
+    With a ColdStartTier, users below its threshold are served from it and
+    left out of the path queries. `params` are extra parameters of `query`.
+    """
+    cold = cold_start_chunk(tx, cold_start, user_ids, limit) if cold_start is not None else {}
+    user_ids = [user_id for user_id in user_ids if user_id not in cold]
+    by_user = {user_id: [] for user_id in user_ids}
+    for record in run_query(tx, f'{name}_batch', query, userIds=user_ids, limit=limit, **(params or {})):
+        by_user[record["userId"]].append(strip_user_id(record))
+
+    explanations = {user_id: [] for user_id in user_ids}
+    rows = [{"userId": user_id, "candidate_ids": [record["movieId"] for record in records]}
+            for user_id, records in by_user.items() if records]
+    if explain and rows:
+        for record in run_query(tx, f'{name}_batch_explain', explanation_query, rows=rows):
+            explanations[record["userId"]].append(record)
+
+    results = {user_id: cold_formatter(picks) for user_id, picks in cold.items()}
+    results.update((user_id, formatter(records, explanations[user_id])) for user_id, records in by_user.items())
+    return results
+
+
+def iter_recommendations(session, name, query, explanation_query, formatter, user_ids, limit=10,
+                         chunk_size=CHUNK_SIZE, explain=True, cold_start=None, cold_formatter=None, params=None):
+    """Yield (userId, recommendations) for every userId, in order, one read transaction per chunk.
+
+    Only one chunk is held in memory at a time, so callers can write results
+    out while later chunks are still being computed. Users without candidates
+    are yielded with an empty list.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        results = session.execute_read(recommend_chunk, name, query, explanation_query, formatter,
+                                       chunk, limit, explain, cold_start, cold_formatter, params)
+        for user_id in chunk:
+            yield user_id, results[user_id]
+
+
+def iter_collaborative_recommendations(session, user_ids, limit=10, chunk_size=CHUNK_SIZE, explain=True,
+                                       cold_start=None, max_neighbors=None, max_coraters_per_movie=None):
+    """Batch form of get_collaborative_recommendations; see iter_recommendations.
+
+    Setting `max_neighbors` or `max_coraters_per_movie` runs the bounded query per user.
+    """
+    if max_neighbors is None and max_coraters_per_movie is None:
+        name, query, params = 'collaborative', BATCH_COLLABORATIVE_QUERY, None
+    else:
+        name, query = 'collaborative_bounded', BATCH_BOUNDED_COLLABORATIVE_QUERY
+        params = budget_params(max_neighbors, max_coraters_per_movie)
+    return iter_recommendations(session, name, query, BATCH_COLLABORATIVE_EXPLANATION_QUERY,
+                                format_collaborative_records, user_ids, limit, chunk_size, explain, cold_start,
+                                format_collaborative_cold_start, params)
+
+
+def iter_context_recommendations(session, user_ids, limit=10, chunk_size=CHUNK_SIZE, explain=True,
+                                 cold_start=None):
+    """Batch form of get_context_recommendations; see iter_recommendations."""
+    return iter_recommendations(session, 'context', BATCH_CONTEXT_QUERY, BATCH_CONTEXT_EXPLANATION_QUERY,
+                                format_context_records, user_ids, limit, chunk_size, explain, cold_start,
+                                format_context_cold_start)
@@ -0,0 +1,243 @@
+import math
+import os
+import threading
+import time
+from collections import Counter
+
+from engine.instrumentation import async_run_query, run_query
+from engine.movie_stats import POPULARITY_DECAY
+
+# Users with fewer ratings than this are served from the cold-start tier
+COLD_START_MAX_RATINGS = 5
+RANKING_SIZE = 200
+REFRESH_INTERVAL = 3600
+# Ratings a movie needs before its own average outweighs the global mean
+PRIOR_RATINGS = 20
+# Extra weight of a candidate per unit of its genre share in the user's likes
+GENRE_BOOST = 2.0
+
+# Popularity is decayed to `now` from popularityUpdatedAt, as the like
+# queries do when they add to it
+RANKINGS_QUERY = """
+MATCH (m:Movie)
+WHERE COALESCE(m.ratingCount, 0) > 0 OR COALESCE(m.likeCount, 0) > 0
+RETURN m.movieId AS movieId, m.title AS title,
+       COALESCE(m.avgRating, 0.0) AS avgRating,
+       COALESCE(m.ratingCount, 0) AS ratingCount,
+       COALESCE(m.likeCount, 0) AS likeCount,
+       COALESCE(m.popularity, 0.0) * exp(-$decay * ($now - COALESCE(m.popularityUpdatedAt, $now))) AS popularity,
+       [(m)-[:HAS_GENRE]->(g:Genre) | g.name] AS genres
+"""
+
+# Degree check first; the user's movies are only collected below the threshold
+USER_ACTIVITY_QUERY = """
+MATCH (u:User {userId: $userId})
+WITH u, size((u)-[:RATED]->()) AS ratingCount
+RETURN ratingCount,
+       CASE WHEN ratingCount < $max_ratings
+            THEN [(u)-[:RATED]->(m:Movie) | m.movieId] + [(u)-[:LIKES]->(m:Movie) | m.movieId]
+            ELSE [] END AS seen,
+       CASE WHEN ratingCount < $max_ratings
+            THEN [(u)-[:RATED|LIKES]->(:Movie)-[:HAS_GENRE]->(g:Genre) | g.name]
+            ELSE [] END AS genres
+"""
+
+
+class ColdStartRankings:
+    """Global and per-genre movie rankings on a popularity-weighted quality score.
+
+    Quality is the rating average shrunk towards the global mean by
+    PRIOR_RATINGS (a Bayesian average), so a movie with two 5-star ratings
+    does not outrank a classic; it is multiplied by log10(2 + popularity).
+    """
+
+    def __init__(self, movies, refreshed_at, size=RANKING_SIZE):
+        self.movies = movies
+        self.refreshed_at = refreshed_at
+        ranked = sorted(movies.values(), key=lambda movie: movie['score'], reverse=True)
+        self.global_ranking = [movie['movieId'] for movie in ranked[:size]]
+        self.by_genre = {}
+        for movie in ranked:
+            for genre in movie['genres']:
+                ranking = self.by_genre.setdefault(genre, [])
+                if len(ranking) < size:
+                    ranking.append(movie['movieId'])
+
+    @classmethod
+    def load(cls, tx, size=RANKING_SIZE):
+        now = int(time.time())
+        records = run_query(tx, 'cold_start_rankings', RANKINGS_QUERY, now=now, decay=POPULARITY_DECAY)
+        return cls.from_records(records, now, size)
+
+    @classmethod
+    async def load_async(cls, tx, size=RANKING_SIZE):
+        now = int(time.time())
+        records = await async_run_query(tx, 'cold_start_rankings', RANKINGS_QUERY, now=now, decay=POPULARITY_DECAY)
+        return cls.from_records(records, now, size)
+
+    @classmethod
+    def from_records(cls, records, now, size=RANKING_SIZE):
+        """Score RANKINGS_QUERY records and build the rankings."""
+        rated = [record for record in records if record["ratingCount"]]
+        total = sum(record["ratingCount"] for record in rated)
+        global_mean = sum(record["avgRating"] * record["ratingCount"] for record in rated) / total if total else 0.0
+        movies = {}
+        for record in records:
+            movie = record.data()
+            count = movie['ratingCount']
+            movie['quality'] = (PRIOR_RATINGS * global_mean + movie['avgRating'] * count) / (PRIOR_RATINGS + count)
+            movie['score'] = movie['quality'] * math.log10(2 + movie['popularity'])
+            movies[movie['movieId']] = movie
+        return cls(movies, now, size)
+
+
+class ColdStartTier:
+    """Serves users with few ratings from ColdStartRankings held in memory.
+
+    With a `driver`, start() loads the rankings and a daemon thread reloads
+    them through its own read session every `refresh_interval` seconds, so no
+    request waits for RANKINGS_QUERY. Without one (e.g. in a batch job), they
+    are loaded inside the caller's read transaction and reloaded by one caller
+    once stale, while concurrent callers keep using the previous rankings.
+    """
+
+    def __init__(self, max_ratings=COLD_START_MAX_RATINGS, refresh_interval=REFRESH_INTERVAL, size=RANKING_SIZE,
+                 driver=None):
+        self.max_ratings = max_ratings
+        self.refresh_interval = refresh_interval
+        self.size = size
+        self.driver = driver
+        self.rankings = None
+        self.served = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Background refresh ---
+
+    def refresh(self):
+        """Reload the rankings through the tier's own driver."""
+        with self.driver.session() as session:
+            self.rankings = session.execute_read(ColdStartRankings.load, self.size)
+        return self.rankings
+
+    def start(self):
+        """Load the rankings, then keep reloading them on a background thread."""
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name='cold-start-refresh', daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Cold-start rankings refresh failed, keeping the previous ones: {e}")
+
+    def close(self):
+        self._stop.set()
+
+    # --- Serving ---
+
+    def get_rankings(self, tx):
+        rankings = self.rankings
+        if rankings is not None and (self._thread is not None
+                                     or time.time() - rankings.refreshed_at < self.refresh_interval):
+            return rankings
+        if not self._lock.acquire(blocking=rankings is None):
+            return rankings
+        try:
+            if self.rankings is rankings:
+                self.rankings = ColdStartRankings.load(tx, self.size)
+            return self.rankings
+        finally:
+            self._lock.release()
+
+    def recommend(self, tx, userId, limit=10):
+        """Cold-start recommendations for a user below `max_ratings`, else None.
+
+        None means the user is warm (or unknown) and the caller should run its
+        own engine; an empty list means the tier had nothing to offer.
+        """
+        records = run_query(tx, 'cold_start_activity', USER_ACTIVITY_QUERY, userId=userId,
+                            max_ratings=self.max_ratings)
+        if not records or not self.is_cold(records[0]):
+            return None
+        return self.rank(self.get_rankings(tx), records[0], limit)
+
+    async def recommend_async(self, tx, userId, limit=10):
+        """recommend() for the async driver; reads rankings kept current by start()."""
+        records = await async_run_query(tx, 'cold_start_activity', USER_ACTIVITY_QUERY, userId=userId,
+                                        max_ratings=self.max_ratings)
+        if not records or not self.is_cold(records[0]):
+            return None
+        rankings = self.rankings
+        if rankings is None:
+            rankings = self.rankings = await ColdStartRankings.load_async(tx, self.size)
+        return self.rank(rankings, records[0], limit)
+
+    def is_cold(self, activity):
+        """Whether a USER_ACTIVITY_QUERY record is below the rating threshold."""
+        return activity["ratingCount"] < self.max_ratings
+
+    def rank(self, rankings, activity, limit=10):
+        """Picks for a cold user's USER_ACTIVITY_QUERY record; see rank_for_user."""
+        self.served += 1
+        return rank_for_user(rankings, activity["genres"], activity["seen"], limit)
+
+
+def cold_start_from_env(connect=None):
+    """ColdStartTier configured by COLD_START_MAX_RATINGS and COLD_START_REFRESH; None when disabled (0).
+
+    With `connect`, a function returning a sync driver, the tier is started
+    and refreshes its rankings in the background through that driver;
+    otherwise they load in the caller's first read transaction.
+    """
+    max_ratings = int(os.getenv('COLD_START_MAX_RATINGS', str(COLD_START_MAX_RATINGS)))
+    if max_ratings <= 0:
+        return None
+    refresh_interval = int(os.getenv('COLD_START_REFRESH', str(REFRESH_INTERVAL)))
+    if connect is None:
+        return ColdStartTier(max_ratings, refresh_interval=refresh_interval)
+    return ColdStartTier(max_ratings, refresh_interval=refresh_interval, driver=connect()).start()
+
+
+def rank_for_user(rankings, genres, seen, limit=10):
+    """Blend the global ranking with the rankings of the genres the user liked or rated.
+
+    Each candidate's score is boosted by the share of the user's genre
+    mentions it covers. Returns {movieId, title, avgRating, ratingCount,
+    likeCount, score, matchedGenres} dicts.
+    """
+    genre_counts = Counter(genres)
+    total = sum(genre_counts.values())
+    seen = set(seen)
+    candidates = set(rankings.global_ranking)
+    for genre in genre_counts:
+        candidates.update(rankings.by_genre.get(genre, ()))
+
+    scored = []
+    for movie_id in candidates - seen:
+        movie = rankings.movies[movie_id]
+        matched = [genre for genre in movie['genres'] if genre in genre_counts]
+        share = sum(genre_counts[genre] for genre in matched) / total if total else 0.0
+        scored.append((movie['score'] * (1 + GENRE_BOOST * share), movie, matched))
+    scored.sort(key=lambda item: (-item[0], item[1]['movieId']))
+
+    return [{
+        "movieId": movie['movieId'],
+        "title": movie['title'],
+        "avgRating": movie['avgRating'],
+        "ratingCount": movie['ratingCount'],
+        "likeCount": movie['likeCount'],
+        "score": score,
+        "matchedGenres": sorted(matched, key=lambda genre: -genre_counts[genre]),
+    } for score, movie, matched in scored[:limit]]
+
+
+def describe(record):
+    """Path description of a cold-start pick."""
+    if record["matchedGenres"]:
+        return f"Popular and well rated in {', '.join(record['matchedGenres'][:3])}, genres you liked"
+    return f"Popular and well rated overall ({record['ratingCount']} ratings, {record['likeCount']} likes)"
@@ -1,41 +1,143 @@
-def get_collaborative_recommendations(tx, userId, limit=10):
-    """Generate collaborative filtering recommendations with explainable paths."""
+import os
+
+from engine.cold_start import describe
+from engine.instrumentation import run_query
+
+# LIMIT value standing in for an unset budget
+UNBOUNDED = 2 ** 31 - 1
+
+# Candidates are ranked on scalars only; explanation paths are fetched for the
+# top-N afterwards by COLLABORATIVE_EXPLANATION_QUERY.
+COLLABORATIVE_QUERY = """
+MATCH (u1:User {userId: $userId})-[:RATED]->(:Movie)<-[:RATED]-(u2:User)
+WITH u1, u2, COUNT(*) AS shared
+MATCH (u2)-[r:RATED]->(rec:Movie)
+WHERE NOT (u1)-[:RATED]->(rec)
+// AVG(toFloat(r.rating)) over the (u1)-->(m)<--(u2)-[r]->(rec) paths: each
+// co-rater's rating counts once per movie it shares with u1
+WITH rec, SUM(shared * toFloat(r.rating)) / SUM(shared) AS avg_rating, COUNT(u2) AS common_count
+RETURN rec.movieId AS movieId, rec.title AS title, avg_rating, common_count,
+       avg_rating * log10(common_count) AS score
+ORDER BY score DESC
+LIMIT $limit
+"""
+
+# Same ranking under a budget: at most $max_coraters_per_movie co-raters of
+# each of the user's movies, sampled in (userId * 2654435761) % 2^32 order
+# (engine/sparse_collaborative.py sample_key), then the $max_neighbors users
+# sharing the most movies. Bounds the path expansion for heavy users and
+# blockbuster movies.
+BOUNDED_COLLABORATIVE_QUERY = """
+MATCH (u1:User {userId: $userId})-[:RATED]->(m:Movie)
+CALL {
+    WITH u1, m
+    MATCH (m)<-[:RATED]-(u2:User)
+    WHERE u2 <> u1
+    RETURN u2
+    ORDER BY (u2.userId * 2654435761) % 4294967296
+    LIMIT $max_coraters_per_movie
+}
+WITH u1, u2, COUNT(*) AS shared
+ORDER BY shared DESC, (u2.userId * 2654435761) % 4294967296
+LIMIT $max_neighbors
+MATCH (u2)-[r:RATED]->(rec:Movie)
+WHERE NOT (u1)-[:RATED]->(rec)
+WITH rec, SUM(shared * toFloat(r.rating)) / SUM(shared) AS avg_rating, COUNT(u2) AS common_count
+RETURN rec.movieId AS movieId, rec.title AS title, avg_rating, common_count,
+       avg_rating * log10(common_count) AS score
+ORDER BY score DESC
+LIMIT $limit
+"""
+
+# Up to three (neighbor userId, shared movie title, rating of the candidate)
+# tuples for each recommended movie, in one round trip
+COLLABORATIVE_EXPLANATION_QUERY = """
+MATCH (u1:User {userId: $userId})
+UNWIND $candidate_ids AS movieId
+MATCH (rec:Movie {movieId: movieId})
+CALL {
+    WITH u1, rec
+    MATCH (u1)-[:RATED]->(m:Movie)<-[:RATED]-(u2:User)-[r:RATED]->(rec)
+    RETURN [u2.userId, m.title, r.rating] AS path
+    LIMIT 3
+}
+RETURN movieId, COLLECT(path) AS paths
+"""
+
+def budget_params(max_neighbors=None, max_coraters_per_movie=None):
+    """Parameters of the BOUNDED_* queries; an unset bound is UNBOUNDED."""
+    return {"max_neighbors": max_neighbors if max_neighbors is not None else UNBOUNDED,
+            "max_coraters_per_movie": max_coraters_per_movie if max_coraters_per_movie is not None else UNBOUNDED}
+
+def budget_from_env():
+    """max_neighbors / max_coraters_per_movie from MAX_NEIGHBORS and MAX_CORATERS_PER_MOVIE.
+
+    A missing or empty variable leaves that bound unset (None, i.e. unbounded).
+    """
+    def optional_int(name):
+        value = os.getenv(name)
+        return int(value) if value else None
+    return {"max_neighbors": optional_int('MAX_NEIGHBORS'),
+            "max_coraters_per_movie": optional_int('MAX_CORATERS_PER_MOVIE')}
+
+def format_collaborative_records(records, explanations=()):
+    """Turn collaborative query records into recommendations with path descriptions.
+
+    `explanations` are COLLABORATIVE_EXPLANATION_QUERY records; movies without
+    one get no path descriptions.
+    """
+    paths_by_movie = {record["movieId"]: record["paths"] for record in explanations}
+    recommendations = []
+    for record in records:
+        record_data = record.data()
+        record_data["path_descriptions"] = [
+            f"User {user2_id} rated '{shared_movie}' and gave '{record['title']}' a {rating}/5"
+            for user2_id, shared_movie, rating in paths_by_movie.get(record["movieId"], [])
+        ]
+        recommendations.append(record_data)
+    return recommendations
+
+def format_cold_start_records(records):
+    """Shape ColdStartTier picks like collaborative recommendations."""
+    return [{
+        "movieId": record["movieId"],
+        "title": record["title"],
+        "avg_rating": record["avgRating"],
+        "common_count": 0,
+        "score": record["score"],
+        "path_descriptions": [describe(record)],
+    } for record in records]
+
+def get_collaborative_recommendations(tx, userId, limit=10, explain=True, cold_start=None, max_neighbors=None,
+                                      max_coraters_per_movie=None):
+    """Generate collaborative filtering recommendations with explainable paths.
+
+    With explain=False the explanation query is skipped and path_descriptions
+    are left empty. With a ColdStartTier (engine/cold_start.py), users with
+    few ratings are served from its rankings without running the path query.
+    Setting `max_neighbors` or `max_coraters_per_movie` runs
+    BOUNDED_COLLABORATIVE_QUERY; an unset bound is unlimited.
+    """
     print('Executing query ...')
     try:
-        result = tx.run(
-            """
-            MATCH path = (u1:User {userId: $userId})-[:RATED]->(m:Movie)<-[:RATED]-(u2:User)-[r:RATED]->(rec:Movie)
-            WHERE NOT (u1)-[:RATED]->(rec)
-            WITH rec, AVG(toFloat(r.rating)) AS avg_rating, COUNT(DISTINCT u2) AS common_count, 
-                 AVG(toFloat(r.rating)) * log10(COUNT(DISTINCT u2)) AS score, 
-                 COLLECT(DISTINCT path)[0..3] AS paths
-            RETURN rec.movieId AS movieId, rec.title AS title, avg_rating, common_count, score, 
-                   paths
-            ORDER BY score DESC
-            LIMIT $limit
-            """,
-            userId=userId,
-            limit=limit
-        )
-        # print(result)
-        records = []
-        for record in result:
-            path_descriptions = []
-            for path in record["paths"]:
-                nodes = path.nodes
-                relationships = path.relationships
-                user2_id = nodes[2]["userId"]
-                shared_movie = nodes[1]["title"]
-                rating = relationships[2]["rating"]
-                path_desc = f"User {user2_id} rated '{shared_movie}' and gave '{record['title']}' a {rating}/5"
-                path_descriptions.append(path_desc)
-            record_data = record.data()
-            record_data["path_descriptions"] = path_descriptions
-            records.append(record_data)
+        if cold_start is not None:
+            cold = cold_start.recommend(tx, userId, limit)
+            if cold is not None:
+                return format_cold_start_records(cold)
+        if max_neighbors is None and max_coraters_per_movie is None:
+            result = run_query(tx, 'collaborative', COLLABORATIVE_QUERY, userId=userId, limit=limit)
+        else:
+            result = run_query(tx, 'collaborative_bounded', BOUNDED_COLLABORATIVE_QUERY, userId=userId, limit=limit,
+                               **budget_params(max_neighbors, max_coraters_per_movie))
+        explanations = []
+        if explain and result:
+            explanations = run_query(tx, 'collaborative_explain', COLLABORATIVE_EXPLANATION_QUERY,
+                                     userId=userId, candidate_ids=[record["movieId"] for record in result])
+        records = format_collaborative_records(result, explanations)
         if not records:
             print(f"No collaborative recommendations found for userId {userId}")
             return []
         return records
     except Exception as e:
         print(f"Query failed for userId {userId}: {e}")
-        return []
\ No newline at end of file
+        return []
@@ -0,0 +1,196 @@
+import re
+import threading
+import unicodedata
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+MOVIES_FILE = './data/clean/movies_cleaned.csv'
+TAGS_FILE = './data/clean/tags_cleaned.csv'
+GENRE_PREFIX = 'genre:'
+TAG_PREFIX = 'tag:'
+NO_GENRES = '(no genres listed)'
+
+
+def normalize_tag(tag):
+    """Lowercase, NFKC-fold and collapse punctuation/whitespace, so 'Sci-Fi ' and 'sci-fi' match."""
+    tag = unicodedata.normalize('NFKC', str(tag)).lower()
+    tag = re.sub(r"[^\w\s'-]", ' ', tag)
+    return ' '.join(tag.split())
+
+
+# Everything add_tags changes, swapped as one object so a reader never mixes
+# the vocabulary of one version with the matrix of another
+IndexState = namedtuple('IndexState', ['terms', 'term_index', 'presence', 'idf', 'matrix'])
+
+
+def _genre_terms(genres):
+    if not isinstance(genres, str) or genres == NO_GENRES:
+        return []
+    return [GENRE_PREFIX + normalize_tag(genre) for genre in genres.split('|') if genre]
+
+
+class ContentIndex:
+    """TF-IDF matrix over movie genres and normalized tags, rows L2-normalized.
+
+    Term frequencies are binary: a genre or tag either describes a movie or it
+    does not, however many users applied the tag. A profile built from several
+    movies is scored against the whole catalogue with one sparse product, and
+    the dot products are cosine similarities. Readers that make several calls
+    should work on snapshot(), which is unaffected by a concurrent add_tags.
+    """
+
+    def __init__(self, movie_ids, titles, terms, presence):
+        self.movie_ids = movie_ids
+        self.titles = titles
+        self.state = self._weigh(terms, {term: i for i, term in enumerate(terms)}, presence)
+        self._lock = threading.Lock()
+
+    @property
+    def terms(self):
+        return self.state.terms
+
+    @property
+    def matrix(self):
+        return self.state.matrix
+
+    @classmethod
+    def build(cls, movies, tags):
+        """Build from movies (movieId, title, genres) and tags (movieId, tag) DataFrames."""
+        movies = movies.sort_values('movieId')
+        movie_ids = movies['movieId'].to_numpy(dtype=np.int32)
+        pairs = [(movie_id, term) for movie_id, genres in zip(movies['movieId'], movies['genres'])
+                 for term in _genre_terms(genres)]
+        tag_terms = tags['tag'].map(normalize_tag)
+        pairs += [(movie_id, TAG_PREFIX + tag) for movie_id, tag in zip(tags['movieId'], tag_terms) if tag]
+        pairs = pd.DataFrame(pairs, columns=['movieId', 'term']).drop_duplicates()
+
+        rows = np.searchsorted(movie_ids, pairs['movieId'].to_numpy())
+        known = (rows < len(movie_ids)) & (movie_ids[np.minimum(rows, len(movie_ids) - 1)] == pairs['movieId'])
+        codes, terms = pd.factorize(pairs['term'][known], sort=True)
+        presence = sparse.csr_matrix((np.ones(len(codes), dtype=np.float32), (rows[known], codes)),
+                                     shape=(len(movie_ids), len(terms)))
+        return cls(movie_ids, dict(zip(movies['movieId'], movies['title'])), list(terms), presence)
+
+    @classmethod
+    def from_csv(cls, movies_path=MOVIES_FILE, tags_path=TAGS_FILE):
+        movies = pd.read_csv(movies_path, usecols=['movieId', 'title', 'genres'])
+        tags = pd.read_csv(tags_path, usecols=['movieId', 'tag'])
+        return cls.build(movies, tags)
+
+    def _weigh(self, terms, term_index, presence):
+        """An IndexState with smoothed IDF weights and normalized TF-IDF rows computed from `presence`."""
+        document_frequency = np.bincount(presence.indices, minlength=len(terms))
+        idf = np.log((1 + len(self.movie_ids)) / (1 + document_frequency)) + 1
+        weights = (presence @ sparse.diags(idf.astype(np.float32))).tocsr()
+        norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        matrix = (sparse.diags((1.0 / norms).astype(np.float32)) @ weights).tocsr()
+        return IndexState(terms, term_index, presence, idf, matrix)
+
+    def snapshot(self):
+        """A view pinned to the current state; later add_tags calls do not change it."""
+        view = ContentIndex.__new__(ContentIndex)
+        view.movie_ids, view.titles, view.state = self.movie_ids, self.titles, self.state
+        view._lock = self._lock
+        return view
+
+    def add_tags(self, pairs):
+        """Add (movieId, tag) pairs, e.g. newly loaded TAGGED edges, and reweight.
+
+        New tags extend the vocabulary. Tags already on a movie and movies
+        not in the index are skipped; the latter need a rebuild.
+        Returns the number of (movie, tag) entries added.
+        """
+        with self._lock:
+            state = self.state
+            terms, term_index = list(state.terms), dict(state.term_index)
+            rows, columns = [], []
+            positions, known = self._known_positions([movie_id for movie_id, _ in pairs])
+            for (_, tag), position, is_known in zip(pairs, positions, known):
+                tag = normalize_tag(tag)
+                if not is_known or not tag:
+                    continue
+                term = TAG_PREFIX + tag
+                if term not in term_index:
+                    term_index[term] = len(terms)
+                    terms.append(term)
+                rows.append(position)
+                columns.append(term_index[term])
+            if not rows:
+                return 0
+
+            presence = state.presence.copy()
+            presence.resize((len(self.movie_ids), len(terms)))
+            added = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, columns)), shape=presence.shape)
+            presence = presence + added
+            presence.data[:] = 1.0
+            count = presence.nnz - state.presence.nnz
+
+            # One assignment, so readers see the whole old or the whole new state
+            self.state = self._weigh(terms, term_index, presence)
+            return count
+
+    def _known_positions(self, movie_ids):
+        """Rows of `movie_ids` and a mask of the movies the index knows."""
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.movie_ids, movie_ids), len(self.movie_ids) - 1)
+        return positions, self.movie_ids[positions] == movie_ids
+
+    def profile(self, movie_ids, weights=None):
+        """Weighted sum of the movies' rows, L2-normalized; None when no movie is known."""
+        positions, known = self._known_positions(movie_ids)
+        if not known.any():
+            return None
+        weights = np.ones(len(positions), dtype=np.float32) if weights is None else np.asarray(weights, np.float32)
+        vector = sparse.csr_matrix(weights[known]) @ self.state.matrix[positions[known]]
+        norm = np.sqrt(vector.multiply(vector).sum())
+        return vector / norm if norm > 0 else None
+
+    def similarities(self, profile):
+        """Cosine similarity of every movie to a profile, in one sparse product."""
+        return (self.state.matrix @ profile.T).toarray().ravel()
+
+    def shared_terms(self, profile, position, limit=5):
+        """(genres, tags) a movie shares with a profile, strongest first; tags capped at `limit`."""
+        state = self.state
+        contribution = state.matrix[position].multiply(profile).tocoo()
+        order = np.argsort(-contribution.data, kind='stable')
+        shared = [state.terms[column] for column in contribution.col[order]]
+        genres = [term[len(GENRE_PREFIX):] for term in shared if term.startswith(GENRE_PREFIX)]
+        tags = [term[len(TAG_PREFIX):] for term in shared if term.startswith(TAG_PREFIX)][:limit]
+        return genres, tags
+
+
+def content_candidates(index, movie_ids, limit, weights=None, exclude=()):
+    """Top `limit` movies by content similarity to a profile of `movie_ids`.
+
+    Returns {movieId, title, similarity, overlappingGenres, overlappingTags}
+    dicts. The seeds and `exclude` are never returned.
+    """
+    index = index.snapshot()
+    profile = index.profile(movie_ids, weights)
+    if profile is None:
+        return []
+    scores = index.similarities(profile)
+    positions, known = index._known_positions(list(movie_ids) + list(exclude))
+    scores[positions[known]] = -np.inf
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > limit:
+        candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+    candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+    records = []
+    for position in candidates:
+        movie_id = int(index.movie_ids[position])
+        genres, tags = index.shared_terms(profile, position)
+        records.append({
+            "movieId": movie_id,
+            "title": index.titles.get(movie_id),
+            "similarity": float(scores[position]),
+            "overlappingGenres": genres,
+            "overlappingTags": tags,
+        })
+    return records
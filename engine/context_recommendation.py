@@ -1,105 +1,274 @@
-def get_context_recommendations(tx, userId, limit=10):
-    """Recommend movies based on overlapping genres and tags."""
+from engine.cold_start import describe
+from engine.content_index import content_candidates
+from engine.instrumentation import run_query
+
+# With a ContentIndex the candidate pool is the limit times this, by TF-IDF
+# similarity, before the stats rerank
+CONTENT_POOL_FACTOR = 10
+# Weight of the cosine similarity (0-1) in finalScore; plays the part of the
+# 0.4 per genre + 0.2 per tag overlap terms of CONTEXT_QUERY
+CONTENT_WEIGHT = 2.0
+
+# Candidates are generated from the user's genres and tags and ranked on the
+# precomputed Movie stats. Only scalars are returned; explanation tuples for
+# the top-N come from CONTEXT_EXPLANATION_QUERY.
+CONTEXT_QUERY = """
+MATCH (u:User {userId: $userId})-[:RATED]->(m:Movie)
+OPTIONAL MATCH (m)-[:HAS_GENRE]->(g:Genre)
+OPTIONAL MATCH (u)-[t:TAGGED]->(m)
+WITH u, COLLECT(DISTINCT g.name) AS userGenres, COLLECT(DISTINCT t.tag) AS userTags
+// Only movies sharing a genre or a tag with the user can overlap
+CALL {
+    WITH userGenres
+    UNWIND userGenres AS genreName
+    MATCH (:Genre {name: genreName})<-[:HAS_GENRE]-(candidate:Movie)
+    RETURN candidate
+  UNION
+    WITH userTags
+    UNWIND userTags AS tagName
+    MATCH (:User)-[:TAGGED {tag: tagName}]->(candidate:Movie)
+    RETURN candidate
+}
+WITH u, candidate, userGenres, userTags
+WHERE NOT (u)-[:RATED]->(candidate) AND EXISTS((candidate)-[:HAS_GENRE]->(:Genre))
+WITH u, candidate, userGenres, userTags,
+     [(candidate)-[:HAS_GENRE]->(cg:Genre) | cg.name] AS candidateGenres,
+     [(:User)-[tagRel:TAGGED]->(candidate) | tagRel.tag] AS candidateTags
+WITH candidate,
+     [genre IN userGenres WHERE genre IN candidateGenres] AS overlappingGenres,
+     [tag IN userTags WHERE tag IN candidateTags] AS overlappingTags
+WHERE size(overlappingGenres) > 0 OR size(overlappingTags) > 0
+// Rating aggregates are precomputed on the node by engine/movie_stats.py
+WITH candidate, overlappingGenres, overlappingTags,
+     COALESCE(candidate.avgRating, 0.0) AS avgRating,
+     COALESCE(candidate.ratingCount, 0) AS ratingCount,
+     COALESCE(candidate.avgRating * log10(COALESCE(candidate.ratingCount, 0) + 1), 0.0) AS baseScore,
+     COALESCE(candidate.recencyBoost, 0.0) AS recencyBoost
+RETURN candidate.movieId AS movieId,
+       candidate.title AS title,
+       overlappingGenres,
+       overlappingTags,
+       avgRating,
+       ratingCount,
+       baseScore,
+       recencyBoost,
+       (0.6 * baseScore + 0.6 * recencyBoost + 0.4 * size(overlappingGenres) + 0.2 * size(overlappingTags)) AS finalScore
+ORDER BY finalScore DESC
+LIMIT $limit
+"""
+
+# Compact explanation tuples for the recommended movies. The user's own
+# genre/tag paths are the same for every candidate and computed once.
+CONTEXT_EXPLANATION_QUERY = """
+MATCH (u:User {userId: $userId})
+CALL {
+    WITH u
+    MATCH (u)-[:RATED]->(m:Movie)-[:HAS_GENRE]->(g:Genre)
+    RETURN COLLECT([m.title, g.name])[0..3] AS genre_paths
+}
+CALL {
+    WITH u
+    MATCH (u)-[:RATED]->(m:Movie)<-[t:TAGGED]-(u)
+    RETURN COLLECT([m.title, t.tag])[0..3] AS tag_paths
+}
+UNWIND $candidate_ids AS movieId
+MATCH (candidate:Movie {movieId: movieId})
+RETURN movieId, genre_paths, tag_paths,
+       [(candidate)-[:HAS_GENRE]->(cg:Genre) | cg.name][0..3] AS candidate_genre_paths,
+       [(other:User)-[tagRel:TAGGED]->(candidate) | [other.userId, tagRel.tag]][0..3] AS tag_rel_paths,
+       [(other:User)-[r:RATED]->(candidate) | [other.userId, r.rating]][0..3] AS rating_paths
+"""
+
+RATED_MOVIES_QUERY = """
+MATCH (u:User {userId: $userId})-[r:RATED]->(m:Movie)
+RETURN m.movieId AS movieId, toFloat(r.rating) AS rating
+"""
+
+# Reranks ContentIndex candidates on the precomputed Movie stats; same columns
+# and finalScore shape as CONTEXT_QUERY, plus the content similarity
+CONTENT_CONTEXT_QUERY = """
+UNWIND $candidates AS c
+MATCH (candidate:Movie {movieId: c.movieId})
+WITH candidate, c,
+     COALESCE(candidate.avgRating, 0.0) AS avgRating,
+     COALESCE(candidate.ratingCount, 0) AS ratingCount,
+     COALESCE(candidate.avgRating * log10(COALESCE(candidate.ratingCount, 0) + 1), 0.0) AS baseScore,
+     COALESCE(candidate.recencyBoost, 0.0) AS recencyBoost
+RETURN candidate.movieId AS movieId,
+       candidate.title AS title,
+       c.overlappingGenres AS overlappingGenres,
+       c.overlappingTags AS overlappingTags,
+       avgRating,
+       ratingCount,
+       baseScore,
+       recencyBoost,
+       c.similarity AS similarity,
+       (0.6 * baseScore + 0.6 * recencyBoost + $content_weight * c.similarity) AS finalScore
+ORDER BY finalScore DESC
+LIMIT $limit
+"""
+
+# Original full-catalog query, kept for latency comparisons
+# (scripts/compare_context_latency.py). Same scalar columns and finalScore,
+# plus the eagerly collected paths.
+LEGACY_CONTEXT_QUERY = """
+WITH datetime().epochSeconds AS now
+MATCH (u:User {userId: $userId})-[:RATED]->(m:Movie)
+OPTIONAL MATCH genre_path = (m)-[:HAS_GENRE]->(g:Genre)
+OPTIONAL MATCH tag_path = (u)-[t:TAGGED]->(m)
+WITH u, COLLECT(DISTINCT g.name) AS userGenres, COLLECT(DISTINCT t.tag) AS userTags, 
+     COLLECT(DISTINCT genre_path)[0..3] AS genre_paths, 
+     COLLECT(DISTINCT tag_path)[0..3] AS tag_paths, now
+MATCH (candidate:Movie)
+WHERE NOT (u)-[:RATED]->(candidate) AND EXISTS((candidate)-[:HAS_GENRE]->(:Genre))
+OPTIONAL MATCH candidate_genre_path = (candidate)-[:HAS_GENRE]->(cg:Genre)
+OPTIONAL MATCH tag_rel_path = (other:User)-[tagRel:TAGGED]->(candidate)
+WITH u, candidate, 
+     COLLECT(DISTINCT cg.name) AS candidateGenres, 
+     COLLECT(DISTINCT tagRel.tag) AS candidateTags,
+     userGenres, userTags, genre_paths, tag_paths, 
+     COLLECT(DISTINCT candidate_genre_path)[0..3] AS candidate_genre_paths,
+     COLLECT(DISTINCT tag_rel_path)[0..3] AS tag_rel_paths, now
+WITH candidate, 
+     [genre IN userGenres WHERE genre IN candidateGenres] AS overlappingGenres,
+     [tag IN userTags WHERE tag IN candidateTags] AS overlappingTags,
+     genre_paths, tag_paths, candidate_genre_paths, tag_rel_paths, now
+WHERE size(overlappingGenres) > 0 OR size(overlappingTags) > 0
+OPTIONAL MATCH rating_path = (other:User)-[r:RATED]->(candidate)
+WITH candidate, overlappingGenres, overlappingTags,
+     COALESCE(AVG(toFloat(r.rating)), 0.0) AS avgRating,
+     COUNT(r) AS ratingCount,
+     COALESCE(AVG(toFloat(r.rating)) * log10(COUNT(r) + 1), 0.0) AS baseScore,
+     COALESCE(AVG(1000.0 / (now - toInteger(r.timestamp) + 1)), 0.0) AS recencyBoost,
+     genre_paths, tag_paths, candidate_genre_paths, tag_rel_paths,
+     COLLECT(DISTINCT rating_path)[0..3] AS rating_paths
+RETURN candidate.movieId AS movieId,
+       candidate.title AS title,
+       overlappingGenres,
+       overlappingTags,
+       avgRating,
+       ratingCount,
+       baseScore,
+       recencyBoost,
+       genre_paths,
+       tag_paths,
+       candidate_genre_paths,
+       tag_rel_paths,
+       rating_paths,
+       (0.6 * baseScore + 0.6 * recencyBoost + 0.4 * size(overlappingGenres) + 0.2 * size(overlappingTags)) AS finalScore
+ORDER BY finalScore DESC
+LIMIT $limit
+"""
+
+# Path columns returned by LEGACY_CONTEXT_QUERY; dropped from the results
+LEGACY_PATH_COLUMNS = ['genre_paths', 'tag_paths', 'candidate_genre_paths', 'tag_rel_paths', 'rating_paths']
+
+def format_context_records(records, explanations=()):
+    """Turn context query records into recommendations with explanations.
+
+    `explanations` are CONTEXT_EXPLANATION_QUERY records; movies without one
+    get empty path descriptions.
+    """
+    explanations_by_movie = {record["movieId"]: record for record in explanations}
+    recommendations = []
+    for record in records:
+        rec = {key: value for key, value in record.data().items() if key not in LEGACY_PATH_COLUMNS}
+        path_descriptions = {
+            "genre_paths": [],
+            "tag_paths": [],
+            "candidate_genre_paths": [],
+            "tag_rel_paths": [],
+            "rating_paths": []
+        }
+        explanation = explanations_by_movie.get(record["movieId"])
+        if explanation is not None:
+            path_descriptions["genre_paths"] = [
+                f"User rated '{movie_title}' with genre '{genre_name}'"
+                for movie_title, genre_name in explanation["genre_paths"]]
+            path_descriptions["tag_paths"] = [
+                f"User tagged '{movie_title}' with '{tag}'" for movie_title, tag in explanation["tag_paths"]]
+            path_descriptions["candidate_genre_paths"] = [
+                f"Candidate has genre '{genre_name}'" for genre_name in explanation["candidate_genre_paths"]]
+            path_descriptions["tag_rel_paths"] = [
+                f"User {other_user_id} tagged candidate with '{tag}'"
+                for other_user_id, tag in explanation["tag_rel_paths"]]
+            path_descriptions["rating_paths"] = [
+                f"User {other_user_id} rated candidate {rating}/5"
+                for other_user_id, rating in explanation["rating_paths"]]
+        rec["explanations"] = {
+            "matched_genres": rec.get("overlappingGenres", []),
+            "matched_tags": rec.get("overlappingTags", []),
+            "path_descriptions": path_descriptions
+        }
+        recommendations.append(rec)
+
+    return recommendations
+
+def format_cold_start_records(records):
+    """Shape ColdStartTier picks like context recommendations."""
+    recommendations = []
+    for record in records:
+        recommendations.append({
+            "movieId": record["movieId"],
+            "title": record["title"],
+            "overlappingGenres": record["matchedGenres"],
+            "overlappingTags": [],
+            "avgRating": record["avgRating"],
+            "ratingCount": record["ratingCount"],
+            "baseScore": record["score"],
+            "recencyBoost": 0.0,
+            "finalScore": record["score"],
+            "explanations": {
+                "matched_genres": record["matchedGenres"],
+                "matched_tags": [],
+                "path_descriptions": {
+                    "genre_paths": [describe(record)],
+                    "tag_paths": [],
+                    "candidate_genre_paths": [],
+                    "tag_rel_paths": [],
+                    "rating_paths": []
+                }
+            }
+        })
+    return recommendations
+
+def rank_by_content(tx, userId, limit, content_index):
+    """Rank with a ContentIndex: score the catalogue against the user's rating-weighted
+    profile in memory, then rerank the best candidates on the Movie stats."""
+    rated = run_query(tx, 'context_rated', RATED_MOVIES_QUERY, userId=userId)
+    candidates = content_candidates(content_index, [record["movieId"] for record in rated],
+                                    limit * CONTENT_POOL_FACTOR, weights=[record["rating"] for record in rated])
+    if not candidates:
+        return []
+    return run_query(tx, 'context_content', CONTENT_CONTEXT_QUERY, candidates=candidates, limit=limit,
+                     content_weight=CONTENT_WEIGHT)
+
+def get_context_recommendations(tx, userId, limit=10, query=CONTEXT_QUERY, explain=True, content_index=None,
+                                cold_start=None):
+    """Recommend movies based on overlapping genres and tags.
+
+    With explain=False the explanation query is skipped and the path
+    descriptions are left empty. With a ContentIndex (engine/content_index.py)
+    candidates come from TF-IDF similarity instead of exact genre/tag overlap.
+    With a ColdStartTier (engine/cold_start.py), users with few ratings are
+    served from its rankings and the genres of their likes.
+    """
     print('Executing query ...')
     try:
-        result = tx.run(
-            """
-            WITH datetime().epochSeconds AS now
-            MATCH (u:User {userId: $userId})-[:RATED]->(m:Movie)
-            OPTIONAL MATCH genre_path = (m)-[:HAS_GENRE]->(g:Genre)
-            OPTIONAL MATCH tag_path = (u)-[t:TAGGED]->(m)
-            WITH u, COLLECT(DISTINCT g.name) AS userGenres, COLLECT(DISTINCT t.tag) AS userTags, 
-                 COLLECT(DISTINCT genre_path)[0..3] AS genre_paths, 
-                 COLLECT(DISTINCT tag_path)[0..3] AS tag_paths, now
-            MATCH (candidate:Movie)
-            WHERE NOT (u)-[:RATED]->(candidate) AND EXISTS((candidate)-[:HAS_GENRE]->(:Genre))
-            OPTIONAL MATCH candidate_genre_path = (candidate)-[:HAS_GENRE]->(cg:Genre)
-            OPTIONAL MATCH tag_rel_path = (other:User)-[tagRel:TAGGED]->(candidate)
-            WITH u, candidate, 
-                 COLLECT(DISTINCT cg.name) AS candidateGenres, 
-                 COLLECT(DISTINCT tagRel.tag) AS candidateTags,
-                 userGenres, userTags, genre_paths, tag_paths, 
-                 COLLECT(DISTINCT candidate_genre_path)[0..3] AS candidate_genre_paths,
-                 COLLECT(DISTINCT tag_rel_path)[0..3] AS tag_rel_paths, now
-            WITH candidate, 
-                 [genre IN userGenres WHERE genre IN candidateGenres] AS overlappingGenres,
-                 [tag IN userTags WHERE tag IN candidateTags] AS overlappingTags,
-                 genre_paths, tag_paths, candidate_genre_paths, tag_rel_paths, now
-            WHERE size(overlappingGenres) > 0 OR size(overlappingTags) > 0
-            OPTIONAL MATCH rating_path = (other:User)-[r:RATED]->(candidate)
-            WITH candidate, overlappingGenres, overlappingTags,
-                 COALESCE(AVG(toFloat(r.rating)), 0.0) AS avgRating,
-                 COUNT(r) AS ratingCount,
-                 COALESCE(AVG(toFloat(r.rating)) * log10(COUNT(r) + 1), 0.0) AS baseScore,
-                 COALESCE(AVG(1000.0 / (now - toInteger(r.timestamp) + 1)), 0.0) AS recencyBoost,
-                 genre_paths, tag_paths, candidate_genre_paths, tag_rel_paths,
-                 COLLECT(DISTINCT rating_path)[0..3] AS rating_paths
-            RETURN candidate.movieId AS movieId,
-                   candidate.title AS title,
-                   overlappingGenres,
-                   overlappingTags,
-                   avgRating,
-                   ratingCount,
-                   baseScore,
-                   recencyBoost,
-                   genre_paths,
-                   tag_paths,
-                   candidate_genre_paths,
-                   tag_rel_paths,
-                   rating_paths,
-                   (0.6 * baseScore + 0.6 * recencyBoost + 0.4 * size(overlappingGenres) + 0.2 * size(overlappingTags)) AS finalScore
-            ORDER BY finalScore DESC
-            LIMIT $limit
-            """,
-            userId=userId,
-            limit=limit
-        )
-
-        recommendations = []
-        for record in result:
-            rec = record.data()
-            path_descriptions = {
-                "genre_paths": [],
-                "tag_paths": [],
-                "candidate_genre_paths": [],
-                "tag_rel_paths": [],
-                "rating_paths": []
-            }
-            
-            for path in record["genre_paths"]:
-                nodes = path.nodes
-                movie_title = nodes[0]["title"]
-                genre_name = nodes[1]["name"]
-                path_descriptions["genre_paths"].append(f"User rated '{movie_title}' with genre '{genre_name}'")
-
-            for path in record["tag_paths"]:
-                nodes = path.nodes
-                movie_title = nodes[1]["title"]
-                tag = path.relationships[0]["tag"]
-                path_descriptions["tag_paths"].append(f"User tagged '{movie_title}' with '{tag}'")
-
-            for path in record["candidate_genre_paths"]:
-                nodes = path.nodes
-                genre_name = nodes[1]["name"]
-                path_descriptions["candidate_genre_paths"].append(f"Candidate has genre '{genre_name}'")
-
-            for path in record["tag_rel_paths"]:
-                nodes = path.nodes
-                other_user_id = nodes[0]["userId"]
-                tag = path.relationships[0]["tag"]
-                path_descriptions["tag_rel_paths"].append(f"User {other_user_id} tagged candidate with '{tag}'")
-
-            for path in record["rating_paths"]:
-                nodes = path.nodes
-                other_user_id = nodes[0]["userId"]
-                rating = path.relationships[0]["rating"]
-                path_descriptions["rating_paths"].append(f"User {other_user_id} rated candidate {rating}/5")
-            rec["explanations"] = {
-                "matched_genres": rec.get("overlappingGenres", []),
-                "matched_tags": rec.get("overlappingTags", []),
-                "path_descriptions": path_descriptions
-            }
-            recommendations.append(rec)
+        if cold_start is not None:
+            cold = cold_start.recommend(tx, userId, limit)
+            if cold is not None:
+                return format_cold_start_records(cold)
+        if content_index is not None:
+            result = rank_by_content(tx, userId, limit, content_index)
+        else:
+            name = 'context_legacy' if query is LEGACY_CONTEXT_QUERY else 'context'
+            result = run_query(tx, name, query, userId=userId, limit=limit)
+        explanations = []
+        if explain and result:
+            explanations = run_query(tx, 'context_explain', CONTEXT_EXPLANATION_QUERY,
+                                     userId=userId, candidate_ids=[record["movieId"] for record in result])
+        recommendations = format_context_records(result, explanations)
 
         if not recommendations:
             print(f"No hybrid recommendations found for userId {userId}")
@@ -107,4 +276,4 @@ def get_context_recommendations(tx, userId, limit=10):
         return recommendations
     except Exception as e:
         print(f"Contextual recommendation failed for userId {userId}: {e}")
-        return []
\ No newline at end of file
+        return []
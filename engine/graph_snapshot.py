@@ -0,0 +1,283 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from engine.instrumentation import run_query
+
+SNAPSHOT_DIR = './data/snapshots'
+CURRENT_FILE = 'CURRENT'
+
+# Every array is a flat .npy file so readers can memory-map it read-only and
+# share the pages between processes. *_indptr arrays are CSR offsets.
+ARRAYS = [
+    'user_ids', 'movie_ids',
+    # User-major ratings: movie indexes, ratings and timestamps per user
+    'rating_indptr', 'rating_movies', 'rating_values', 'rating_timestamps',
+    # Movie-major copy of the same ratings: user indexes and ratings per movie
+    'rating_t_indptr', 'rating_t_users', 'rating_t_values',
+    # All ones, so the rated/rated_t indicator matrices are mapped rather than allocated
+    'rating_ones',
+    'movie_avg_ratings',
+    # Genre indexes per movie
+    'genre_indptr', 'genre_ids',
+    # Tag applications per movie: user indexes, tag indexes and timestamps
+    'tag_indptr', 'tag_users', 'tag_ids', 'tag_timestamps',
+]
+
+
+def _offsets_dtype(nnz):
+    # int32 offsets when they fit, so scipy can wrap the arrays without converting them
+    return np.int32 if nnz < 2 ** 31 else np.int64
+
+
+def _csr(rows, n_rows, *columns):
+    """Sort `columns` by row, then by the first column, and return (indptr, sorted columns).
+
+    Sorted indexes within each row make the arrays canonical CSR.
+    """
+    order = np.lexsort((columns[0], rows))
+    indptr = np.zeros(n_rows + 1, dtype=_offsets_dtype(len(rows)))
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return (indptr,) + tuple(column[order] for column in columns)
+
+
+def build_arrays(ratings, movies, tags):
+    """Build the snapshot arrays from DataFrames.
+
+    `ratings` has userId, movieId, rating, timestamp; `movies` has movieId,
+    title and genres (a list of names); `tags` has userId, movieId, tag,
+    timestamp. Returns (arrays, titles, genre names, tag names).
+    """
+    ratings = ratings.drop_duplicates(subset=['userId', 'movieId'], keep='last')
+    user_ids = np.union1d(ratings['userId'].unique(), tags['userId'].unique()).astype(np.int32)
+    movie_ids = np.union1d(np.union1d(movies['movieId'].unique(), ratings['movieId'].unique()),
+                           tags['movieId'].unique()).astype(np.int32)
+
+    users = np.searchsorted(user_ids, ratings['userId'].to_numpy()).astype(np.int32)
+    rated_movies = np.searchsorted(movie_ids, ratings['movieId'].to_numpy()).astype(np.int32)
+    values = ratings['rating'].to_numpy(dtype=np.float32)
+    timestamps = ratings['timestamp'].to_numpy(dtype=np.int64)
+    arrays = {'user_ids': user_ids, 'movie_ids': movie_ids}
+    (arrays['rating_indptr'], arrays['rating_movies'], arrays['rating_values'],
+     arrays['rating_timestamps']) = _csr(users, len(user_ids), rated_movies, values, timestamps)
+    arrays['rating_t_indptr'], arrays['rating_t_users'], arrays['rating_t_values'] = _csr(
+        rated_movies, len(movie_ids), users, values)
+    arrays['rating_ones'] = np.ones(len(values), dtype=np.float32)
+    counts = np.bincount(rated_movies, minlength=len(movie_ids))
+    sums = np.bincount(rated_movies, weights=values, minlength=len(movie_ids))
+    arrays['movie_avg_ratings'] = (sums / np.maximum(counts, 1)).astype(np.float32)
+
+    genre_rows = movies[['movieId', 'genres']].explode('genres').dropna()
+    genre_names = sorted(genre_rows['genres'].unique())
+    arrays['genre_indptr'], arrays['genre_ids'] = _csr(
+        np.searchsorted(movie_ids, genre_rows['movieId'].to_numpy()), len(movie_ids),
+        np.searchsorted(genre_names, genre_rows['genres'].to_numpy()).astype(np.int32))
+
+    tag_names = sorted(tags['tag'].astype(str).unique())
+    (arrays['tag_indptr'], arrays['tag_users'], arrays['tag_ids'], arrays['tag_timestamps']) = _csr(
+        np.searchsorted(movie_ids, tags['movieId'].to_numpy()), len(movie_ids),
+        np.searchsorted(user_ids, tags['userId'].to_numpy()).astype(np.int32),
+        np.searchsorted(tag_names, tags['tag'].astype(str).to_numpy()).astype(np.int32),
+        tags['timestamp'].to_numpy(dtype=np.int64))
+
+    titles = {int(m): t for m, t in zip(movies['movieId'], movies['title']) if isinstance(t, str)}
+    return arrays, titles, genre_names, tag_names
+
+
+def frames_from_graph(tx):
+    """Read ratings, movies and tags from Neo4j; use with session.execute_read."""
+    records = run_query(tx, 'snapshot_ratings', """
+        MATCH (u:User)-[r:RATED]->(m:Movie)
+        RETURN u.userId AS userId, m.movieId AS movieId, toFloat(r.rating) AS rating,
+               toInteger(r.timestamp) AS timestamp
+        """)
+    ratings = pd.DataFrame([r.values() for r in records], columns=['userId', 'movieId', 'rating', 'timestamp'])
+    records = run_query(tx, 'snapshot_movies', """
+        MATCH (m:Movie)
+        RETURN m.movieId AS movieId, m.title AS title, [(m)-[:HAS_GENRE]->(g:Genre) | g.name] AS genres
+        """)
+    movies = pd.DataFrame([r.values() for r in records], columns=['movieId', 'title', 'genres'])
+    records = run_query(tx, 'snapshot_tags', """
+        MATCH (u:User)-[t:TAGGED]->(m:Movie)
+        RETURN u.userId AS userId, m.movieId AS movieId, t.tag AS tag, toInteger(t.timestamp) AS timestamp
+        """)
+    tags = pd.DataFrame([r.values() for r in records], columns=['userId', 'movieId', 'tag', 'timestamp'])
+    return ratings, movies, tags
+
+
+def frames_from_csv(data_dir='./data/clean'):
+    """Read the cleaned CSVs into the frames build_arrays() expects."""
+    ratings = pd.read_csv(os.path.join(data_dir, 'ratings_cleaned.csv'),
+                          dtype={'userId': 'int32', 'movieId': 'int32', 'rating': 'float32', 'timestamp': 'int64'})
+    movies = pd.read_csv(os.path.join(data_dir, 'movies_cleaned.csv'))
+    movies['genres'] = movies['genres'].str.strip().str.split(r'\s*\|\s*', regex=True)
+    tags = pd.read_csv(os.path.join(data_dir, 'tags_cleaned.csv'),
+                       dtype={'userId': 'int32', 'movieId': 'int32', 'tag': 'str', 'timestamp': 'int64'})
+    return ratings, movies, tags
+
+
+def current_version(root=SNAPSHOT_DIR):
+    """The version named by root/CURRENT, or None before the first export."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def set_current(root, version):
+    """Point root/CURRENT at `version` with an atomic rename."""
+    path = os.path.join(root, CURRENT_FILE)
+    with open(path + '.tmp', 'w') as f:
+        f.write(version)
+    os.replace(path + '.tmp', path)
+
+
+def write_snapshot(arrays, titles, genre_names, tag_names, root=SNAPSHOT_DIR, meta=None):
+    """Write a new snapshot version and make it current; returns the version name.
+
+    Files go to a temp directory that is renamed into place, so a version
+    directory is always complete before CURRENT can name it.
+    """
+    os.makedirs(root, exist_ok=True)
+    version = time.strftime('%Y%m%d-%H%M%S')
+    suffix = 0
+    while os.path.exists(os.path.join(root, version if not suffix else f'{version}-{suffix}')):
+        suffix += 1
+    version = version if not suffix else f'{version}-{suffix}'
+
+    tmp_dir = os.path.join(root, f'.{version}.tmp')
+    os.makedirs(tmp_dir)
+    for name in ARRAYS:
+        np.save(os.path.join(tmp_dir, f'{name}.npy'), arrays[name])
+    meta = dict(meta or {}, version=version, created_at=int(time.time()),
+                users=len(arrays['user_ids']), movies=len(arrays['movie_ids']),
+                ratings=len(arrays['rating_values']), tags=len(arrays['tag_ids']))
+    for name, data in [('titles', titles), ('genres', genre_names), ('tags', tag_names), ('meta', meta)]:
+        with open(os.path.join(tmp_dir, f'{name}.json'), 'w') as f:
+            json.dump(data, f)
+    os.replace(tmp_dir, os.path.join(root, version))
+    set_current(root, version)
+    return version
+
+
+def prune_snapshots(root=SNAPSHOT_DIR, keep=3):
+    """Delete all but the `keep` newest versions, never the current one.
+
+    Processes still mapping a deleted version keep reading it until they reload.
+    """
+    current = current_version(root)
+    versions = sorted(name for name in os.listdir(root)
+                      if os.path.isdir(os.path.join(root, name)) and not name.startswith('.'))
+    removed = []
+    for version in versions[:-keep] if keep else versions:
+        if version != current:
+            shutil.rmtree(os.path.join(root, version))
+            removed.append(version)
+    return removed
+
+
+class GraphSnapshot:
+    """A read-only, memory-mapped snapshot version."""
+
+    def __init__(self, path, mmap=True):
+        self.path = path
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r' if mmap else None))
+        with open(os.path.join(path, 'titles.json')) as f:
+            self.titles = {int(m): t for m, t in json.load(f).items()}
+        with open(os.path.join(path, 'genres.json')) as f:
+            self.genre_names = json.load(f)
+        with open(os.path.join(path, 'tags.json')) as f:
+            self.tag_names = json.load(f)
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.version = self.meta['version']
+
+    @classmethod
+    def open(cls, root=SNAPSHOT_DIR, version=None, mmap=True):
+        """Open `version`, or the one CURRENT points at."""
+        version = version or current_version(root)
+        if version is None:
+            raise FileNotFoundError(f"No snapshot in {root}")
+        return cls(os.path.join(root, version), mmap)
+
+    def user_index(self, userId):
+        index = np.searchsorted(self.user_ids, userId)
+        if index < len(self.user_ids) and self.user_ids[index] == userId:
+            return int(index)
+        return None
+
+    def movie_index(self, movieId):
+        index = np.searchsorted(self.movie_ids, movieId)
+        if index < len(self.movie_ids) and self.movie_ids[index] == movieId:
+            return int(index)
+        return None
+
+    def user_ratings(self, userId):
+        """(movieIds, ratings, timestamps) of a user."""
+        index = self.user_index(userId)
+        if index is None:
+            return np.array([], dtype=np.int32), np.array([], dtype=np.float32), np.array([], dtype=np.int64)
+        start, end = self.rating_indptr[index], self.rating_indptr[index + 1]
+        return (self.movie_ids[self.rating_movies[start:end]], self.rating_values[start:end],
+                self.rating_timestamps[start:end])
+
+    def movie_ratings(self, movieId):
+        """(userIds, ratings) of a movie."""
+        index = self.movie_index(movieId)
+        if index is None:
+            return np.array([], dtype=np.int32), np.array([], dtype=np.float32)
+        start, end = self.rating_t_indptr[index], self.rating_t_indptr[index + 1]
+        return self.user_ids[self.rating_t_users[start:end]], self.rating_t_values[start:end]
+
+    def movie_genres(self, movieId):
+        index = self.movie_index(movieId)
+        if index is None:
+            return []
+        start, end = self.genre_indptr[index], self.genre_indptr[index + 1]
+        return [self.genre_names[g] for g in self.genre_ids[start:end]]
+
+    def movie_tags(self, movieId):
+        """[(userId, tag, timestamp)] applied to a movie."""
+        index = self.movie_index(movieId)
+        if index is None:
+            return []
+        start, end = self.tag_indptr[index], self.tag_indptr[index + 1]
+        return [(int(self.user_ids[u]), self.tag_names[t], int(ts)) for u, t, ts in
+                zip(self.tag_users[start:end], self.tag_ids[start:end], self.tag_timestamps[start:end])]
+
+
+class SnapshotReader:
+    """Holds the current snapshot of a root directory and switches when CURRENT changes.
+
+    Call maybe_reload() between requests; the old version stays mapped for
+    anyone still holding a reference to it.
+    """
+
+    def __init__(self, root=SNAPSHOT_DIR, on_reload=None):
+        self.root = root
+        self.on_reload = on_reload
+        start = time.perf_counter()
+        self.snapshot = GraphSnapshot.open(root)
+        self.open_seconds = time.perf_counter() - start
+        self._notify()
+
+    def _notify(self):
+        if self.on_reload is not None:
+            self.on_reload(self.snapshot)
+
+    def maybe_reload(self):
+        """Open the version CURRENT names if it changed; returns True on a switch."""
+        version = current_version(self.root)
+        if version is None or version == self.snapshot.version:
+            return False
+        start = time.perf_counter()
+        self.snapshot = GraphSnapshot.open(self.root, version)
+        self.open_seconds = time.perf_counter() - start
+        self._notify()
+        return True
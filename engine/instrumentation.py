@@ -0,0 +1,220 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Upper bounds (seconds) of the query duration histogram buckets
+DURATION_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+SLOW_QUERY_LOG_SIZE = 100
+
+
+def _profile_operators(plan, hits=None):
+    """Sum db hits and rows per operator type over a PROFILE plan tree."""
+    hits = {} if hits is None else hits
+    if not plan:
+        return hits
+    operator = plan.get('operatorType', 'Unknown').split('@')[0]
+    entry = hits.setdefault(operator, {'db_hits': 0, 'rows': 0})
+    entry['db_hits'] += plan.get('dbHits', 0)
+    entry['rows'] += plan.get('rows', 0)
+    for child in plan.get('children', []):
+        _profile_operators(child, hits)
+    return hits
+
+
+class QueryMetrics:
+    """Counters, duration histograms and a slow-query log for named Cypher queries.
+
+    Every query run through run_query()/async_run_query() records its wall
+    time, the server's result_available_after/result_consumed_after and the
+    number of records returned. With `profile=True` queries run under PROFILE
+    and their db hits are accumulated per operator. Queries slower than
+    `slow_query_ms` are kept in a bounded log and, when `slow_query_path` is
+    set, appended to it as JSON lines.
+    """
+
+    def __init__(self, profile=False, slow_query_ms=500.0, slow_query_path=None):
+        self.profile = profile
+        self.slow_query_ms = slow_query_ms
+        self.slow_query_path = slow_query_path
+        self.slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+        self._queries = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Configure from QUERY_PROFILE, SLOW_QUERY_MS and SLOW_QUERY_LOG."""
+        return cls(profile=os.getenv('QUERY_PROFILE', '0') == '1',
+                   slow_query_ms=float(os.getenv('SLOW_QUERY_MS', '500')),
+                   slow_query_path=os.getenv('SLOW_QUERY_LOG'))
+
+    def _entry(self, name):
+        entry = self._queries.get(name)
+        if entry is None:
+            entry = self._queries[name] = {
+                'count': 0,
+                'errors': 0,
+                'records': 0,
+                'wall_seconds': 0.0,
+                'available_after_ms': 0,
+                'consumed_after_ms': 0,
+                'buckets': [0] * len(DURATION_BUCKETS),
+                'operators': {},
+            }
+        return entry
+
+    def record(self, name, seconds, records=0, summary=None, params=None, error=None):
+        available = (summary.result_available_after or 0) if summary is not None else 0
+        consumed = (summary.result_consumed_after or 0) if summary is not None else 0
+        with self._lock:
+            entry = self._entry(name)
+            entry['count'] += 1
+            entry['wall_seconds'] += seconds
+            entry['records'] += records
+            entry['available_after_ms'] += available
+            entry['consumed_after_ms'] += consumed
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    entry['buckets'][i] += 1
+            if error is not None:
+                entry['errors'] += 1
+            if summary is not None and summary.profile:
+                for operator, hits in _profile_operators(summary.profile).items():
+                    total = entry['operators'].setdefault(operator, {'db_hits': 0, 'rows': 0})
+                    total['db_hits'] += hits['db_hits']
+                    total['rows'] += hits['rows']
+
+        if seconds * 1000 >= self.slow_query_ms:
+            self._log_slow_query(name, seconds, records, available, consumed, params, error)
+
+    def _log_slow_query(self, name, seconds, records, available, consumed, params, error):
+        entry = {
+            'at': int(time.time()),
+            'query': name,
+            'wall_ms': round(seconds * 1000, 1),
+            'available_after_ms': available,
+            'consumed_after_ms': consumed,
+            'records': records,
+            # Row lists can be large, so only scalar parameters are kept
+            'params': {k: v for k, v in (params or {}).items() if isinstance(v, (int, float, str, bool))},
+            'error': str(error) if error is not None else None,
+        }
+        self.slow_queries.append(entry)
+        print(f"Slow query '{name}': {entry['wall_ms']} ms ({records} records)")
+        if self.slow_query_path:
+            with self._lock, open(self.slow_query_path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+
+    def snapshot(self):
+        """All counters as a JSON-serializable dict."""
+        with self._lock:
+            queries = {}
+            for name, entry in self._queries.items():
+                count = entry['count']
+                queries[name] = {
+                    'count': count,
+                    'errors': entry['errors'],
+                    'records': entry['records'],
+                    'mean_ms': entry['wall_seconds'] * 1000 / count if count else 0.0,
+                    'mean_available_after_ms': entry['available_after_ms'] / count if count else 0.0,
+                    'mean_consumed_after_ms': entry['consumed_after_ms'] / count if count else 0.0,
+                    'histogram': {str(bound): n for bound, n in zip(DURATION_BUCKETS, entry['buckets'])},
+                    'operators': {op: dict(hits) for op, hits in entry['operators'].items()},
+                }
+            return {'profile': self.profile, 'slow_query_ms': self.slow_query_ms,
+                    'queries': queries, 'slow_queries': list(self.slow_queries)}
+
+    def to_prometheus(self, prefix='recommender_query'):
+        """Render the counters in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {prefix}_duration_seconds Wall time of Cypher queries.",
+            f"# TYPE {prefix}_duration_seconds histogram",
+        ]
+        with self._lock:
+            queries = sorted(self._queries.items())
+            for name, entry in queries:
+                for bound, n in zip(DURATION_BUCKETS, entry['buckets']):
+                    lines.append(f'{prefix}_duration_seconds_bucket{{query="{name}",le="{bound}"}} {n}')
+                lines.append(f'{prefix}_duration_seconds_bucket{{query="{name}",le="+Inf"}} {entry["count"]}')
+                lines.append(f'{prefix}_duration_seconds_sum{{query="{name}"}} {entry["wall_seconds"]}')
+                lines.append(f'{prefix}_duration_seconds_count{{query="{name}"}} {entry["count"]}')
+            counters = [
+                ('errors_total', 'errors', 'Queries that raised.'),
+                ('records_total', 'records', 'Records returned.'),
+                ('server_available_after_ms_total', 'available_after_ms', 'Server time until the first record.'),
+                ('server_consumed_after_ms_total', 'consumed_after_ms', 'Server time to consume the result.'),
+            ]
+            for suffix, key, help_text in counters:
+                lines.append(f"# HELP {prefix}_{suffix} {help_text}")
+                lines.append(f"# TYPE {prefix}_{suffix} counter")
+                for name, entry in queries:
+                    lines.append(f'{prefix}_{suffix}{{query="{name}"}} {entry[key]}')
+            lines.append(f"# HELP {prefix}_db_hits_total Database hits per plan operator (PROFILE mode).")
+            lines.append(f"# TYPE {prefix}_db_hits_total counter")
+            for name, entry in queries:
+                for operator, hits in sorted(entry['operators'].items()):
+                    lines.append(f'{prefix}_db_hits_total{{query="{name}",operator="{operator}"}} {hits["db_hits"]}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._queries.clear()
+            self.slow_queries.clear()
+
+
+# Shared by every engine; configured from the environment
+METRICS = QueryMetrics.from_env()
+
+
+def _statement(query, metrics):
+    return f"PROFILE {query}" if metrics.profile else query
+
+
+def run_query(tx, name, query, metrics=None, **params):
+    """Run `query` in `tx`, record its metrics under `name` and return the records as a list."""
+    metrics = metrics or METRICS
+    start = time.perf_counter()
+    try:
+        result = tx.run(_statement(query, metrics), **params)
+        records = list(result)
+        summary = result.consume()
+    except Exception as e:
+        metrics.record(name, time.perf_counter() - start, params=params, error=e)
+        raise
+    metrics.record(name, time.perf_counter() - start, len(records), summary, params)
+    return records
+
+
+async def async_run_query(tx, name, query, metrics=None, **params):
+    """run_query() for an async transaction."""
+    metrics = metrics or METRICS
+    start = time.perf_counter()
+    try:
+        result = await tx.run(_statement(query, metrics), **params)
+        records = [record async for record in result]
+        summary = await result.consume()
+    except Exception as e:
+        metrics.record(name, time.perf_counter() - start, params=params, error=e)
+        raise
+    metrics.record(name, time.perf_counter() - start, len(records), summary, params)
+    return records
+
+
+def print_query_metrics(snapshot):
+    """Print per-query counters in a formatted way."""
+    if not snapshot['queries']:
+        return
+    print("\nQuery Metrics:")
+    for name, stats in sorted(snapshot['queries'].items()):
+        print(f"  {name}: {stats['count']} runs, {stats['errors']} errors, mean {stats['mean_ms']:.1f} ms "
+              f"(server {stats['mean_available_after_ms']:.1f} + {stats['mean_consumed_after_ms']:.1f} ms), "
+              f"{stats['records']} records")
+        for operator, hits in sorted(stats['operators'].items(), key=lambda item: -item[1]['db_hits'])[:5]:
+            print(f"    {operator}: {hits['db_hits']} db hits, {hits['rows']} rows")
+    if snapshot['slow_queries']:
+        print(f"  Slow queries (>= {snapshot['slow_query_ms']:.0f} ms): {len(snapshot['slow_queries'])}")
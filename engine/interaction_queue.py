@@ -0,0 +1,357 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+
+from engine.instrumentation import run_query
+from engine.movie_stats import POPULARITY_DECAY, apply_ratings
+from engine.new_user_recommendation import ADD_LIKES_QUERY, REMOVE_LIKES_QUERY
+
+WAL_PATH = './data/interactions.wal'
+# Events per WAL segment; a segment is deleted once all of its events are committed
+SEGMENT_SIZE = 5000
+LATENCY_WINDOW = 1000
+MAX_RETRY_DELAY = 30.0
+# Neo4j integers are 64-bit; larger ids would fail every flush
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+# Failures worth retrying; any other error is a bad event and goes to the dead-letter file
+RETRYABLE_ERRORS = (ServiceUnavailable, SessionExpired, TransientError)
+
+
+class QueueFull(Exception):
+    """Raised when an event cannot be queued within the caller's timeout."""
+
+
+def check_id(name, value):
+    """Return `value` if it fits a Neo4j integer, else raise ValueError."""
+    if not INT64_MIN <= value <= INT64_MAX:
+        raise ValueError(f"{name} must be a 64-bit integer")
+    return value
+
+
+def batch_rows(events):
+    """Collapse a batch into (like rows, unlike rows, rating rows).
+
+    The last like/unlike of a (user, movie) pair decides whether the edge
+    exists, so the like and unlike writes never touch the same pair and can
+    run in any order. Ratings keep every event; apply_ratings keeps the latest.
+    """
+    like_state = {}
+    ratings = []
+    for event in events:
+        if event['type'] == 'rate':
+            ratings.append({"userId": event['userId'], "movieId": event['movieId'],
+                            "rating": event['rating'], "timestamp": event['at']})
+        else:
+            like_state[(event['userId'], event['movieId'])] = event
+    likes = [{"userId": e['userId'], "movieId": e['movieId'], "createdAt": e['at']}
+             for e in like_state.values() if e['type'] == 'like']
+    unlikes = [{"userId": e['userId'], "movieId": e['movieId']}
+               for e in like_state.values() if e['type'] == 'unlike']
+    return likes, unlikes, ratings
+
+
+def write_batch(tx, events):
+    """Apply a batch of interaction events in one transaction; returns rows written."""
+    likes, unlikes, ratings = batch_rows(events)
+    now = int(time.time())
+    written = 0
+    if likes:
+        records = run_query(tx, 'add_likes', ADD_LIKES_QUERY, rows=likes, now=now, decay=POPULARITY_DECAY)
+        written += (records[0]["written"] or 0) if records else 0
+    if unlikes:
+        records = run_query(tx, 'remove_likes', REMOVE_LIKES_QUERY, rows=unlikes, now=now, decay=POPULARITY_DECAY)
+        written += (records[0]["written"] or 0) if records else 0
+    if ratings:
+        written += apply_ratings(tx, ratings)
+    return written
+
+
+class InteractionQueue:
+    """Write-behind buffer for like, unlike and rating events.
+
+    Events are appended to a local write-ahead file before they are accepted
+    and written to Neo4j by a background thread in UNWIND batches, once
+    `batch_size` events are pending or the oldest has waited `flush_interval`
+    seconds. At most `max_pending` events are held; submitting beyond that
+    blocks for up to `timeout` seconds and then raises QueueFull. The WAL is
+    split into `<wal_path>.<first seq>` segments of `segment_size` events and
+    the highest committed sequence number is kept next to them; a segment is
+    deleted once the watermark passes its last event, and events past the
+    watermark are replayed on start, so delivery is at-least-once. Replaying is
+    safe: likes are only created when missing, unlikes delete, and
+    apply_ratings leaves the stats unchanged for a rating it already wrote.
+    Connection and transient errors are retried with backoff; a batch failing
+    with any other error is split until the bad events are isolated, and those
+    are appended to `<wal_path>.dead` and skipped so they cannot block the
+    queue. `on_flush` is called with the userIds of every committed batch.
+    """
+
+    def __init__(self, driver, wal_path=WAL_PATH, max_pending=10000, batch_size=500, flush_interval=1.0,
+                 fsync=False, on_flush=None, segment_size=SEGMENT_SIZE):
+        self.driver = driver
+        self.wal_path = wal_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.on_flush = on_flush
+        self.segment_size = segment_size
+        self._capacity = threading.BoundedSemaphore(max_pending)
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._wal_lock = threading.Lock()
+        self._thread = None
+        self._closing = False
+        self._seq = self._committed = self._read_committed()
+        self._wal = None
+        self._wal_events = 0
+        # (path, last seq) of the closed segments, oldest first
+        self._segments = deque()
+        self.submitted = 0
+        self.flushed = 0
+        self.batches = 0
+        self.retries = 0
+        self.replayed = 0
+        self.dead_lettered = 0
+        self.blocked_seconds = 0.0
+        self.max_batch = 0
+        self.flush_latencies = deque(maxlen=LATENCY_WINDOW)
+
+    # --- Write-ahead file ---
+
+    def _committed_path(self):
+        return self.wal_path + '.committed'
+
+    def _read_committed(self):
+        try:
+            with open(self._committed_path()) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _write_committed(self, seq):
+        path = self._committed_path()
+        with open(path + '.tmp', 'w') as f:
+            f.write(str(seq))
+        os.replace(path + '.tmp', path)
+
+    def _dead_letter_path(self):
+        return self.wal_path + '.dead'
+
+    def _segment_path(self, first_seq):
+        return f"{self.wal_path}.{first_seq:012d}"
+
+    def _segment_paths(self):
+        """Existing WAL segments in sequence order, including a pre-segment WAL file."""
+        dirname = os.path.dirname(self.wal_path) or '.'
+        prefix = os.path.basename(self.wal_path) + '.'
+        names = sorted(name for name in os.listdir(dirname)
+                       if name.startswith(prefix) and name[len(prefix):].isdigit())
+        paths = [os.path.join(dirname, name) for name in names]
+        if os.path.exists(self.wal_path):
+            paths.insert(0, self.wal_path)
+        return paths
+
+    def _read_wal(self):
+        """Events in the WAL past the committed sequence; torn lines are skipped."""
+        events = []
+        for path in self._segment_paths():
+            with open(path) as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if event['seq'] > self._committed:
+                        events.append(event)
+        return events
+
+    def _open_segment(self):
+        self._wal = open(self._segment_path(self._seq + 1), 'w')
+        self._wal_events = 0
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Replay uncommitted WAL events, then start the flusher thread."""
+        dirname = os.path.dirname(self.wal_path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        old_segments = self._segment_paths()
+        events = self._read_wal()
+        for start in range(0, len(events), self.batch_size):
+            self._write(events[start:start + self.batch_size])
+        self.replayed = len(events)
+        if events:
+            self._seq = max(self._seq, events[-1]['seq'])
+            print(f"Replayed {len(events)} interaction(s) from {self.wal_path}")
+        # Everything in the old segments is committed now
+        for path in old_segments:
+            os.remove(path)
+        self._open_segment()
+        self._thread = threading.Thread(target=self._run, name='interaction-flusher', daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Flush everything still pending and stop the flusher."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+        if self._wal is not None:
+            self._wal.close()
+
+    # --- Producers ---
+
+    def like(self, user_id, movie_id, timeout=None):
+        self._submit({'type': 'like', 'userId': user_id, 'movieId': movie_id}, timeout)
+
+    def unlike(self, user_id, movie_id, timeout=None):
+        self._submit({'type': 'unlike', 'userId': user_id, 'movieId': movie_id}, timeout)
+
+    def rate(self, user_id, movie_id, rating, timeout=None):
+        self._submit({'type': 'rate', 'userId': user_id, 'movieId': movie_id, 'rating': float(rating)}, timeout)
+
+    def _submit(self, event, timeout):
+        check_id('userId', event['userId'])
+        check_id('movieId', event['movieId'])
+        start = time.perf_counter()
+        if not self._capacity.acquire(timeout=timeout):
+            raise QueueFull(f"{len(self._pending)} interactions pending")
+        self.blocked_seconds += time.perf_counter() - start
+        # Sequence numbers, WAL order and queue order must agree for the committed watermark
+        with self._wal_lock:
+            if self._wal_events >= self.segment_size:
+                self._wal.close()
+                self._segments.append((self._wal.name, self._seq))
+                self._open_segment()
+            self._seq += 1
+            self._wal_events += 1
+            event = dict(event, seq=self._seq, at=int(time.time()))
+            self._wal.write(json.dumps(event) + '\n')
+            self._wal.flush()
+            if self.fsync:
+                os.fsync(self._wal.fileno())
+            with self._cond:
+                self._pending.append(event)
+                self.submitted += 1
+                if len(self._pending) >= self.batch_size:
+                    self._cond.notify()
+
+    # --- Flusher ---
+
+    def _next_batch(self):
+        """Wait for a full batch, the oldest event to age out, or close."""
+        with self._cond:
+            while True:
+                if self._pending and (len(self._pending) >= self.batch_size or self._closing):
+                    break
+                if not self._pending:
+                    if self._closing:
+                        return None
+                    self._cond.wait(self.flush_interval)
+                    continue
+                wait = self._pending[0]['at'] + self.flush_interval - time.time()
+                if wait <= 0:
+                    break
+                self._cond.wait(wait)
+            count = min(self.batch_size, len(self._pending))
+            return [self._pending.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._write(batch)
+            for _ in batch:
+                self._capacity.release()
+
+    def _write(self, batch):
+        """Commit a batch and advance the watermark past it.
+
+        A batch failing with a non-retryable error is written in halves, so
+        only the events that fail on their own are dead-lettered.
+        """
+        start = time.perf_counter()
+        try:
+            self._commit(batch)
+        except Exception as e:
+            if len(batch) > 1:
+                print(f"Interaction flush of {len(batch)} event(s) failed, splitting it: {e}")
+                middle = len(batch) // 2
+                self._write(batch[:middle])
+                self._write(batch[middle:])
+                return
+            self._dead_letter(batch[0], e)
+        else:
+            self.flush_latencies.append((time.perf_counter() - start) * 1000)
+            self.flushed += len(batch)
+            self.batches += 1
+            self.max_batch = max(self.max_batch, len(batch))
+            if self.on_flush is not None:
+                self.on_flush({event['userId'] for event in batch})
+        self._committed = batch[-1]['seq']
+        self._write_committed(self._committed)
+        self._drop_committed_segments()
+
+    def _commit(self, batch):
+        """Run write_batch, retrying connection and transient errors with backoff."""
+        delay = 0.5
+        while True:
+            try:
+                with self.driver.session() as session:
+                    session.execute_write(write_batch, batch)
+                return
+            except RETRYABLE_ERRORS as e:
+                self.retries += 1
+                print(f"Interaction flush of {len(batch)} event(s) failed, retrying in {delay:.1f}s: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+
+    def _dead_letter(self, event, error):
+        """Set aside an event that cannot be written, with the error it raised."""
+        print(f"Interaction {event['seq']} cannot be written, moving it to {self._dead_letter_path()}: {error}")
+        with open(self._dead_letter_path(), 'a') as f:
+            f.write(json.dumps(dict(event, error=str(error))) + '\n')
+        self.dead_lettered += 1
+
+    def _drop_committed_segments(self):
+        """Delete the closed segments whose every event is committed."""
+        with self._wal_lock:
+            while self._segments and self._segments[0][1] <= self._committed:
+                os.remove(self._segments.popleft()[0])
+
+    def stats(self):
+        latencies = sorted(self.flush_latencies)
+        return {
+            "pending": len(self._pending),
+            "submitted": self.submitted,
+            "flushed": self.flushed,
+            "replayed": self.replayed,
+            "batches": self.batches,
+            "mean_batch": self.flushed / self.batches if self.batches else 0.0,
+            "max_batch": self.max_batch,
+            "flush_p50_ms": latencies[len(latencies) // 2] if latencies else 0.0,
+            "flush_p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0,
+            "retries": self.retries,
+            "dead_lettered": self.dead_lettered,
+            "blocked_seconds": self.blocked_seconds,
+            "wal_segments": len(self._segments) + 1,
+        }
+
+
+def print_queue_stats(stats):
+    """Print interaction queue counters in a formatted way."""
+    print("\nInteraction Queue:")
+    print(f"  Submitted: {stats['submitted']}  Flushed: {stats['flushed']}  Pending: {stats['pending']}  "
+          f"Replayed: {stats['replayed']}")
+    print(f"  Batches: {stats['batches']}  Mean Size: {stats['mean_batch']:.1f}  Max Size: {stats['max_batch']}")
+    print(f"  Flush Latency: p50 {stats['flush_p50_ms']:.1f} ms  p99 {stats['flush_p99_ms']:.1f} ms")
+    print(f"  Retries: {stats['retries']}  Dead-lettered: {stats['dead_lettered']}  "
+          f"Producer Wait: {stats['blocked_seconds']:.2f}s")
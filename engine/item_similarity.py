@@ -0,0 +1,187 @@
+import json
+import os
+import time
+
+import numpy as np
+from scipy import sparse
+
+INDEX_DIR = './data/index/similarity'
+BLOCK_SIZE = 1024
+ARRAYS = ['movie_ids', 'neighbors', 'scores', 'counts', 'avg_ratings']
+
+
+def _item_vectors(matrix, similarity):
+    """Movie x user rows, L2-normalized so a dot product is the cosine."""
+    ratings = matrix.ratings.astype(np.float32)
+    if similarity == 'adjusted_cosine':
+        # Center every rating on its user's mean
+        counts = np.diff(ratings.indptr)
+        means = np.asarray(ratings.sum(axis=1)).ravel() / np.maximum(counts, 1)
+        ratings = ratings.copy()
+        ratings.data -= np.repeat(means, counts).astype(np.float32)
+    elif similarity != 'cosine':
+        raise ValueError(f"Unknown similarity '{similarity}'")
+    vectors = ratings.T.tocsr()
+    norms = np.sqrt(np.asarray(vectors.multiply(vectors).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms).astype(np.float32) @ vectors
+
+
+def _block_similarities(vectors, rated_t, rows, min_common):
+    """Similarity and co-rater counts of `rows` against every movie, self pairs removed."""
+    counts = (rated_t[rows] @ rated_t.T).tocoo()
+    keep = (counts.data >= min_common) & (counts.col != rows[counts.row])
+    counts = sparse.csr_matrix((counts.data[keep], (counts.row[keep], counts.col[keep])), shape=counts.shape)
+    scores = (counts > 0).multiply(vectors[rows] @ vectors.T).tocsr()
+    scores.eliminate_zeros()
+    return scores, counts
+
+
+def _top_k(vectors, rated_t, rows, k, min_common):
+    """Top-k neighbor indices, scores and co-rater counts for the given movie rows."""
+    neighbors = np.full((len(rows), k), -1, dtype=np.int32)
+    scores = np.full((len(rows), k), -np.inf, dtype=np.float32)
+    counts = np.zeros((len(rows), k), dtype=np.int32)
+    for start in range(0, len(rows), BLOCK_SIZE):
+        block_rows = rows[start:start + BLOCK_SIZE]
+        block_scores, block_counts = _block_similarities(vectors, rated_t, block_rows, min_common)
+        for offset in range(len(block_rows)):
+            row_start, row_end = block_scores.indptr[offset], block_scores.indptr[offset + 1]
+            columns = block_scores.indices[row_start:row_end]
+            values = block_scores.data[row_start:row_end]
+            if len(values) == 0:
+                continue
+            top = np.argpartition(-values, min(k, len(values)) - 1)[:k]
+            top = top[np.argsort(-values[top], kind='stable')]
+            i = start + offset
+            neighbors[i, :len(top)] = columns[top]
+            scores[i, :len(top)] = values[top]
+            counts[i, :len(top)] = block_counts[offset, columns[top]].toarray().ravel()
+    return neighbors, scores, counts
+
+
+class SimilarityIndex:
+    """Top-K item-item neighbor table stored as .npy files and memory-mapped on load."""
+
+    def __init__(self, movie_ids, neighbors, scores, counts, avg_ratings, titles, meta):
+        self.movie_ids = movie_ids
+        self.neighbors = neighbors
+        self.scores = scores
+        self.counts = counts
+        self.avg_ratings = avg_ratings
+        self.titles = titles
+        self.meta = meta
+
+    @classmethod
+    def build(cls, matrix, k=50, similarity='cosine', min_common=3):
+        """Compute the neighbor table for every movie in a SparseRatingMatrix."""
+        vectors = _item_vectors(matrix, similarity)
+        rows = np.arange(len(matrix.movie_ids))
+        neighbors, scores, counts = _top_k(vectors, matrix.rated_t, rows, k, min_common)
+        meta = {'k': k, 'similarity': similarity, 'min_common': min_common, 'built_at': int(time.time())}
+        return cls(matrix.movie_ids.astype(np.int32), neighbors, scores, counts,
+                   matrix.avg_ratings, {int(m): t for m, t in matrix.titles.items()}, meta)
+
+    @classmethod
+    def load(cls, index_dir=INDEX_DIR, mmap=True):
+        arrays = {name: np.load(os.path.join(index_dir, f'{name}.npy'), mmap_mode='r' if mmap else None)
+                  for name in ARRAYS}
+        with open(os.path.join(index_dir, 'titles.json')) as f:
+            titles = {int(m): t for m, t in json.load(f).items()}
+        with open(os.path.join(index_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        return cls(titles=titles, meta=meta, **arrays)
+
+    def save(self, index_dir=INDEX_DIR):
+        """Write every file through a temp name so readers never see a partial index."""
+        os.makedirs(index_dir, exist_ok=True)
+        for name in ARRAYS:
+            path = os.path.join(index_dir, f'{name}.npy')
+            np.save(path + '.tmp.npy', np.asarray(getattr(self, name)))
+            os.replace(path + '.tmp.npy', path)
+        for name, data in [('titles', self.titles), ('meta', self.meta)]:
+            path = os.path.join(index_dir, f'{name}.json')
+            with open(path + '.tmp', 'w') as f:
+                json.dump(data, f)
+            os.replace(path + '.tmp', path)
+
+    def refresh(self, matrix, touched_user_ids):
+        """Recompute only the rows that new ratings from `touched_user_ids` can change.
+
+        `matrix` must include the new ratings. A pair's similarity only moves if
+        a touched user rated one of its movies, so those movies are recomputed,
+        along with any other movie whose top-K contains them or could now
+        admit them. Falls back to a full build when the movie set changed.
+        """
+        k, similarity, min_common = self.meta['k'], self.meta['similarity'], self.meta['min_common']
+        if not np.array_equal(matrix.movie_ids, self.movie_ids):
+            return SimilarityIndex.build(matrix, k, similarity, min_common)
+
+        vectors = _item_vectors(matrix, similarity)
+        users = [i for i in (matrix.user_index(u) for u in touched_user_ids) if i is not None]
+        affected = np.zeros(len(self.movie_ids), dtype=bool)
+        affected[matrix.rated[users].indices] = True
+        affected_rows = np.flatnonzero(affected)
+
+        # Rows holding an affected neighbor, or whose k-th score an affected movie now beats
+        neighbors = np.asarray(self.neighbors)
+        holds_affected = (affected[neighbors] & (neighbors >= 0)).any(axis=1)
+        new_scores, _ = _block_similarities(vectors, matrix.rated_t, affected_rows, min_common)
+        best_new = np.full(len(self.movie_ids), -np.inf, dtype=np.float32)
+        new_scores = new_scores.tocoo()
+        np.maximum.at(best_new, new_scores.col, new_scores.data)
+        admits_affected = best_new > np.asarray(self.scores)[:, -1]
+        rows = np.flatnonzero(affected | holds_affected | admits_affected)
+        if len(rows) > len(self.movie_ids) // 2:
+            # A partial pass would cost about as much as starting over
+            return SimilarityIndex.build(matrix, k, similarity, min_common)
+
+        neighbors = neighbors.copy()
+        scores = np.array(self.scores)
+        counts = np.array(self.counts)
+        neighbors[rows], scores[rows], counts[rows] = _top_k(vectors, matrix.rated_t, rows, k, min_common)
+        meta = dict(self.meta, refreshed_at=int(time.time()), refreshed_rows=int(len(rows)))
+        return SimilarityIndex(self.movie_ids, neighbors, scores, counts, matrix.avg_ratings, self.titles, meta)
+
+
+def recommend_from_index(index, movie_ids, limit=10):
+    """Recommend by merging the seeds' K-sized neighbor lists.
+
+    Returns records shaped like recommend_by_movie_ids; score is the summed
+    similarity to the seeds and common_count the largest co-rater count.
+    """
+    positions = np.searchsorted(index.movie_ids, movie_ids)
+    seeds = [p for p, m in zip(positions, movie_ids) if p < len(index.movie_ids) and index.movie_ids[p] == m]
+    seed_set = set(seeds)
+    candidates = {}
+    for seed in seeds:
+        for neighbor, score, count in zip(index.neighbors[seed], index.scores[seed], index.counts[seed]):
+            if neighbor < 0 or neighbor in seed_set:
+                continue
+            entry = candidates.setdefault(int(neighbor), {'score': 0.0, 'common_count': 0, 'paths': []})
+            entry['score'] += float(score)
+            entry['common_count'] = max(entry['common_count'], int(count))
+            entry['paths'].append((float(score), seed, int(count)))
+
+    if not candidates:
+        print(f"No recommendations found for movieIds {movie_ids}")
+        return []
+
+    records = []
+    ranked = sorted(candidates.items(), key=lambda item: item[1]['score'], reverse=True)[:limit]
+    for position, entry in ranked:
+        movie_id = int(index.movie_ids[position])
+        path_descriptions = [
+            f"Similar to '{index.titles.get(int(index.movie_ids[seed]))}' "
+            f"(similarity {score:.2f}, {count} common raters)"
+            for score, seed, count in sorted(entry['paths'], reverse=True)[:3]
+        ]
+        records.append({
+            "movieId": movie_id,
+            "title": index.titles.get(movie_id),
+            "avg_rating": float(index.avg_ratings[position]),
+            "common_count": entry['common_count'],
+            "score": entry['score'],
+            "path_descriptions": path_descriptions,
+        })
+    return records
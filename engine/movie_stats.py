@@ -0,0 +1,136 @@
+import math
+import time
+
+from engine.instrumentation import run_query
+
+# Decayed popularity loses half its weight every 30 days
+POPULARITY_HALF_LIFE_DAYS = 30
+POPULARITY_DECAY = math.log(2) / (POPULARITY_HALF_LIFE_DAYS * 24 * 3600)
+
+def get_movie_ids(tx):
+    """Return every movieId in the graph."""
+    result = run_query(tx, 'movie_ids_all', "MATCH (m:Movie) RETURN m.movieId AS movieId")
+    return [record["movieId"] for record in result]
+
+def refresh_movie_stats(tx, movie_ids):
+    """Recompute the stored stats of the given Movie nodes from their edges.
+
+    Sets avgRating, ratingCount, ratingSum, lastRatedAt, likeCount,
+    recencyBoost (the mean of 1000 / (now - timestamp + 1) over all ratings)
+    and popularity, a count of ratings and likes where each one decays with
+    POPULARITY_HALF_LIFE_DAYS. statsUpdatedAt/popularityUpdatedAt record `now`.
+    """
+    run_query(
+        tx,
+        'refresh_movie_stats',
+        """
+        UNWIND $movie_ids AS movieId
+        MATCH (m:Movie {movieId: movieId})
+        OPTIONAL MATCH (:User)-[r:RATED]->(m)
+        WITH m,
+             AVG(toFloat(r.rating)) AS avgRating,
+             COUNT(r) AS ratingCount,
+             SUM(toFloat(r.rating)) AS ratingSum,
+             MAX(toInteger(r.timestamp)) AS lastRatedAt,
+             AVG(1000.0 / ($now - toInteger(r.timestamp) + 1)) AS recencyBoost,
+             SUM(exp(-$decay * ($now - toInteger(r.timestamp)))) AS ratingPopularity
+        OPTIONAL MATCH (:User)-[l:LIKES]->(m)
+        WITH m, avgRating, ratingCount, ratingSum, lastRatedAt, recencyBoost, ratingPopularity,
+             COUNT(l) AS likeCount,
+             SUM(exp(-$decay * ($now - COALESCE(l.createdAt, $now)))) AS likePopularity
+        SET m.avgRating = avgRating,
+            m.ratingCount = ratingCount,
+            m.ratingSum = ratingSum,
+            m.lastRatedAt = lastRatedAt,
+            m.recencyBoost = COALESCE(recencyBoost, 0.0),
+            m.likeCount = likeCount,
+            m.popularity = ratingPopularity + likePopularity,
+            m.popularityUpdatedAt = $now,
+            m.statsUpdatedAt = $now
+        """,
+        movie_ids=movie_ids,
+        now=int(time.time()),
+        decay=POPULARITY_DECAY
+    )
+
+def refresh_all_movie_stats(session, batch_size=1000):
+    """Recompute the stats of every movie, one write transaction per batch."""
+    movie_ids = session.execute_read(get_movie_ids)
+    for i in range(0, len(movie_ids), batch_size):
+        session.execute_write(refresh_movie_stats, movie_ids[i:i + batch_size])
+    print(f"Movie stats refreshed for {len(movie_ids)} movies.")
+    return len(movie_ids)
+
+APPLY_RATINGS_QUERY = """
+UNWIND $rows AS row
+MATCH (u:User {userId: row.userId})
+MATCH (m:Movie {movieId: row.movieId})
+// Take the movie's write lock before reading its edge and stats, so
+// concurrent writers cannot interleave and lose updates. The lock is held
+// until commit; the property is removed at once so rows filtered out below
+// cannot leave it behind.
+SET m._lock = true
+REMOVE m._lock
+WITH row, u, m
+OPTIONAL MATCH (u)-[old:RATED]->(m)
+WITH row, u, m, head(COLLECT(old)) AS old
+WHERE old IS NULL OR row.timestamp >= old.timestamp
+WITH row, u, m, old, old.rating AS oldRating, old.timestamp AS oldTimestamp
+FOREACH (_ IN CASE WHEN old IS NULL THEN [1] ELSE [] END |
+    CREATE (u)-[:RATED {rating: row.rating, timestamp: row.timestamp}]->(m))
+FOREACH (_ IN CASE WHEN old IS NULL THEN [] ELSE [1] END |
+    SET old.rating = row.rating, old.timestamp = row.timestamp)
+// Marks the user for the incremental precompute job (scripts/precompute_recommendations.py)
+SET u.lastInteractionAt = $now
+WITH m,
+     COUNT(*) AS written,
+     SUM(toFloat(row.rating) - COALESCE(toFloat(oldRating), 0.0)) AS ratingDelta,
+     SUM(CASE WHEN oldRating IS NULL THEN 1 ELSE 0 END) AS countDelta,
+     MAX(row.timestamp) AS lastRatedAt,
+     SUM(1000.0 / ($now - row.timestamp + 1)
+         - CASE WHEN oldTimestamp IS NULL THEN 0.0 ELSE 1000.0 / ($now - oldTimestamp + 1) END) AS recencyDelta,
+     // A re-rate moves the edge's weight rather than adding one; a replay adds nothing
+     SUM(exp(-$decay * ($now - row.timestamp))
+         - CASE WHEN oldTimestamp IS NULL THEN 0.0 ELSE exp(-$decay * ($now - oldTimestamp)) END) AS popularityDelta
+WITH m, written, ratingDelta, countDelta, lastRatedAt, recencyDelta, popularityDelta,
+     COALESCE(m.ratingCount, 0) AS oldCount
+WITH m, written, lastRatedAt, recencyDelta, popularityDelta, oldCount,
+     oldCount + countDelta AS ratingCount,
+     COALESCE(m.ratingSum, COALESCE(m.avgRating, 0.0) * oldCount) + ratingDelta AS ratingSum
+SET m.ratingCount = ratingCount,
+    m.ratingSum = ratingSum,
+    m.avgRating = ratingSum / ratingCount,
+    m.recencyBoost = (COALESCE(m.recencyBoost, 0.0) * oldCount + recencyDelta) / ratingCount,
+    m.lastRatedAt = CASE WHEN m.lastRatedAt > lastRatedAt THEN m.lastRatedAt ELSE lastRatedAt END,
+    m.popularity = COALESCE(m.popularity, 0.0) * exp(-$decay * ($now - COALESCE(m.popularityUpdatedAt, $now)))
+                   + popularityDelta,
+    m.popularityUpdatedAt = $now
+RETURN SUM(written) AS written
+"""
+
+def latest_rating_rows(rows):
+    """Keep one row per (user, movie): the latest timestamp wins."""
+    latest = {}
+    for row in rows:
+        key = (row['userId'], row['movieId'])
+        if key not in latest or row['timestamp'] >= latest[key]['timestamp']:
+            latest[key] = row
+    # Movie locks are taken in movieId order, so concurrent batches do not deadlock
+    return sorted(latest.values(), key=lambda row: (row['movieId'], row['userId']))
+
+def apply_ratings(tx, rows):
+    """Write RATED edges and update the rated movies' stats in the same transaction.
+
+    `rows` are {userId, movieId, rating, timestamp} dicts. An existing edge for
+    (user, movie) is updated in place when the row is newer; older rows are
+    ignored. Stats change by the deltas only, aggregated per movie so several
+    rows for one movie in a batch are applied together, under the movie's
+    write lock. Re-applying a row already written (e.g. a replay) changes no
+    stat. recencyBoost is adjusted approximately and re-baselined by
+    refresh_movie_stats.
+    Returns the number of rows written.
+    """
+    records = run_query(tx, 'apply_ratings', APPLY_RATINGS_QUERY, rows=latest_rating_rows(rows),
+                        now=int(time.time()), decay=POPULARITY_DECAY)
+    written = records[0]["written"] if records else None
+    return written if written is not None else 0
@@ -1,40 +1,158 @@
-import random
+import threading
+import time
 
-def create_new_user(tx):
-    """Generate a random unique user ID and create a new user node."""
-    while True:
-        new_user_id = random.randint(1000, 9999)
-        result = tx.run("MATCH (u:User {userId: $user_id}) RETURN u", user_id=new_user_id)
-        if not result.single():  # If no user with this ID exists
-            tx.run("CREATE (u:User {userId: $user_id})", user_id=new_user_id)
-            return new_user_id
+from engine.instrumentation import run_query
+from engine.movie_stats import POPULARITY_DECAY, apply_ratings
 
-def add_liked_movie(tx, user_id, movie_id):
-    """Add a liked movie for a user."""
-    query = """
-    MATCH (u:User {userId: $user_id})
-    MATCH (m:Movie {movieId: $movie_id})
-    MERGE (u)-[:LIKES]->(m)
-    RETURN m
+ADD_LIKE_QUERY = """
+MATCH (u:User {userId: $user_id})
+MATCH (m:Movie {movieId: $movie_id})
+MERGE (u)-[l:LIKES]->(m)
+  ON CREATE SET l.createdAt = $now,
+                m.likeCount = COALESCE(m.likeCount, 0) + 1,
+                m.popularity = COALESCE(m.popularity, 0.0)
+                               * exp(-$decay * ($now - COALESCE(m.popularityUpdatedAt, $now))) + 1.0,
+                m.popularityUpdatedAt = $now,
+                u.lastInteractionAt = $now
+RETURN m
+"""
+
+REMOVE_LIKE_QUERY = """
+MATCH (u:User {userId: $user_id})-[r:LIKES]->(m:Movie {movieId: $movie_id})
+SET u.lastInteractionAt = $now
+WITH m, r, exp(-$decay * ($now - COALESCE(r.createdAt, $now))) AS weight
+DELETE r
+WITH m, COUNT(*) AS removed, SUM(weight) AS removedWeight
+WITH m, removed,
+     COALESCE(m.popularity, 0.0) * exp(-$decay * ($now - COALESCE(m.popularityUpdatedAt, $now)))
+     - removedWeight AS popularity
+SET m.likeCount = CASE WHEN COALESCE(m.likeCount, 0) > removed THEN m.likeCount - removed ELSE 0 END,
+    m.popularity = CASE WHEN popularity > 0 THEN popularity ELSE 0.0 END,
+    m.popularityUpdatedAt = $now
+"""
+
+# Batched forms of the two queries above for engine/interaction_queue.py. Rows
+# carry their event time; at most one row per (user, movie) per batch.
+ADD_LIKES_QUERY = """
+UNWIND $rows AS row
+MATCH (u:User {userId: row.userId})
+MATCH (m:Movie {movieId: row.movieId})
+OPTIONAL MATCH (u)-[existing:LIKES]->(m)
+WITH u, m, row, existing
+WHERE existing IS NULL
+CREATE (u)-[:LIKES {createdAt: row.createdAt}]->(m)
+SET u.lastInteractionAt = $now
+WITH m, COUNT(*) AS added, SUM(exp(-$decay * ($now - row.createdAt))) AS addedWeight
+SET m.likeCount = COALESCE(m.likeCount, 0) + added,
+    m.popularity = COALESCE(m.popularity, 0.0)
+                   * exp(-$decay * ($now - COALESCE(m.popularityUpdatedAt, $now))) + addedWeight,
+    m.popularityUpdatedAt = $now
+RETURN SUM(added) AS written
+"""
+
+REMOVE_LIKES_QUERY = """
+UNWIND $rows AS row
+MATCH (u:User {userId: row.userId})-[r:LIKES]->(m:Movie {movieId: row.movieId})
+SET u.lastInteractionAt = $now
+WITH m, r, exp(-$decay * ($now - COALESCE(r.createdAt, $now))) AS weight
+DELETE r
+WITH m, COUNT(*) AS removed, SUM(weight) AS removedWeight
+WITH m, removed,
+     COALESCE(m.popularity, 0.0) * exp(-$decay * ($now - COALESCE(m.popularityUpdatedAt, $now)))
+     - removedWeight AS popularity
+SET m.likeCount = CASE WHEN COALESCE(m.likeCount, 0) > removed THEN m.likeCount - removed ELSE 0 END,
+    m.popularity = CASE WHEN popularity > 0 THEN popularity ELSE 0.0 END,
+    m.popularityUpdatedAt = $now
+RETURN SUM(removed) AS written
+"""
+
+LIKED_MOVIES_QUERY = """
+MATCH (u:User {userId: $user_id})-[:LIKES]->(m:Movie)
+RETURN m.movieId AS movieId, m.title AS title
+"""
+
+CREATE_USER_QUERY = "CREATE (u:User {userId: $user_id})"
+
+# userIds are handed out from a (:Counter {name: 'userId'}) node that starts
+# above the largest existing userId. The SET write-locks the counter, so
+# concurrent allocations always get disjoint ranges.
+# Also moves an existing counter past users loaded since it was created
+# (scripts/load_data.py runs it after every load)
+INIT_USER_ID_COUNTER_QUERY = """
+OPTIONAL MATCH (u:User)
+WITH MAX(u.userId) AS maxId
+MERGE (c:Counter {name: 'userId'})
+  ON CREATE SET c.value = COALESCE(maxId, 0)
+SET c.value = CASE WHEN maxId > c.value THEN maxId ELSE c.value END
+"""
+
+ALLOCATE_USER_IDS_QUERY = """
+MATCH (c:Counter {name: 'userId'})
+SET c.value = c.value + $size
+RETURN c.value - $size + 1 AS first, c.value AS last
+"""
+
+def allocate_user_ids(tx, size=1):
+    """Reserve `size` consecutive userIds; returns them as a range."""
+    records = run_query(tx, 'allocate_user_ids', ALLOCATE_USER_IDS_QUERY, size=size)
+    if not records:
+        run_query(tx, 'init_user_id_counter', INIT_USER_ID_COUNTER_QUERY)
+        records = run_query(tx, 'allocate_user_ids', ALLOCATE_USER_IDS_QUERY, size=size)
+    return range(records[0]["first"], records[0]["last"] + 1)
+
+def sync_user_id_counter(tx):
+    """Create the userId counter, or move it past the largest userId in the graph."""
+    run_query(tx, 'init_user_id_counter', INIT_USER_ID_COUNTER_QUERY)
+
+class UserIdAllocator:
+    """Hands out userIds from blocks reserved with allocate_user_ids, one write per block.
+
+    Ids left in a block when the process exits are skipped, never reused.
     """
-    result = tx.run(query, user_id=user_id, movie_id=movie_id)
-    return result.single()
+
+    def __init__(self, block_size=100):
+        self.block_size = block_size
+        self._ids = iter(())
+        self._lock = threading.Lock()
+
+    def next_id(self, session):
+        with self._lock:
+            user_id = next(self._ids, None)
+            if user_id is None:
+                self._ids = iter(session.execute_write(allocate_user_ids, self.block_size))
+                user_id = next(self._ids)
+            return user_id
+
+user_ids = UserIdAllocator()
+
+def create_new_user(tx, user_id=None):
+    """Create a new user node, allocating its userId from the counter unless one is given."""
+    if user_id is None:
+        user_id = allocate_user_ids(tx)[0]
+    run_query(tx, 'create_user', CREATE_USER_QUERY, user_id=user_id)
+    return user_id
+
+def add_liked_movie(tx, user_id, movie_id):
+    """Add a liked movie for a user, counting a new like in the movie's stats."""
+    records = run_query(tx, 'add_like', ADD_LIKE_QUERY, user_id=user_id, movie_id=movie_id,
+                        now=int(time.time()), decay=POPULARITY_DECAY)
+    return records[0] if records else None
 
 def remove_liked_movie(tx, user_id, movie_id):
-    """Remove a liked movie for a user."""
-    query = """
-    MATCH (u:User {userId: $user_id})-[r:LIKES]->(m:Movie {movieId: $movie_id})
-    DELETE r
-    """
-    tx.run(query, user_id=user_id, movie_id=movie_id)
+    """Remove a liked movie for a user and take its decayed weight out of the movie's stats."""
+    run_query(tx, 'remove_like', REMOVE_LIKE_QUERY, user_id=user_id, movie_id=movie_id,
+              now=int(time.time()), decay=POPULARITY_DECAY)
+
+def rating_row(user_id, movie_id, rating):
+    return {"userId": user_id, "movieId": movie_id, "rating": float(rating), "timestamp": int(time.time())}
+
+def rate_movie(tx, user_id, movie_id, rating):
+    """Rate a movie for a user (replacing an earlier rating) and update the movie's stats."""
+    return apply_ratings(tx, [rating_row(user_id, movie_id, rating)]) > 0
 
 def get_liked_movies(tx, user_id):
     """Get all liked movies for a user."""
-    query = """
-    MATCH (u:User {userId: $user_id})-[:LIKES]->(m:Movie)
-    RETURN m.movieId AS movieId, m.title AS title
-    """
-    result = tx.run(query, user_id=user_id)
+    result = run_query(tx, 'liked_movies', LIKED_MOVIES_QUERY, user_id=user_id)
     return [record.data() for record in result]
 
 def print_liked_movies(liked_movies):
@@ -46,43 +164,80 @@ def print_liked_movies(liked_movies):
     for i, movie in enumerate(liked_movies, 1):
         print(f"{i}. {movie['title']} (MovieID: {movie['movieId']})")
 
-def manage_user(session):
-    """Sub-menu for user management including liked movies."""
+def manage_user(session, cache=None, interactions=None):
+    """Sub-menu for user management including liked movies.
+
+    Cached recommendations of a user are invalidated after their likes or ratings change.
+    With an InteractionQueue (engine/interaction_queue.py) likes, unlikes and
+    ratings are queued and written in batches; the queue invalidates the cache
+    when they are flushed.
+    """
     while True:
         print("\nUser Management")
         print("1. Create New User")
         print("2. Add Liked Movie")
         print("3. Remove Liked Movie")
         print("4. List Liked Movies")
-        print("5. Back to Main Menu")
-        sub_choice = input("Select an option (1-5): ")
+        print("5. Rate Movie")
+        print("6. Back to Main Menu")
+        sub_choice = input("Select an option (1-6): ")
 
-        if sub_choice == "5":
+        if sub_choice == "6":
             print("Returning to main menu...")
             break
 
-        if sub_choice not in ["1", "2", "3", "4"]:
-            print("Invalid choice. Please select 1, 2, 3, 4, or 5.")
+        if sub_choice not in ["1", "2", "3", "4", "5"]:
+            print("Invalid choice. Please select 1, 2, 3, 4, 5, or 6.")
             continue
 
         try:
             if sub_choice == "1":
-                new_user_id = session.execute_write(create_new_user)
+                new_user_id = session.execute_write(create_new_user, user_ids.next_id(session))
                 print(f"New user created with ID: {new_user_id}")
             elif sub_choice == "2":
                 user_id = int(input("Enter User ID: "))
                 movie_id = int(input("Enter Movie ID to like: "))
+                if interactions is not None:
+                    interactions.like(user_id, movie_id)
+                    print(f"Queued like of Movie ID {movie_id} for User ID {user_id}")
+                    continue
                 session.execute_write(add_liked_movie, user_id, movie_id)
+                if cache is not None:
+                    cache.invalidate_user(user_id)
                 print(f"Added Movie ID {movie_id} to liked movies for User ID {user_id}")
             elif sub_choice == "3":
                 user_id = int(input("Enter User ID: "))
                 movie_id = int(input("Enter Movie ID to unlike: "))
+                if interactions is not None:
+                    interactions.unlike(user_id, movie_id)
+                    print(f"Queued unlike of Movie ID {movie_id} for User ID {user_id}")
+                    continue
                 session.execute_write(remove_liked_movie, user_id, movie_id)
+                if cache is not None:
+                    cache.invalidate_user(user_id)
                 print(f"Removed Movie ID {movie_id} from liked movies for User ID {user_id}")
             elif sub_choice == "4":
                 user_id = int(input("Enter User ID: "))
                 liked_movies = session.execute_read(get_liked_movies, user_id)
                 print_liked_movies(liked_movies)
+            elif sub_choice == "5":
+                user_id = int(input("Enter User ID: "))
+                movie_id = int(input("Enter Movie ID to rate: "))
+                rating = float(input("Enter rating (0-5): "))
+                if not 0 <= rating <= 5:
+                    print("Rating must be between 0 and 5.")
+                    continue
+                if interactions is not None:
+                    interactions.rate(user_id, movie_id, rating)
+                    print(f"Queued rating {rating}/5 of Movie ID {movie_id} for User ID {user_id}")
+                    continue
+                rated = session.execute_write(rate_movie, user_id, movie_id, rating)
+                if cache is not None:
+                    cache.invalidate_user(user_id)
+                if rated:
+                    print(f"User ID {user_id} rated Movie ID {movie_id} {rating}/5")
+                else:
+                    print(f"User ID {user_id} or Movie ID {movie_id} not found")
         except Exception as e:
             print(f"Error in user management: {e}")
             print(f"An error occurred: {e}")
\ No newline at end of file
@@ -0,0 +1,153 @@
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+class RecommendationCache:
+    """LRU cache with a TTL for engine results, invalidated per user on writes.
+
+    Keys are (engine, subject, limit) where subject is a userId or a sorted
+    tuple of seed movieIds. Entries for a user are dropped by
+    invalidate_user() whenever that user's likes or ratings change. When
+    `path` is given the cache is loaded from and saved to that pickle file.
+    """
+
+    def __init__(self, max_size=1024, ttl=300, path=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        if path and os.path.exists(path):
+            self.load()
+
+    @staticmethod
+    def make_key(engine, subject, limit):
+        if isinstance(subject, (list, tuple, set)):
+            subject = tuple(sorted(subject))
+        return (engine, subject, limit)
+
+    def get(self, key):
+        """Return (True, value) on a fresh hit, else (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            expires_at, _, value = entry
+            if expires_at < time.time():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def put(self, key, value, user_id=None):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + self.ttl, user_id, value)
+            if user_id is not None:
+                self._user_keys.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def get_or_compute(self, engine, subject, limit, compute, user_id=None):
+        """Return the cached result for the key, calling compute() on a miss.
+
+        Empty results are not cached since the engines also return [] on errors.
+        """
+        key = self.make_key(engine, subject, limit)
+        found, value = self.get(key)
+        if found:
+            return value
+        value = compute()
+        if value:
+            self.put(key, value, user_id)
+        return value
+
+    def invalidate_user(self, user_id):
+        """Drop every entry computed for a user."""
+        with self._lock:
+            keys = self._user_keys.pop(user_id, set())
+            for key in keys:
+                if key in self._entries:
+                    del self._entries[key]
+                    self.invalidations += 1
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def _remove(self, key):
+        _, user_id, _ = self._entries.pop(key)
+        if user_id is not None:
+            keys = self._user_keys.get(user_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._user_keys[user_id]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def save(self):
+        """Persist unexpired entries to `path`, written atomically."""
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            entries = [(key, entry) for key, entry in self._entries.items() if entry[0] >= now]
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        now = time.time()
+        with open(self.path, 'rb') as f:
+            entries = pickle.load(f)
+        with self._lock:
+            for key, (expires_at, user_id, value) in entries:
+                if expires_at < now:
+                    continue
+                self._entries[key] = (expires_at, user_id, value)
+                if user_id is not None:
+                    self._user_keys.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+
+def print_cache_stats(stats):
+    """Print cache counters in a formatted way."""
+    print("\nRecommendation Cache:")
+    print(f"  Size: {stats['size']}/{stats['max_size']} (TTL {stats['ttl']}s)")
+    print(f"  Hits: {stats['hits']}  Misses: {stats['misses']}  Hit Rate: {stats['hit_rate']:.1%}")
+    print(f"  Evictions: {stats['evictions']}  Expirations: {stats['expirations']}  "
+          f"Invalidations: {stats['invalidations']}")
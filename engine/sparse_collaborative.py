@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from engine.instrumentation import run_query
+
+# Knuth's multiplicative hash, also used by the bounded Cypher queries, so a
+# budget samples the same co-raters in both engines
+SAMPLE_MULTIPLIER = 2654435761
+SAMPLE_MODULUS = 2 ** 32
+
+
+def sample_key(user_ids):
+    """Deterministic pseudo-random order of userIds: (userId * 2654435761) % 2^32."""
+    return np.asarray(user_ids, dtype=np.int64) * SAMPLE_MULTIPLIER % SAMPLE_MODULUS
+
+
+class SparseRatingMatrix:
+    """User x movie CSR rating matrix built once and scored in-process."""
+
+    def __init__(self, ratings, titles=None):
+        ratings = ratings.drop_duplicates(subset=['userId', 'movieId'], keep='last')
+        self.user_ids = np.sort(ratings['userId'].unique())
+        self.movie_ids = np.sort(ratings['movieId'].unique())
+        rows = np.searchsorted(self.user_ids, ratings['userId'].to_numpy())
+        cols = np.searchsorted(self.movie_ids, ratings['movieId'].to_numpy())
+        shape = (len(self.user_ids), len(self.movie_ids))
+
+        self.ratings = sparse.csr_matrix(
+            (ratings['rating'].to_numpy(dtype=np.float32), (rows, cols)), shape=shape)
+        self.rated = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=shape)
+        # Movie-major copies so the per-request products are CSR mat-vecs
+        self.ratings_t = self.ratings.T.tocsr()
+        self.rated_t = self.rated.T.tocsr()
+        # Same as the avgRating Movie stat (engine/movie_stats.py)
+        rating_counts = np.diff(self.ratings_t.indptr)
+        rating_sums = np.asarray(self.ratings_t.sum(axis=1)).ravel()
+        self.avg_ratings = (rating_sums / np.maximum(rating_counts, 1)).astype(np.float32)
+        self.titles = titles or {}
+
+    @classmethod
+    def from_csv(cls, ratings_path='./data/clean/ratings_cleaned.csv',
+                 movies_path='./data/clean/movies_cleaned.csv'):
+        """Build the matrix from the cleaned CSVs."""
+        ratings = pd.read_csv(ratings_path, usecols=['userId', 'movieId', 'rating'],
+                              dtype={'userId': 'int32', 'movieId': 'int32', 'rating': 'float32'})
+        movies = pd.read_csv(movies_path, usecols=['movieId', 'title'])
+        return cls(ratings, dict(zip(movies['movieId'], movies['title'])))
+
+    @classmethod
+    def from_graph(cls, tx):
+        """Build the matrix from the RATED edges; use with session.execute_read."""
+        result = run_query(
+            tx,
+            'rating_matrix',
+            """
+            MATCH (u:User)-[r:RATED]->(m:Movie)
+            RETURN u.userId AS userId, m.movieId AS movieId, toFloat(r.rating) AS rating
+            """
+        )
+        ratings = pd.DataFrame([record.values() for record in result], columns=['userId', 'movieId', 'rating'])
+        result = run_query(tx, 'movie_titles', "MATCH (m:Movie) RETURN m.movieId AS movieId, m.title AS title")
+        titles = {record['movieId']: record['title'] for record in result}
+        return cls(ratings, titles)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Wrap a GraphSnapshot's CSR arrays without copying them (engine/graph_snapshot.py)."""
+        matrix = cls.__new__(cls)
+        matrix.user_ids = snapshot.user_ids
+        matrix.movie_ids = snapshot.movie_ids
+        shape = (len(snapshot.user_ids), len(snapshot.movie_ids))
+        user_major = (snapshot.rating_movies, snapshot.rating_indptr)
+        movie_major = (snapshot.rating_t_users, snapshot.rating_t_indptr)
+        matrix.ratings = sparse.csr_matrix((snapshot.rating_values,) + user_major, shape=shape, copy=False)
+        matrix.rated = sparse.csr_matrix((snapshot.rating_ones,) + user_major, shape=shape, copy=False)
+        matrix.ratings_t = sparse.csr_matrix((snapshot.rating_t_values,) + movie_major, shape=shape[::-1], copy=False)
+        matrix.rated_t = sparse.csr_matrix((snapshot.rating_ones,) + movie_major, shape=shape[::-1], copy=False)
+        matrix.avg_ratings = snapshot.movie_avg_ratings
+        matrix.titles = snapshot.titles
+        return matrix
+
+    def user_index(self, userId):
+        index = np.searchsorted(self.user_ids, userId)
+        if index < len(self.user_ids) and self.user_ids[index] == userId:
+            return index
+        return None
+
+    def title(self, movie_index):
+        return self.titles.get(int(self.movie_ids[movie_index]))
+
+
+def _path_descriptions(matrix, user_index, common, movie_index, title, limit=3):
+    """Describe up to `limit` (neighbor, shared movie, rating) paths for a recommendation."""
+    user_movies = matrix.rated.indices[matrix.rated.indptr[user_index]:matrix.rated.indptr[user_index + 1]]
+    start, end = matrix.ratings_t.indptr[movie_index], matrix.ratings_t.indptr[movie_index + 1]
+    descriptions = []
+    for neighbor, rating in zip(matrix.ratings_t.indices[start:end], matrix.ratings_t.data[start:end]):
+        if common[neighbor] == 0:
+            continue
+        neighbor_movies = matrix.rated.indices[matrix.rated.indptr[neighbor]:matrix.rated.indptr[neighbor + 1]]
+        shared = np.intersect1d(user_movies, neighbor_movies, assume_unique=True)[0]
+        descriptions.append(
+            f"User {matrix.user_ids[neighbor]} rated '{matrix.title(shared)}' and gave '{title}' a {float(rating)}/5")
+        if len(descriptions) == limit:
+            break
+    return descriptions
+
+
+def _bounded_common(matrix, user_index, max_coraters_per_movie, max_neighbors):
+    """Shared-movie counts per user, keeping `max_coraters_per_movie` sampled co-raters
+    of each of the user's movies and then the `max_neighbors` users sharing the most.
+
+    Same selection as BOUNDED_COLLABORATIVE_QUERY: co-raters in sample_key order,
+    neighbors by shared count with sample_key breaking ties.
+    """
+    keys = sample_key(matrix.user_ids)
+    movies = matrix.rated.indices[matrix.rated.indptr[user_index]:matrix.rated.indptr[user_index + 1]]
+    starts, ends = matrix.rated_t.indptr[movies], matrix.rated_t.indptr[movies + 1]
+    raters = np.concatenate([matrix.rated_t.indices[start:end] for start, end in zip(starts, ends)]
+                            or [np.zeros(0, dtype=np.int32)])
+    groups = np.repeat(np.arange(len(movies)), ends - starts)
+    others = raters != user_index
+    raters, groups = raters[others], groups[others]
+    if max_coraters_per_movie is not None:
+        order = np.lexsort((keys[raters], groups))
+        raters, groups = raters[order], groups[order]
+        # Position of every co-rater within its movie's sampled order
+        rank = np.arange(len(raters)) - np.searchsorted(groups, groups)
+        raters = raters[rank < max_coraters_per_movie]
+
+    common = np.bincount(raters, minlength=len(matrix.user_ids)).astype(np.float32)
+    if max_neighbors is not None:
+        neighbors = np.flatnonzero(common)
+        if len(neighbors) > max_neighbors:
+            keep = neighbors[np.lexsort((keys[neighbors], -common[neighbors]))[:max_neighbors]]
+            bounded = np.zeros_like(common)
+            bounded[keep] = common[keep]
+            common = bounded
+    return common
+
+
+def get_sparse_collaborative_recommendations(matrix, userId, limit=10, explain=True, max_neighbors=None,
+                                             max_coraters_per_movie=None):
+    """Collaborative recommendations scored with sparse products instead of path expansion.
+
+    Reproduces the Cypher score: common_count is the number of neighbors (users
+    sharing a rated movie) who rated the candidate, avg_rating their mean
+    rating of it over every path, so each neighbor weighs its shared-movie
+    count, and score = avg_rating * log10(common_count). Path descriptions are
+    built for the returned top-N only, and skipped with explain=False. `max_neighbors` and `max_coraters_per_movie` apply the same
+    budget as the bounded Cypher query.
+    """
+    user_index = matrix.user_index(userId)
+    if user_index is None:
+        print(f"No collaborative recommendations found for userId {userId}")
+        return []
+
+    if max_neighbors is None and max_coraters_per_movie is None:
+        # Movies shared with every other user (the number of paths through them)
+        common = (matrix.rated @ matrix.rated[user_index].T).toarray().ravel()
+        common[user_index] = 0
+    else:
+        common = _bounded_common(matrix, user_index, max_coraters_per_movie, max_neighbors)
+    common_count = matrix.rated_t @ (common > 0).astype(np.float32)
+
+    candidates = common_count > 0
+    candidates[matrix.rated[user_index].indices] = False
+    candidates = np.flatnonzero(candidates)
+    if len(candidates) == 0:
+        print(f"No collaborative recommendations found for userId {userId}")
+        return []
+
+    avg_rating = (matrix.ratings_t @ common)[candidates] / (matrix.rated_t @ common)[candidates]
+    score = avg_rating * np.log10(common_count[candidates])
+    top = np.argpartition(-score, min(limit, len(score)) - 1)[:limit]
+    top = top[np.argsort(-score[top], kind='stable')]
+
+    records = []
+    for i in top:
+        movie_index = candidates[i]
+        title = matrix.title(movie_index)
+        path_descriptions = _path_descriptions(matrix, user_index, common, movie_index, title) if explain else []
+        records.append({
+            "movieId": int(matrix.movie_ids[movie_index]),
+            "title": title,
+            "avg_rating": float(avg_rating[i]),
+            "common_count": int(common_count[movie_index]),
+            "score": float(score[i]),
+            "path_descriptions": path_descriptions,
+        })
+    return records
@@ -4,10 +4,17 @@ from neo4j import GraphDatabase
 from dotenv import load_dotenv
 
 from scripts.utils import print_recommendations
-from engine.collaborative_recommendations import get_collaborative_recommendations
+from engine.collaborative_recommendations import budget_from_env, get_collaborative_recommendations
 from engine.context_recommendation import get_context_recommendations
 from engine.additional_recommendation import recommend_by_movie_ids
 from engine.new_user_recommendation import manage_user
+from engine.item_similarity import SimilarityIndex, INDEX_DIR
+from engine.content_index import ContentIndex
+from engine.cold_start import cold_start_from_env
+from engine.als_recommendations import ALSModel, MODEL_DIR, get_als_recommendations
+from engine.instrumentation import METRICS, print_query_metrics
+from engine.recommendation_cache import RecommendationCache, print_cache_stats
+from engine.interaction_queue import InteractionQueue, WAL_PATH, print_queue_stats
 
 load_dotenv()
 
@@ -22,6 +29,58 @@ if not uri or not user or not password:
 # Initialize Neo4j driver
 driver = GraphDatabase.driver(uri, auth=(user, password))
 
+# Movie ID-based recommendations: 'live' runs the Cypher query, 'index' reads
+# the precomputed item-item neighbor table (scripts/build_similarity_index.py),
+# 'content' ranks by genre/tag TF-IDF similarity
+movie_recommendation_mode = os.getenv('MOVIE_RECOMMENDATION_MODE', 'live')
+similarity_index = None
+if movie_recommendation_mode == 'index':
+    similarity_index = SimilarityIndex.load(os.getenv('SIMILARITY_INDEX_DIR', INDEX_DIR))
+
+# Genre/tag recommendations: 'live' matches exact genre and tag names in Cypher,
+# 'content' scores an in-memory TF-IDF index built from the cleaned CSVs
+context_recommendation_mode = os.getenv('CONTEXT_RECOMMENDATION_MODE', 'live')
+content_index = None
+if 'content' in (movie_recommendation_mode, context_recommendation_mode):
+    content_index = ContentIndex.from_csv()
+context_content_index = content_index if context_recommendation_mode == 'content' else None
+movie_content_index = content_index if movie_recommendation_mode == 'content' else None
+
+# Users with fewer than COLD_START_MAX_RATINGS ratings get popularity/quality
+# rankings blended with the genres they liked; 0 disables the tier
+cold_start = cold_start_from_env(lambda: driver)
+
+# Path-query budget for heavy users and blockbuster seeds (unset = unbounded);
+# pick values with python -m scripts.evaluate_budget
+budget = budget_from_env()
+
+# ALS factors trained by scripts/train_als.py, loaded when present
+als_model_dir = os.getenv('ALS_MODEL_DIR', MODEL_DIR)
+als_model = ALSModel.load(als_model_dir) if os.path.exists(os.path.join(als_model_dir, 'meta.json')) else None
+
+# Recommendation results are cached per engine/user/limit; CACHE_PATH persists them across runs
+cache = RecommendationCache(
+    max_size=int(os.getenv('CACHE_SIZE', '1024')),
+    ttl=int(os.getenv('CACHE_TTL', '300')),
+    path=os.getenv('CACHE_PATH')
+)
+
+# WRITE_BEHIND=1 queues likes and ratings and writes them in batches, with a
+# local write-ahead file replayed on the next start
+interactions = None
+if os.getenv('WRITE_BEHIND', '0') == '1':
+    def invalidate_users(user_ids):
+        for user_id in user_ids:
+            cache.invalidate_user(user_id)
+
+    interactions = InteractionQueue(
+        driver,
+        wal_path=os.getenv('WAL_PATH', WAL_PATH),
+        batch_size=int(os.getenv('WRITE_BATCH_SIZE', '500')),
+        flush_interval=float(os.getenv('WRITE_FLUSH_INTERVAL', '1.0')),
+        on_flush=invalidate_users
+    ).start()
+
 def main():
     while True:
         print("\nMovie Recommendation System")
@@ -29,34 +88,65 @@ def main():
         print("2. Collaborative Filtering (User-based)")
         print("3. Genre/Tag-based Recommendations")
         print("4. Movie ID-based Recommendations")
-        print("5. Exit")
-        choice = input("Select an option (1-5): ")
+        print("5. ALS Embedding Recommendations")
+        print("6. Exit")
+        choice = input("Select an option (1-6): ")
 
-        if choice == "5":
+        if choice == "6":
             print("Exiting...")
+            if interactions is not None:
+                interactions.close()
+                print_queue_stats(interactions.stats())
+            if cold_start is not None:
+                cold_start.close()
+            print_cache_stats(cache.stats())
+            print_query_metrics(METRICS.snapshot())
+            cache.save()
             break
 
-        if choice not in ["1", "2", "3", "4"]:
-            print("Invalid choice. Please select 1, 2, 3, or 4.")
+        if choice not in ["1", "2", "3", "4", "5"]:
+            print("Invalid choice. Please select 1, 2, 3, 4, or 5.")
             continue
 
         try:
             with driver.session() as session:
                 if choice == "1":
-                    manage_user(session)
+                    manage_user(session, cache, interactions)
                 elif choice == "2":
                     user_id = int(input("Enter User ID: "))
-                    recommendations = session.execute_read(get_collaborative_recommendations, userId=user_id)
+                    recommendations = cache.get_or_compute(
+                        "collaborative", user_id, 10,
+                        lambda: session.execute_read(get_collaborative_recommendations, userId=user_id,
+                                                     cold_start=cold_start, **budget),
+                        user_id=user_id)
                     print_recommendations(recommendations, "Collaborative")
                 elif choice == "3":
                     user_id = int(input("Enter User ID: "))
-                    recommendations = session.execute_read(get_context_recommendations, userId=user_id)
+                    recommendations = cache.get_or_compute(
+                        f"context:{context_recommendation_mode}", user_id, 10,
+                        lambda: session.execute_read(get_context_recommendations, userId=user_id,
+                                                     content_index=context_content_index,
+                                                     cold_start=cold_start),
+                        user_id=user_id)
                     print_recommendations(recommendations, "Genre/Tag-Based")
                 elif choice == "4":
                     movie_ids_input = input("Enter comma-separated Movie IDs (e.g., 82,74,118): ")
                     movie_ids = [int(id.strip()) for id in movie_ids_input.split(",")]
-                    recommendations = session.execute_read(recommend_by_movie_ids, movie_ids=movie_ids)
+                    recommendations = cache.get_or_compute(
+                        f"movie_ids:{movie_recommendation_mode}", movie_ids, 10,
+                        lambda: session.execute_read(recommend_by_movie_ids, movie_ids=movie_ids, index=similarity_index,
+                                                     content_index=movie_content_index, **budget))
                     print_recommendations(recommendations, "Movie ID-Based")
+                elif choice == "5":
+                    if als_model is None:
+                        print(f"No ALS model in {als_model_dir}; train one with python -m scripts.train_als")
+                        continue
+                    user_id = int(input("Enter User ID: "))
+                    recommendations = cache.get_or_compute(
+                        "als", user_id, 10,
+                        lambda: session.execute_read(get_als_recommendations, userId=user_id, model=als_model),
+                        user_id=user_id)
+                    print_recommendations(recommendations, "ALS")
         except Exception as e:
             print(f"Error in interactive loop: {e}")
             print(f"An error occurred: {e}")
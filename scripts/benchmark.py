@@ -0,0 +1,180 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from engine.additional_recommendation import recommend_by_movie_ids
+from engine.collaborative_recommendations import get_collaborative_recommendations
+from engine.context_recommendation import get_context_recommendations
+from engine.movie_stats import refresh_all_movie_stats
+from scripts.generate_synthetic_data import OUT_DIR, generate
+from scripts.load_data import apply_constraints, driver, load_all
+
+# Users are bucketed by their number of ratings: light below the 25th
+# percentile, medium around the median, heavy above the 95th
+BUCKETS = {'light': (0.0, 0.25), 'medium': (0.45, 0.55), 'heavy': (0.95, 1.0)}
+SEED_SIZES = [1, 3, 10]
+
+def clear_database(session):
+    """Delete every node and relationship in batches."""
+    session.run("MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS").consume()
+
+def get_user_degrees(tx):
+    result = tx.run("MATCH (u:User) RETURN u.userId AS userId, size((u)-[:RATED]->()) AS degree")
+    return [(record["userId"], record["degree"]) for record in result]
+
+def get_rated_movie_ids(tx):
+    result = tx.run("MATCH (m:Movie) WHERE m.ratingCount > 0 RETURN m.movieId AS movieId ORDER BY movieId")
+    return [record["movieId"] for record in result]
+
+def pick_users(degrees, per_bucket, rng):
+    """Sample `per_bucket` userIds from each activity bucket, with their rating counts."""
+    degrees = sorted(degrees, key=lambda item: item[1])
+    picked = {}
+    for bucket, (low, high) in BUCKETS.items():
+        candidates = degrees[int(low * len(degrees)):max(int(high * len(degrees)), int(low * len(degrees)) + 1)]
+        chosen = rng.choice(len(candidates), size=min(per_bucket, len(candidates)), replace=False)
+        picked[bucket] = [candidates[i] for i in sorted(chosen)]
+    return picked
+
+def time_call(session, function, repeat, warmup, **kwargs):
+    """Run an engine in read transactions; return (timings in ms, result size)."""
+    for _ in range(warmup):
+        session.execute_read(function, **kwargs)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        recommendations = session.execute_read(function, **kwargs)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, len(recommendations)
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def summarize(timings, results):
+    return {
+        "runs": len(timings),
+        "p50_ms": statistics.median(timings),
+        "p95_ms": percentile(timings, 0.95),
+        "mean_ms": statistics.mean(timings),
+        "min_ms": min(timings),
+        "max_ms": max(timings),
+        "mean_results": statistics.mean(results),
+    }
+
+def run_benchmark(session, per_bucket, seed_sizes, seed_sets, repeat, warmup, limit, rng, explain=True):
+    """Time every engine case; returns {case: summary}."""
+    cases = {}
+    users = pick_users(session.execute_read(get_user_degrees), per_bucket, rng)
+    for engine, function in [('collaborative', get_collaborative_recommendations),
+                             ('context', get_context_recommendations)]:
+        for bucket, sample in users.items():
+            timings, results = [], []
+            for user_id, _ in sample:
+                user_timings, size = time_call(session, function, repeat, warmup, userId=user_id, limit=limit,
+                                               explain=explain)
+                timings.extend(user_timings)
+                results.append(size)
+            case = f"{engine}/{bucket}"
+            cases[case] = dict(summarize(timings, results), ratings_per_user=[degree for _, degree in sample])
+            print(f"{case}: p50 {cases[case]['p50_ms']:.1f} ms, p95 {cases[case]['p95_ms']:.1f} ms")
+
+    movie_ids = session.execute_read(get_rated_movie_ids)
+    for size in seed_sizes:
+        timings, results = [], []
+        for _ in range(seed_sets):
+            seeds = [int(m) for m in rng.choice(movie_ids, size=min(size, len(movie_ids)), replace=False)]
+            seed_timings, result_size = time_call(session, recommend_by_movie_ids, repeat, warmup,
+                                                  movie_ids=seeds, limit=limit, explain=explain)
+            timings.extend(seed_timings)
+            results.append(result_size)
+        case = f"movie_ids/seeds={size}"
+        cases[case] = summarize(timings, results)
+        print(f"{case}: p50 {cases[case]['p50_ms']:.1f} ms, p95 {cases[case]['p95_ms']:.1f} ms")
+    return cases
+
+def compare(baseline, current, threshold):
+    """Print the p50 change per case; return the cases slower than `threshold`."""
+    regressions = []
+    print(f"\n{'Case':<24} {'Baseline p50':>13} {'Current p50':>12} {'Change':>8}")
+    for case, result in current['results'].items():
+        before = baseline['results'].get(case)
+        if before is None:
+            print(f"{case:<24} {'-':>13} {result['p50_ms']:>10.1f}ms {'new':>8}")
+            continue
+        change = result['p50_ms'] / before['p50_ms'] - 1 if before['p50_ms'] else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(case)
+            flag = '  REGRESSION'
+        print(f"{case:<24} {before['p50_ms']:>11.1f}ms {result['p50_ms']:>10.1f}ms {change:>+8.1%}{flag}")
+    return regressions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Time the recommendation engines on synthetic or cleaned data.")
+    parser.add_argument('--data-dir', default=OUT_DIR, help="Directory of *_cleaned.csv files to load.")
+    parser.add_argument('--generate', action='store_true', help="Generate synthetic data into --data-dir first.")
+    parser.add_argument('--users', type=int, default=1000, help="Synthetic users (with --generate).")
+    parser.add_argument('--movies', type=int, default=5000, help="Synthetic movies (with --generate).")
+    parser.add_argument('--clear', action='store_true', help="Delete everything in the database before loading.")
+    parser.add_argument('--skip-load', action='store_true', help="Benchmark whatever is already loaded.")
+    parser.add_argument('--per-bucket', type=int, default=5, help="Users timed per activity bucket.")
+    parser.add_argument('--seed-sizes', type=int, nargs='+', default=SEED_SIZES)
+    parser.add_argument('--seed-sets', type=int, default=5, help="Random seed sets per seed size.")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--no-explain', action='store_true', help="Skip the explanation queries.")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for data and sampling.")
+    parser.add_argument('--output', help="Write the results to this JSON file.")
+    parser.add_argument('--compare', help="Baseline JSON from an earlier run.")
+    parser.add_argument('--threshold', type=float, default=0.2, help="p50 slowdown reported as a regression.")
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    rng = np.random.default_rng(args.seed)
+    dataset = {'data_dir': args.data_dir}
+    if args.generate:
+        dataset.update(generate(args.data_dir, args.users, args.movies, seed=args.seed), generated=True)
+
+    with driver.session() as session:
+        if args.clear:
+            clear_database(session)
+        if not args.skip_load:
+            apply_constraints(session)
+            summary = load_all(session, args.data_dir)
+            refresh_all_movie_stats(session)
+            dataset['load_seconds'] = {name: secs for name, (_, secs) in summary.items()}
+        results = run_benchmark(session, args.per_bucket, args.seed_sizes, args.seed_sets,
+                                args.repeat, args.warmup, args.limit, rng, explain=not args.no_explain)
+        server = driver.get_server_info()
+    driver.close()
+
+    report = {
+        'meta': {
+            'created_at': int(time.time()),
+            'python': platform.python_version(),
+            'neo4j': server.agent,
+            'dataset': dataset,
+            'params': {k: getattr(args, k) for k in ['per_bucket', 'seed_sizes', 'seed_sets', 'repeat',
+                                                   'warmup', 'limit', 'seed', 'no_explain']},
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
@@ -0,0 +1,60 @@
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from engine.item_similarity import SimilarityIndex, INDEX_DIR
+from engine.sparse_collaborative import SparseRatingMatrix
+
+RATINGS_FILE = './data/clean/ratings_cleaned.csv'
+MOVIES_FILE = './data/clean/movies_cleaned.csv'
+# Ratings the index in --out was last computed from, so successive refreshes
+# build on each other instead of starting again from --ratings
+MERGED_RATINGS = 'ratings.csv'
+
+def read_ratings(path):
+    return pd.read_csv(path, usecols=['userId', 'movieId', 'rating', 'timestamp'],
+                       dtype={'userId': 'int32', 'movieId': 'int32', 'rating': 'float32', 'timestamp': 'int64'})
+
+def save_ratings(ratings, index_dir):
+    path = os.path.join(index_dir, MERGED_RATINGS)
+    ratings.to_csv(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Precompute the top-K item-item similarity index.")
+    parser.add_argument('--ratings', default=RATINGS_FILE, help="Cleaned ratings CSV.")
+    parser.add_argument('--out', default=INDEX_DIR, help="Directory the .npy index is written to.")
+    parser.add_argument('--k', type=int, default=50, help="Neighbors kept per movie.")
+    parser.add_argument('--similarity', choices=['cosine', 'adjusted_cosine'], default='cosine')
+    parser.add_argument('--min-common', type=int, default=3, help="Minimum co-raters for a pair to count.")
+    parser.add_argument('--refresh', metavar='NEW_RATINGS_CSV', nargs='+',
+                        help="Merge these ratings into the ones the index in --out was built from and "
+                             "recompute only the affected rows.")
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    start = time.perf_counter()
+    movies = pd.read_csv(MOVIES_FILE, usecols=['movieId', 'title'])
+    titles = dict(zip(movies['movieId'], movies['title']))
+    merged_path = os.path.join(args.out, MERGED_RATINGS)
+
+    if args.refresh:
+        ratings = read_ratings(merged_path if os.path.exists(merged_path) else args.ratings)
+        new_ratings = pd.concat([read_ratings(path) for path in args.refresh], ignore_index=True)
+        # Latest rating wins when a user re-rates a movie
+        ratings = pd.concat([ratings, new_ratings]).sort_values('timestamp', kind='stable')
+        ratings = ratings.drop_duplicates(subset=['userId', 'movieId'], keep='last')
+        matrix = SparseRatingMatrix(ratings, titles)
+        index = SimilarityIndex.load(args.out, mmap=False).refresh(matrix, new_ratings['userId'].unique())
+    else:
+        ratings = read_ratings(args.ratings)
+        matrix = SparseRatingMatrix(ratings, titles)
+        index = SimilarityIndex.build(matrix, args.k, args.similarity, args.min_common)
+
+    index.save(args.out)
+    save_ratings(ratings, args.out)
+    print(f"Similarity index for {len(index.movie_ids)} movies written to {args.out} "
+          f"in {time.perf_counter() - start:.2f}s ({index.meta})")
@@ -1,14 +1,25 @@
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+
 import pandas as pd
 
-def clean_movies():
-    mdf = pd.read_csv('./data/movies.csv')
-    
+# Compact dtypes for the streaming mode; nullable on read so dropna still works
+RATING_DTYPES = {'userId': 'Int32', 'movieId': 'Int32', 'rating': 'Float32', 'timestamp': 'Int64'}
+TAG_DTYPES = {'userId': 'Int32', 'movieId': 'Int32', 'tag': 'string', 'timestamp': 'Int64'}
+
+def clean_movies_frame(mdf):
     # Remove movies with no genres
     mdf = mdf[mdf['genres'] != "(no genres listed)"]
 
     # Drop duplicates
-    mdf = mdf.drop_duplicates(subset=['movieId'])
+    return mdf.drop_duplicates(subset=['movieId'])
 
+def clean_movies():
+    mdf = clean_movies_frame(pd.read_csv('./data/movies.csv'))
     mdf.to_csv("./data/clean/movies_cleaned.csv", index=False)
 
 def clean_ratings():
@@ -68,8 +79,193 @@ def clean_links():
 
     links.to_csv('./data/clean/links_cleaned.csv')
 
+# --- Streaming Mode ---
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def clean_ratings_chunk(chunk):
+    chunk = chunk.dropna(subset=['userId', 'movieId', 'rating', 'timestamp'])
+    chunk = chunk.astype({'userId': 'int32', 'movieId': 'int32', 'rating': 'float32', 'timestamp': 'int64'})
+    return chunk[(chunk['rating'] >= 0) & (chunk['rating'] <= 5)]
+
+def clean_tags_chunk(chunk):
+    chunk = chunk.dropna(subset=['userId', 'movieId', 'tag', 'timestamp'])
+    chunk = chunk.assign(tag=chunk['tag'].str.strip())
+    chunk = chunk[chunk['tag'] != '']
+    return chunk.astype({'userId': 'int32', 'movieId': 'int32', 'tag': 'object', 'timestamp': 'int64'})
+
+def dedupe_latest_rating(part):
+    # Keep Latest if duplicates found
+    return part.sort_values('timestamp', kind='stable').drop_duplicates(subset=['userId', 'movieId'], keep='last')
+
+def dedupe_tags(part):
+    # Spill files preserve input order, so keep='first' matches the in-memory cleaner
+    return part.drop_duplicates(subset=['userId', 'movieId', 'tag'])
+
+def stream_clean(src, dst, dtypes, clean_chunk, dedupe, chunksize=1_000_000, partitions=64):
+    """Clean a CSV chunk by chunk, deduping through userId-hashed spill files.
+
+    Every duplicate key starts with userId, so all copies of a row land in the
+    same spill partition and only one partition is held in memory at a time.
+    Writes `dst` as CSV and, when pyarrow is installed, a Parquet sibling.
+    """
+    spill_dir = tempfile.mkdtemp(prefix='clean_spill_', dir=os.path.dirname(dst))
+    spill_dtypes = {column: dtype.lower() if dtype != 'string' else 'object' for column, dtype in dtypes.items()}
+    try:
+        rows_in = 0
+        for chunk in pd.read_csv(src, chunksize=chunksize, dtype=dtypes):
+            rows_in += len(chunk)
+            chunk = clean_chunk(chunk)
+            for part_id, part in chunk.groupby(chunk['userId'] % partitions):
+                path = os.path.join(spill_dir, f'part-{part_id:04d}.csv')
+                part.to_csv(path, mode='a', index=False, header=not os.path.exists(path))
+
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            pa = pq = None
+            print("pyarrow is not installed, skipping Parquet output.")
+        parquet_path = os.path.splitext(dst)[0] + '.parquet'
+        writer = None
+        rows_out = 0
+        for path in (dst, parquet_path):
+            if os.path.exists(path):
+                os.remove(path)
+        for name in sorted(os.listdir(spill_dir)):
+            part = dedupe(pd.read_csv(os.path.join(spill_dir, name), dtype=spill_dtypes, keep_default_na=False))
+            part.to_csv(dst, mode='a', index=False, header=rows_out == 0)
+            rows_out += len(part)
+            if pq is not None:
+                table = pa.Table.from_pandas(part, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(parquet_path, table.schema)
+                writer.write_table(table.cast(writer.schema))
+        if writer is not None:
+            writer.close()
+        if rows_out == 0:
+            # Header only, so the loaders still find the file
+            pd.DataFrame(columns=list(dtypes)).to_csv(dst, index=False)
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    print(f"{os.path.basename(dst)}: {rows_in} rows in, {rows_out} rows out, peak RSS {peak_rss_mb():.1f} MB")
+    return rows_out
+
+def clean_ratings_streaming(chunksize=1_000_000, partitions=64):
+    return stream_clean('./data/ratings.csv', './data/clean/ratings_cleaned.csv', RATING_DTYPES,
+                        clean_ratings_chunk, dedupe_latest_rating, chunksize, partitions)
+
+def clean_tags_streaming(chunksize=1_000_000, partitions=64):
+    return stream_clean('./data/tags.csv', './data/clean/tags_cleaned.csv', TAG_DTYPES,
+                        clean_tags_chunk, dedupe_tags, chunksize, partitions)
+
+# --- Delta Mode ---
+
+def clean_delta(src, dtypes, clean_chunk, dedupe, since, chunksize=1_000_000):
+    """Clean only the rows of `src` with a timestamp at or after `since`.
+
+    Rows appended later within the same second as `since` would be lost by a
+    strict comparison, so the rows at the mark are read again; the loaders
+    upsert, so re-applying them is harmless. Uses the streaming chunk
+    cleaners, so the full file is never held in memory; the delta itself is
+    assumed to fit and is deduplicated in one go.
+    """
+    parts = []
+    for chunk in pd.read_csv(src, chunksize=chunksize, dtype=dtypes):
+        chunk = clean_chunk(chunk)
+        parts.append(chunk[chunk['timestamp'] >= since])
+    if not parts:
+        return pd.DataFrame(columns=list(dtypes))
+    return dedupe(pd.concat(parts, ignore_index=True))
+
+def export_admin_import(clean_dir='./data/clean', out_dir='./data/import'):
+    """Write node/relationship CSVs for `neo4j-admin database import`.
+
+    The files reproduce the graph built by scripts/load_data.py: Movie, User
+    and Genre nodes with integer ids, RATED/TAGGED edges carrying rating and
+    timestamp, HAS_GENRE edges and HAS_LINK edges to an unlabeled node.
+    """
+    movies = pd.read_csv(os.path.join(clean_dir, 'movies_cleaned.csv'))
+    ratings = pd.read_csv(os.path.join(clean_dir, 'ratings_cleaned.csv'))
+    tags = pd.read_csv(os.path.join(clean_dir, 'tags_cleaned.csv'))
+    links = pd.read_csv(os.path.join(clean_dir, 'links_cleaned.csv'), usecols=['movieId', 'imdbId', 'tmdbId'])
+    os.makedirs(out_dir, exist_ok=True)
+
+    def write(frame, name, header):
+        frame.to_csv(os.path.join(out_dir, name), index=False, header=header)
+
+    # Movies referenced only by ratings/tags/links are created without a title, as MERGE does
+    referenced = pd.concat([ratings['movieId'], tags['movieId'], links['movieId']]).drop_duplicates()
+    extra = referenced[~referenced.isin(movies['movieId'])]
+    movie_nodes = pd.concat([movies[['movieId', 'title']], pd.DataFrame({'movieId': extra, 'title': ''})])
+    write(movie_nodes.assign(id=movie_nodes['movieId'], label='Movie')[['id', 'movieId', 'title', 'label']],
+          'movies.csv', [':ID(Movie)', 'movieId:long', 'title', ':LABEL'])
+
+    user_ids = pd.concat([ratings['userId'], tags['userId']]).drop_duplicates().sort_values()
+    write(pd.DataFrame({'id': user_ids, 'userId': user_ids, 'label': 'User'}),
+          'users.csv', [':ID(User)', 'userId:long', ':LABEL'])
+
+    # Split "A|B|C" genres in one vectorized pass instead of per row
+    movie_genres = (
+        movies[['movieId', 'genres']]
+        .assign(genre=movies['genres'].str.split('|'))
+        .explode('genre')
+        .assign(genre=lambda df: df['genre'].str.strip())
+        .drop_duplicates(subset=['movieId', 'genre'])
+    )
+    genres = movie_genres['genre'].drop_duplicates().sort_values()
+    write(pd.DataFrame({'name': genres, 'label': 'Genre'}), 'genres.csv', ['name:ID(Genre)', ':LABEL'])
+    write(movie_genres[['movieId', 'genre']].assign(type='HAS_GENRE'),
+          'has_genre.csv', [':START_ID(Movie)', ':END_ID(Genre)', ':TYPE'])
+
+    write(ratings[['userId', 'movieId', 'rating', 'timestamp']].assign(type='RATED'),
+          'rated.csv', [':START_ID(User)', ':END_ID(Movie)', 'rating:double', 'timestamp:long', ':TYPE'])
+    write(tags[['userId', 'movieId', 'tag', 'timestamp']].assign(type='TAGGED'),
+          'tagged.csv', [':START_ID(User)', ':END_ID(Movie)', 'tag', 'timestamp:long', ':TYPE'])
+
+    # load_links attaches one unlabeled node per movie, keyed here by movieId
+    links = links.drop_duplicates(subset=['movieId'], keep='last')
+    write(links[['movieId']], 'link_targets.csv', [':ID(Link)'])
+    write(links[['movieId', 'movieId', 'imdbId', 'tmdbId']].assign(type='HAS_LINK'),
+          'has_link.csv', [':START_ID(Movie)', ':END_ID(Link)', 'imdbId:long', 'tmdbId:long', ':TYPE'])
+
+    print("Wrote neo4j-admin import files to", out_dir)
+    print("Import with:")
+    print("  neo4j-admin database import full neo4j --overwrite-destination \\")
+    for node_file in ['movies.csv', 'users.csv', 'genres.csv', 'link_targets.csv']:
+        print(f"    --nodes={os.path.join(out_dir, node_file)} \\")
+    for rel_file in ['rated.csv', 'tagged.csv', 'has_genre.csv', 'has_link.csv']:
+        print(f"    --relationships={os.path.join(out_dir, rel_file)} \\")
+    print("    --multiline-fields=true")
+    print("then apply the constraints and movie stats with: python -m scripts.load_data --stats-only")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Clean the raw MovieLens CSVs into ./data/clean.")
+    parser.add_argument('--admin-import', action='store_true',
+                        help="Also export neo4j-admin import CSVs to ./data/import.")
+    parser.add_argument('--admin-import-only', action='store_true',
+                        help="Skip cleaning and only export from the existing ./data/clean files.")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Clean ratings and tags in bounded memory (for the 25M/32M dumps).")
+    parser.add_argument('--chunksize', type=int, default=1_000_000, help="Rows read per chunk in streaming mode.")
+    parser.add_argument('--partitions', type=int, default=64, help="Spill partitions used for deduplication.")
+    return parser.parse_args()
+
 if __name__ == '__main__':
-    clean_movies()
-    clean_ratings()
-    clean_tags()
-    clean_links()
\ No newline at end of file
+    args = parse_args()
+    if not args.admin_import_only:
+        clean_movies()
+        if args.streaming:
+            clean_ratings_streaming(args.chunksize, args.partitions)
+            clean_tags_streaming(args.chunksize, args.partitions)
+        else:
+            clean_ratings()
+            clean_tags()
+        clean_links()
+    if args.admin_import or args.admin_import_only:
+        export_admin_import()
\ No newline at end of file
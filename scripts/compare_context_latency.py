@@ -0,0 +1,76 @@
+import argparse
+import os
+import statistics
+import time
+
+from neo4j import GraphDatabase
+from dotenv import load_dotenv
+
+from engine.context_recommendation import CONTEXT_QUERY, LEGACY_CONTEXT_QUERY, get_context_recommendations
+
+load_dotenv()
+
+uri = os.getenv('DB_URI')
+user = os.getenv('DB_USER')
+password = os.getenv('DB_PASSWORD')
+
+if not uri or not user or not password:
+    raise ValueError('Missing Environment Variables')
+
+driver = GraphDatabase.driver(uri, auth=(user, password))
+
+def sample_user_ids(tx, count):
+    result = tx.run("MATCH (u:User)-[:RATED]->() WITH DISTINCT u RETURN u.userId AS userId ORDER BY rand() LIMIT $count",
+                    count=count)
+    return [record["userId"] for record in result]
+
+def time_query(session, query, user_id, limit, repeat):
+    """Run the context engine `repeat` times; return (timings in ms, last result).
+
+    The legacy query collects its paths eagerly, so only the current one runs
+    the follow-up explanation query.
+    """
+    timings = []
+    explain = query is not LEGACY_CONTEXT_QUERY
+    for _ in range(repeat):
+        start = time.perf_counter()
+        recommendations = session.execute_read(get_context_recommendations, userId=user_id, limit=limit,
+                                               query=query, explain=explain)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, recommendations
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare the legacy and candidate-driven context queries.")
+    parser.add_argument('--users', type=int, nargs='*', help="userIds to test (default: a random sample).")
+    parser.add_argument('--sample', type=int, default=10, help="Random users to sample when --users is omitted.")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per user and query.")
+    parser.add_argument('--limit', type=int, default=10)
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    with driver.session() as session:
+        user_ids = args.users or session.execute_read(sample_user_ids, args.sample)
+        results = {'legacy': [], 'current': []}
+        matches = 0
+        for user_id in user_ids:
+            legacy_timings, legacy_recs = time_query(session, LEGACY_CONTEXT_QUERY, user_id, args.limit, args.repeat)
+            current_timings, current_recs = time_query(session, CONTEXT_QUERY, user_id, args.limit, args.repeat)
+            results['legacy'].extend(legacy_timings)
+            results['current'].extend(current_timings)
+            # Scores can differ by the recency drift since the stats refresh, so compare rankings
+            same = [r['movieId'] for r in legacy_recs] == [r['movieId'] for r in current_recs]
+            matches += same
+            print(f"User {user_id}: legacy {statistics.median(legacy_timings):.1f} ms, "
+                  f"current {statistics.median(current_timings):.1f} ms, same ranking: {same}")
+
+    print("\nContext Query Latency:")
+    for name, timings in results.items():
+        print(f"  {name:<8} p50 {statistics.median(timings):>9.1f} ms  p95 {percentile(timings, 0.95):>9.1f} ms")
+    print(f"  Speedup (p50): {statistics.median(results['legacy']) / statistics.median(results['current']):.1f}x")
+    print(f"  Identical top-{args.limit}: {matches}/{len(user_ids)} users")
+    driver.close()
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+from neo4j import GraphDatabase
+from dotenv import load_dotenv
+
+from engine.collaborative_recommendations import get_collaborative_recommendations
+from engine.sparse_collaborative import SparseRatingMatrix, get_sparse_collaborative_recommendations
+
+load_dotenv()
+
+RATINGS_FILE = './data/clean/ratings_cleaned.csv'
+MOVIES_FILE = './data/clean/movies_cleaned.csv'
+# max_coraters_per_movie:max_neighbors pairs; 'none' is the unbounded baseline
+BUDGETS = ['none', '25:50', '50:100', '100:250', '200:500']
+MIN_USER_RATINGS = 10
+
+def parse_budget(text):
+    if text == 'none':
+        return None, None
+    coraters, neighbors = text.split(':')
+    return int(coraters) if coraters else None, int(neighbors) if neighbors else None
+
+def split_ratings(ratings, test_fraction, rng):
+    """Hold out `test_fraction` of each user's ratings at random; returns (train, test)."""
+    ratings = ratings[ratings.groupby('userId')['movieId'].transform('size') >= MIN_USER_RATINGS]
+    held_out = rng.random(len(ratings)) < test_fraction
+    return ratings[~held_out], ratings[held_out]
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def evaluate_offline(matrix, test, users, budgets, limit, min_rating):
+    """Precision/recall@limit against held-out ratings >= min_rating, overlap with the
+    unbounded top-N and latency, per budget, using the sparse engine."""
+    relevant = test[test['rating'] >= min_rating].groupby('userId')['movieId'].apply(set).to_dict()
+    degrees = dict(zip(matrix.user_ids, np.diff(matrix.rated.indptr)))
+    heavy_cutoff = np.percentile([degrees[u] for u in users], 90)
+    baseline = {}
+    results = {}
+    for budget in budgets:
+        coraters, neighbors = parse_budget(budget)
+        precision, recall, overlap, timings, heavy_timings = [], [], [], [], []
+        for user_id in users:
+            start = time.perf_counter()
+            records = get_sparse_collaborative_recommendations(
+                matrix, user_id, limit, explain=False, max_neighbors=neighbors, max_coraters_per_movie=coraters)
+            elapsed = (time.perf_counter() - start) * 1000
+            timings.append(elapsed)
+            if degrees[user_id] >= heavy_cutoff:
+                heavy_timings.append(elapsed)
+            picks = [record["movieId"] for record in records]
+            if budget == 'none':
+                baseline[user_id] = set(picks)
+            if baseline.get(user_id):
+                overlap.append(len(baseline[user_id] & set(picks)) / len(baseline[user_id]))
+            hits = len(relevant.get(user_id, set()) & set(picks))
+            precision.append(hits / limit)
+            if relevant.get(user_id):
+                recall.append(hits / len(relevant[user_id]))
+        results[budget] = {
+            f"precision@{limit}": statistics.mean(precision),
+            f"recall@{limit}": statistics.mean(recall) if recall else 0.0,
+            f"overlap@{limit}": statistics.mean(overlap) if overlap else 0.0,
+            "mean_ms": statistics.mean(timings),
+            "p95_ms": percentile(timings, 0.95),
+            "heavy_p95_ms": percentile(heavy_timings, 0.95) if heavy_timings else 0.0,
+        }
+    return results
+
+def evaluate_graph(users, budgets, limit, repeat):
+    """Latency of the Cypher collaborative query per budget and overlap with the unbounded one.
+
+    Runs against whatever is loaded in Neo4j, so there is no held-out split here.
+    """
+    uri = os.getenv('DB_URI')
+    user = os.getenv('DB_USER')
+    password = os.getenv('DB_PASSWORD')
+    if not uri or not user or not password:
+        raise ValueError('Missing Environment Variables')
+    driver = GraphDatabase.driver(uri, auth=(user, password))
+    baseline = {}
+    results = {}
+    with driver.session() as session:
+        for budget in budgets:
+            coraters, neighbors = parse_budget(budget)
+            timings, overlap = [], []
+            for user_id in users:
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    records = session.execute_read(get_collaborative_recommendations, userId=int(user_id),
+                                                   limit=limit, explain=False, max_neighbors=neighbors,
+                                                   max_coraters_per_movie=coraters)
+                    timings.append((time.perf_counter() - start) * 1000)
+                picks = {record["movieId"] for record in records}
+                if budget == 'none':
+                    baseline[user_id] = picks
+                if baseline.get(user_id):
+                    overlap.append(len(baseline[user_id] & picks) / len(baseline[user_id]))
+            results[budget] = {
+                f"overlap@{limit}": statistics.mean(overlap) if overlap else 0.0,
+                "p50_ms": statistics.median(timings),
+                "p95_ms": percentile(timings, 0.95),
+            }
+    driver.close()
+    return results
+
+def print_results(title, results):
+    print(f"\n{title}")
+    columns = list(next(iter(results.values())))
+    print(f"{'Budget':<10}" + ''.join(f"{column:>14}" for column in columns))
+    for budget, row in results.items():
+        print(f"{budget:<10}" + ''.join(f"{row[column]:>14.3f}" for column in columns))
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compare neighbor budgets (coraters:neighbors) for the collaborative engine.")
+    parser.add_argument('--ratings', default=RATINGS_FILE, help="Cleaned ratings CSV.")
+    parser.add_argument('--budgets', nargs='+', default=BUDGETS,
+                        help="max_coraters_per_movie:max_neighbors pairs, e.g. 50:100 or :200; 'none' is unbounded.")
+    parser.add_argument('--users', type=int, default=300, help="Users evaluated.")
+    parser.add_argument('--test-fraction', type=float, default=0.2, help="Share of each user's ratings held out.")
+    parser.add_argument('--min-rating', type=float, default=4.0, help="Held-out ratings counted as relevant.")
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--graph', action='store_true', help="Also time the Cypher query against Neo4j.")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per user with --graph.")
+    parser.add_argument('--output', help="Write the results to this JSON file.")
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    if 'none' not in args.budgets:
+        args.budgets.insert(0, 'none')
+    rng = np.random.default_rng(args.seed)
+    ratings = pd.read_csv(args.ratings, usecols=['userId', 'movieId', 'rating'],
+                          dtype={'userId': 'int32', 'movieId': 'int32', 'rating': 'float32'})
+    movies = pd.read_csv(MOVIES_FILE, usecols=['movieId', 'title'])
+    train, test = split_ratings(ratings, args.test_fraction, rng)
+    matrix = SparseRatingMatrix(train, dict(zip(movies['movieId'], movies['title'])))
+    candidates = np.intersect1d(matrix.user_ids, test['userId'].unique())
+    users = np.sort(rng.choice(candidates, size=min(args.users, len(candidates)), replace=False))
+    print(f"{len(train)} training / {len(test)} held-out ratings, evaluating {len(users)} users")
+
+    report = {'params': {k: getattr(args, k) for k in ['budgets', 'users', 'test_fraction', 'min_rating',
+                                                       'limit', 'seed']}}
+    report['offline'] = evaluate_offline(matrix, test, users, args.budgets, args.limit, args.min_rating)
+    print_results(f"Held-out split (sparse engine, top-{args.limit})", report['offline'])
+    if args.graph:
+        report['graph'] = evaluate_graph(users, args.budgets, args.limit, args.repeat)
+        print_results("Cypher against Neo4j", report['graph'])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
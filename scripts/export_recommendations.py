@@ -0,0 +1,65 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from neo4j import GraphDatabase, READ_ACCESS
+from dotenv import load_dotenv
+
+from engine.batch_recommendations import CHUNK_SIZE, iter_collaborative_recommendations, iter_context_recommendations
+from engine.cold_start import cold_start_from_env
+from engine.collaborative_recommendations import budget_from_env
+
+load_dotenv()
+
+ENGINES = {
+    'collaborative': iter_collaborative_recommendations,
+    'context': iter_context_recommendations,
+}
+
+def get_all_user_ids(tx):
+    result = tx.run("MATCH (u:User) RETURN u.userId AS userId ORDER BY userId")
+    return [record["userId"] for record in result]
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Write top-N recommendations for many users as JSON lines, one chunk of users per query.")
+    parser.add_argument('--engine', choices=list(ENGINES), default='collaborative')
+    parser.add_argument('--users', type=int, nargs='+', help="userIds to export (default: every user).")
+    parser.add_argument('--limit', type=int, default=10, help="Recommendations per user.")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Users per query and transaction.")
+    parser.add_argument('--no-explain', action='store_true', help="Skip the explanation queries.")
+    parser.add_argument('--output', help="Output file (default: stdout).")
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    uri = os.getenv('DB_URI')
+    user = os.getenv('DB_USER')
+    password = os.getenv('DB_PASSWORD')
+    if not uri or not user or not password:
+        raise ValueError('Missing Environment Variables')
+    driver = GraphDatabase.driver(uri, auth=(user, password))
+
+    start = time.perf_counter()
+    count = 0
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        with driver.session(default_access_mode=READ_ACCESS) as session:
+            user_ids = args.users or session.execute_read(get_all_user_ids)
+            budget = budget_from_env() if args.engine == 'collaborative' else {}
+            recommendations = ENGINES[args.engine](session, user_ids, args.limit, chunk_size=args.chunk_size,
+                                                   explain=not args.no_explain, cold_start=cold_start_from_env(),
+                                                   **budget)
+            for user_id, records in recommendations:
+                out.write(json.dumps({"userId": user_id, "recommendations": records}, default=str) + '\n')
+                count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        driver.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Exported {count} users in {elapsed:.2f}s ({count / elapsed if elapsed else 0.0:.1f} users/s)",
+          file=sys.stderr)
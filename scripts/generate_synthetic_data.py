@@ -0,0 +1,103 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+OUT_DIR = './data/synthetic'
+
+GENRES = ['Drama', 'Comedy', 'Thriller', 'Action', 'Romance', 'Adventure', 'Crime', 'Sci-Fi', 'Horror',
+          'Fantasy', 'Children', 'Animation', 'Mystery', 'Documentary', 'War', 'Musical', 'Western',
+          'IMAX', 'Film-Noir']
+
+# Timestamps fall between 1996-01-01 and 2018-10-01, like the MovieLens small set
+TIME_RANGE = (820454400, 1538352000)
+
+def zipf_weights(n, alpha, rng):
+    """Zipf-like probabilities over n items, ranks shuffled so popularity is unrelated to id."""
+    weights = 1.0 / np.arange(1, n + 1) ** alpha
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+def generate_movies(n_movies, rng):
+    genre_weights = zipf_weights(len(GENRES), 1.0, rng)
+    years = rng.integers(1930, 2019, n_movies)
+    rows = []
+    for movie_id, year in zip(range(1, n_movies + 1), years):
+        genres = rng.choice(GENRES, size=rng.integers(1, 4), replace=False, p=genre_weights)
+        rows.append((movie_id, f"Synthetic Movie {movie_id} ({year})", '|'.join(genres)))
+    return pd.DataFrame(rows, columns=['movieId', 'title', 'genres'])
+
+def generate_ratings(n_users, n_movies, min_ratings, user_alpha, item_alpha, rng):
+    """Ratings with Pareto-distributed activity per user and Zipf item popularity.
+
+    Every user rates at least `min_ratings` movies, as in MovieLens, and at
+    most a third of the catalogue. A rating is the movie's quality plus the
+    user's bias plus noise, rounded to half stars.
+    """
+    item_weights = zipf_weights(n_movies, item_alpha, rng)
+    activity = np.minimum((min_ratings * (1 + rng.pareto(user_alpha, n_users))).astype(int),
+                          max(min_ratings, n_movies // 3))
+    quality = rng.normal(3.5, 0.5, n_movies)
+    bias = rng.normal(0.0, 0.4, n_users)
+
+    user_ids = np.repeat(np.arange(1, n_users + 1), activity)
+    movie_index = np.concatenate([rng.choice(n_movies, size=k, replace=False, p=item_weights) for k in activity])
+    noise = rng.normal(0.0, 0.8, len(movie_index))
+    ratings = np.clip(np.round((quality[movie_index] + bias[user_ids - 1] + noise) * 2) / 2, 0.5, 5.0)
+    timestamps = rng.integers(*TIME_RANGE, len(movie_index))
+    return pd.DataFrame({'userId': user_ids, 'movieId': movie_index + 1, 'rating': ratings, 'timestamp': timestamps})
+
+def generate_tags(ratings, tag_fraction, vocabulary, rng):
+    """Tag a random `tag_fraction` of the rated pairs with Zipf-distributed tag names."""
+    tagged = ratings.sample(frac=tag_fraction, random_state=int(rng.integers(2 ** 31)))
+    tag_weights = 1.0 / np.arange(1, vocabulary + 1)
+    tags = rng.choice(vocabulary, size=len(tagged), p=tag_weights / tag_weights.sum())
+    return pd.DataFrame({
+        'userId': tagged['userId'].to_numpy(),
+        'movieId': tagged['movieId'].to_numpy(),
+        'tag': [f"tag {t}" for t in tags],
+        'timestamp': tagged['timestamp'].to_numpy() + rng.integers(0, 3600, len(tagged)),
+    })
+
+def generate_links(n_movies):
+    movie_ids = np.arange(1, n_movies + 1)
+    return pd.DataFrame({'movieId': movie_ids, 'imdbId': 100000 + movie_ids, 'tmdbId': 1000 + movie_ids})
+
+def generate(out_dir=OUT_DIR, users=1000, movies=5000, min_ratings=20, user_alpha=1.2, item_alpha=1.0,
+             tag_fraction=0.05, tag_vocabulary=500, seed=42):
+    """Write movies/ratings/tags/links_cleaned.csv to `out_dir` and return the row counts."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    movies_df = generate_movies(movies, rng)
+    ratings_df = generate_ratings(users, movies, min_ratings, user_alpha, item_alpha, rng)
+    tags_df = generate_tags(ratings_df, tag_fraction, tag_vocabulary, rng)
+    links_df = generate_links(movies)
+
+    movies_df.to_csv(os.path.join(out_dir, 'movies_cleaned.csv'), index=False)
+    ratings_df.to_csv(os.path.join(out_dir, 'ratings_cleaned.csv'), index=False)
+    tags_df.to_csv(os.path.join(out_dir, 'tags_cleaned.csv'), index=False)
+    # clean_links keeps the pandas index column, so the synthetic file does too
+    links_df.to_csv(os.path.join(out_dir, 'links_cleaned.csv'))
+    return {'movies': len(movies_df), 'ratings': len(ratings_df), 'tags': len(tags_df), 'links': len(links_df)}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate MovieLens-shaped synthetic *_cleaned.csv files.")
+    parser.add_argument('--out', default=OUT_DIR)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--movies', type=int, default=5000)
+    parser.add_argument('--min-ratings', type=int, default=20, help="Ratings of the least active user.")
+    parser.add_argument('--user-alpha', type=float, default=1.2, help="Pareto shape of ratings per user.")
+    parser.add_argument('--item-alpha', type=float, default=1.0, help="Zipf exponent of movie popularity.")
+    parser.add_argument('--tag-fraction', type=float, default=0.05, help="Share of ratings that also get a tag.")
+    parser.add_argument('--tag-vocabulary', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    start = time.perf_counter()
+    counts = generate(args.out, args.users, args.movies, args.min_ratings, args.user_alpha, args.item_alpha,
+                      args.tag_fraction, args.tag_vocabulary, args.seed)
+    print(f"Generated {counts} in {args.out} ({time.perf_counter() - start:.2f}s)")
@@ -1,95 +1,472 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from neo4j import GraphDatabase
+import numpy as np
 import pandas as pd
 
+from engine.movie_stats import apply_ratings, latest_rating_rows, refresh_all_movie_stats
+from engine.new_user_recommendation import sync_user_id_counter
+from scripts.clean_data import (
+    RATING_DTYPES, TAG_DTYPES, clean_delta, clean_movies_frame, clean_ratings_chunk, clean_tags_chunk,
+    dedupe_latest_rating, dedupe_tags
+)
+
 uri = "bolt://localhost:7687"
 user = "neo4j"
 password = "password"
 
 driver = GraphDatabase.driver(uri, auth=(user, password))
 
-# Load cleaned CSVs
-movies = pd.read_csv('./data/clean/movies_cleaned.csv')
-ratings = pd.read_csv('./data/clean/ratings_cleaned.csv')
-tags = pd.read_csv('./data/clean/tags_cleaned.csv')
-links = pd.read_csv('./data/clean/links_cleaned.csv')
+DATA_DIR = './data/clean'
+CONSTRAINTS_FILE = './cyphers/util.cypher'
+CHECKPOINT_DIR = './data/checkpoints'
+RAW_DIR = './data'
+DELTA_DIR = './data/delta'
+DELTA_STATE_FILE = './data/delta/state.json'
+BATCH_SIZE = 5000
+
+# Entities keyed by user are split into userId ranges so partitions never
+# MERGE the same User node concurrently
+USER_PARTITIONED = {'Ratings', 'Tags'}
+
+# --- Schema ---
+
+def read_cypher_statements(path=CONSTRAINTS_FILE):
+    """Split a .cypher file into statements, dropping // comments."""
+    with open(path) as f:
+        lines = [line for line in f if not line.strip().startswith('//')]
+    statements = ''.join(lines).split(';')
+    return [s.strip() for s in statements if s.strip()]
+
+def apply_constraints(session, path=CONSTRAINTS_FILE):
+    """Create the constraints and indexes so loader MERGEs are index-backed."""
+    for statement in read_cypher_statements(path):
+        session.run(statement).consume()
+    # Wait for the backing indexes to come online before loading
+    session.run("CALL db.awaitIndexes()").consume()
 
 # --- Cypher Loaders ---
 
-def load_movies(tx, movieId, title, genres):
+def load_movies(tx, rows):
     tx.run(
         """
-        MERGE (m:Movie {movieId: $movieId})
-          ON CREATE SET m.title = $title
-        WITH m, $genres AS genres
-        UNWIND genres AS genreName
+        UNWIND $rows AS row
+        MERGE (m:Movie {movieId: row.movieId})
+        // Also fills in Movie nodes first created by a rating
+        SET m.title = row.title
+        WITH m, row
+        UNWIND row.genres AS genreName
           MERGE (g:Genre {name: genreName})
           MERGE (m)-[:HAS_GENRE]->(g)
         """,
-        movieId=movieId,
-        title=title,
-        genres=genres
+        rows=rows
     )
 
-def load_ratings(tx, userId, movieId, rating, timestamp):
+def load_ratings(tx, rows):
+    # One RATED edge per (user, movie); a newer row updates it in place
     tx.run(
         """
-        MERGE (u:User {userId: $userId})
-        MERGE (m:Movie {movieId: $movieId})
-        MERGE (u)-[:RATED {rating: $rating, timestamp: $timestamp}]->(m)
+        UNWIND $rows AS row
+        MERGE (u:User {userId: row.userId})
+        MERGE (m:Movie {movieId: row.movieId})
+        MERGE (u)-[r:RATED]->(m)
+          ON CREATE SET r.rating = row.rating, r.timestamp = row.timestamp
+          ON MATCH SET r.rating = CASE WHEN row.timestamp >= r.timestamp THEN row.rating ELSE r.rating END,
+                       r.timestamp = CASE WHEN row.timestamp >= r.timestamp THEN row.timestamp ELSE r.timestamp END
         """,
-        userId=userId,
-        movieId=movieId,
-        rating=rating,
-        timestamp=timestamp
+        rows=rows
     )
 
-def load_tags(tx, userId, movieId, tag, timestamp):
+def load_tags(tx, rows):
+    # One TAGGED edge per (user, movie, tag), keeping the first timestamp
     tx.run(
         """
-        MERGE (u:User {userId: $userId})
-        MERGE (m:Movie {movieId: $movieId})
-        MERGE (u)-[:TAGGED {tag: $tag, timestamp: $timestamp}]->(m)
+        UNWIND $rows AS row
+        MERGE (u:User {userId: row.userId})
+        MERGE (m:Movie {movieId: row.movieId})
+        MERGE (u)-[t:TAGGED {tag: row.tag}]->(m)
+          ON CREATE SET t.timestamp = row.timestamp
         """,
-        userId=userId,
-        movieId=movieId,
-        tag=tag,
-        timestamp=timestamp
+        rows=rows
     )
 
-def load_links(tx, movieId, imdbId, tmdbId):
+def upsert_ratings(tx, rows):
+    """Create missing users and movies, then upsert RATED edges and the movies' stats (apply_ratings).
+
+    Returns the number of distinct (user, movie) rows now in the graph: written
+    here, or superseded by a newer rating that was already there.
+    """
+    rows = latest_rating_rows(rows)
     tx.run(
         """
-        MERGE (m:Movie {movieId: $movieId})
+        UNWIND $user_ids AS userId
+        MERGE (:User {userId: userId})
+        """,
+        user_ids=sorted({row['userId'] for row in rows})
+    )
+    # apply_ratings only MATCHes movies; a rating can arrive before its movie is in movies.csv
+    tx.run(
+        """
+        UNWIND $movie_ids AS movieId
+        MERGE (:Movie {movieId: movieId})
+        """,
+        movie_ids=sorted({row['movieId'] for row in rows})
+    )
+    written = apply_ratings(tx, rows)
+    if written == len(rows):
+        return written
+    record = tx.run(
+        """
+        UNWIND $rows AS row
+        MATCH (:User {userId: row.userId})-[r:RATED]->(:Movie {movieId: row.movieId})
+        WHERE r.timestamp >= row.timestamp
+        RETURN COUNT(*) AS applied
+        """,
+        rows=rows
+    ).single()
+    return record["applied"]
+
+def load_links(tx, rows):
+    tx.run(
+        """
+        UNWIND $rows AS row
+        MERGE (m:Movie {movieId: row.movieId})
         MERGE (m)-[hl:HAS_LINK]->()
-        SET hl.imdbId = $imdbId, hl.tmdbId = $tmdbId
+        SET hl.imdbId = row.imdbId, hl.tmdbId = row.tmdbId
         """,
-        movieId=movieId,
-        imdbId=imdbId,
-        tmdbId=tmdbId
+        rows=rows
     )
 
+# --- Row Builders ---
+
+def movie_rows(chunk):
+    chunk = chunk.assign(genres=chunk['genres'].str.strip().str.split(r'\s*\|\s*', regex=True))
+    return chunk[['movieId', 'title', 'genres']].to_dict('records')
+
+def rating_rows(chunk):
+    return chunk[['userId', 'movieId', 'rating', 'timestamp']].to_dict('records')
+
+def tag_rows(chunk):
+    return chunk[['userId', 'movieId', 'tag', 'timestamp']].to_dict('records')
+
+def link_rows(chunk):
+    return chunk[['movieId', 'imdbId', 'tmdbId']].to_dict('records')
+
+# (name, file, loader, row builder, read_csv options)
+ENTITIES = [
+    ('Movies', 'movies_cleaned.csv', load_movies, movie_rows,
+     {'dtype': {'movieId': 'int64', 'title': 'str', 'genres': 'str'}}),
+    ('Ratings', 'ratings_cleaned.csv', load_ratings, rating_rows,
+     {'dtype': {'userId': 'int64', 'movieId': 'int64', 'rating': 'float64', 'timestamp': 'int64'}}),
+    ('Tags', 'tags_cleaned.csv', load_tags, tag_rows,
+     {'dtype': {'userId': 'int64', 'movieId': 'int64', 'tag': 'str', 'timestamp': 'int64'}}),
+    ('Links', 'links_cleaned.csv', load_links, link_rows,
+     {'usecols': ['movieId', 'imdbId', 'tmdbId'],
+      'dtype': {'movieId': 'int64', 'imdbId': 'int64', 'tmdbId': 'int64'}}),
+]
+
 # --- Upload All Data ---
 
-with driver.session() as session:
-    # Upload Movies
-    for i, row in movies.iterrows():
-        genres_list = [g.strip() for g in row['genres'].split('|')]
-        session.execute_write(load_movies, int(row['movieId']), row['title'], genres_list)
-        print(f"Movie {i+1}/{len(movies)} loaded.")
-
-    # Upload Ratings
-    for i, row in ratings.iterrows():
-        session.execute_write(load_ratings, int(row['userId']), int(row['movieId']), float(row['rating']), int(row['timestamp']))
-        print(f"Rating {i+1}/{len(ratings)} loaded.")
-
-    # Upload Tags
-    for i, row in tags.iterrows():
-        session.execute_write(load_tags, int(row['userId']), int(row['movieId']), row['tag'], int(row['timestamp']))
-        print(f"Tag {i+1}/{len(tags)} loaded.")
-
-    # Upload Links
-    for i, row in links.iterrows():
-        session.execute_write(load_links, int(row['movieId']), int(row['imdbId']), int(row['tmdbId']))
-        print(f"Link {i+1}/{len(links)} loaded.")
-
-driver.close()
+def load_csv(session, name, path, loader, to_rows, batch_size=BATCH_SIZE, **read_options):
+    """Stream a cleaned CSV in chunks, one UNWIND transaction per chunk."""
+    start = time.perf_counter()
+    total = 0
+    for chunk in pd.read_csv(path, chunksize=batch_size, **read_options):
+        rows = to_rows(chunk)
+        session.execute_write(loader, rows)
+        total += len(rows)
+        print(f"{name}: {total} rows loaded.")
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(f"{name}: {total} rows in {elapsed:.2f}s ({rate:.0f} rows/s)")
+    return total, elapsed
+
+def load_all(session, data_dir=DATA_DIR, batch_size=BATCH_SIZE):
+    """Load every cleaned CSV and return {name: (rows, seconds)}."""
+    summary = {}
+    for name, filename, loader, to_rows, read_options in ENTITIES:
+        path = os.path.join(data_dir, filename)
+        summary[name] = load_csv(session, name, path, loader, to_rows, batch_size, **read_options)
+    return summary
+
+# --- Parallel, Resumable Pipeline ---
+
+def partition_by_user(frame, partitions):
+    """Split a frame into contiguous userId ranges holding roughly equal row counts."""
+    frame = frame.sort_values(['userId', 'movieId'], kind='mergesort').reset_index(drop=True)
+    if frame.empty:
+        return []
+    counts = frame.groupby('userId').size()
+    starts = (counts.cumsum() - counts).to_numpy()
+    labels = np.minimum(starts * partitions // len(frame), partitions - 1)
+    user_partition = pd.Series(labels, index=counts.index)
+    parts = []
+    for _, part in frame.groupby(frame['userId'].map(user_partition), sort=True):
+        key = f"users_{part['userId'].iloc[0]}-{part['userId'].iloc[-1]}"
+        parts.append((key, part.reset_index(drop=True)))
+    return parts
+
+def checkpoint_path(checkpoint_dir, name, key):
+    return os.path.join(checkpoint_dir, f"{name.lower()}_{key}.json")
+
+def read_checkpoint(path, total):
+    """Return the number of rows already committed for a partition."""
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        checkpoint = json.load(f)
+    # A checkpoint for a differently sized partition is stale; MERGE makes a reload safe
+    if checkpoint.get('rows') != total:
+        return 0
+    return checkpoint.get('rows_done', 0)
+
+def write_checkpoint(path, rows_done, total):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'rows_done': rows_done, 'rows': total}, f)
+    os.replace(tmp_path, path)
+
+def load_partition(name, key, frame, loader, to_rows, batch_size, checkpoint_dir):
+    """Load one partition in its own session, checkpointing after every committed batch."""
+    path = checkpoint_path(checkpoint_dir, name, key)
+    total = len(frame)
+    done = read_checkpoint(path, total)
+    if done >= total:
+        print(f"{name} [{key}]: already loaded, skipping.")
+        return 0, 0.0
+    if done:
+        print(f"{name} [{key}]: resuming at row {done}/{total}.")
+    start = time.perf_counter()
+    loaded = 0
+    with driver.session() as session:
+        for offset in range(done, total, batch_size):
+            rows = to_rows(frame.iloc[offset:offset + batch_size])
+            # execute_write retries transient errors such as lock deadlocks on shared Movie nodes
+            session.execute_write(loader, rows)
+            loaded += len(rows)
+            write_checkpoint(path, offset + len(rows), total)
+    elapsed = time.perf_counter() - start
+    print(f"{name} [{key}]: {loaded} rows in {elapsed:.2f}s")
+    return loaded, elapsed
+
+def load_parallel(data_dir=DATA_DIR, batch_size=BATCH_SIZE, workers=4, partitions=None,
+                  checkpoint_dir=CHECKPOINT_DIR):
+    """Load every entity across a pool of sessions; return {name: (rows, seconds)}."""
+    partitions = partitions or workers * 4
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    summary = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Entities run in order so movies exist (with titles) before ratings reference them
+        for name, filename, loader, to_rows, read_options in ENTITIES:
+            frame = pd.read_csv(os.path.join(data_dir, filename), **read_options)
+            if name in USER_PARTITIONED:
+                parts = partition_by_user(frame, partitions)
+            else:
+                parts = [('all', frame)]
+            start = time.perf_counter()
+            futures = [
+                pool.submit(load_partition, name, key, part, loader, to_rows, batch_size, checkpoint_dir)
+                for key, part in parts
+            ]
+            loaded = sum(future.result()[0] for future in as_completed(futures))
+            summary[name] = (loaded, time.perf_counter() - start)
+    # Every partition committed, so the next run starts from scratch
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    return summary
+
+# --- Delta Loading ---
+
+MOVIES_RAW_FILE = 'movies.csv'
+
+# (name, raw file, dtypes, chunk cleaner, dedupe, loader); a loader returning a
+# count must have applied every row, or the high-water mark is not advanced
+DELTA_SOURCES = [
+    ('Ratings', 'ratings.csv', RATING_DTYPES, clean_ratings_chunk, dedupe_latest_rating, upsert_ratings),
+    ('Tags', 'tags.csv', TAG_DTYPES, clean_tags_chunk, dedupe_tags, load_tags),
+]
+
+def file_fingerprint(path, block_size=1 << 20):
+    """Size and SHA-1 of a file; an unchanged fingerprint means there is nothing new to load."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return {'size': os.path.getsize(path), 'sha1': digest.hexdigest()}
+
+def read_delta_state(path=DELTA_STATE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def write_delta_state(state, path=DELTA_STATE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+def mark_loaded(raw_dir=RAW_DIR, data_dir=DATA_DIR, state_path=DELTA_STATE_FILE):
+    """Record the high-water marks of a full load, so the next --delta run starts after it."""
+    state = read_delta_state(state_path)
+    movies_path = os.path.join(raw_dir, MOVIES_RAW_FILE)
+    if os.path.exists(movies_path):
+        state['Movies'] = {'fingerprint': file_fingerprint(movies_path), 'loaded_at': int(time.time())}
+    for name, filename, _, _, _, _ in DELTA_SOURCES:
+        raw_path = os.path.join(raw_dir, filename)
+        clean_path = os.path.join(data_dir, os.path.splitext(filename)[0] + '_cleaned.csv')
+        if not os.path.exists(raw_path) or not os.path.exists(clean_path):
+            continue
+        max_timestamp = max((int(chunk['timestamp'].max()) for chunk in
+                             pd.read_csv(clean_path, usecols=['timestamp'], chunksize=1_000_000)), default=-1)
+        state[name] = {'max_timestamp': max_timestamp, 'fingerprint': file_fingerprint(raw_path),
+                       'loaded_at': int(time.time())}
+    write_delta_state(state, state_path)
+
+def load_delta_movies(session, raw_dir, batch_size, state, state_path):
+    """Reload movies.csv when its fingerprint changed; returns (rows, seconds) or None when skipped.
+
+    Movies have no timestamp, so the whole file is MERGEd again, which is
+    idempotent.
+    """
+    path = os.path.join(raw_dir, MOVIES_RAW_FILE)
+    if not os.path.exists(path):
+        print(f"Movies: {path} not found, skipping.")
+        return None
+    fingerprint = file_fingerprint(path)
+    if state.get('Movies', {}).get('fingerprint') == fingerprint:
+        print(f"Movies: {MOVIES_RAW_FILE} unchanged, skipping.")
+        return None
+    start = time.perf_counter()
+    rows = movie_rows(clean_movies_frame(pd.read_csv(path)))
+    for offset in range(0, len(rows), batch_size):
+        session.execute_write(load_movies, rows[offset:offset + batch_size])
+    state['Movies'] = {'fingerprint': fingerprint, 'loaded_at': int(time.time())}
+    write_delta_state(state, state_path)
+    elapsed = time.perf_counter() - start
+    print(f"Movies: {len(rows)} rows reloaded in {elapsed:.2f}s")
+    return len(rows), elapsed
+
+def load_delta(session, raw_dir=RAW_DIR, batch_size=BATCH_SIZE, state_path=DELTA_STATE_FILE, delta_dir=DELTA_DIR):
+    """Clean and load only the raw rows newer than each source's high-water mark.
+
+    Sources whose file fingerprint is unchanged, or that are missing, are
+    skipped. A changed movies.csv is reloaded first, so new ratings find their
+    movies. Ratings are upserted by (user, movie) with apply_ratings, which also
+    updates the movie stats and marks the users for the precompute job; a
+    batch that is not fully applied raises before the mark moves. Each
+    source's delta is kept in `delta_dir` (the ratings one can be passed to
+    build_similarity_index --refresh). Returns ({name: (rows, seconds)},
+    {'users': [...], 'movies': [...]}) with every userId and movieId touched.
+    """
+    state = read_delta_state(state_path)
+    os.makedirs(delta_dir, exist_ok=True)
+    summary = {}
+    touched_users, touched_movies = set(), set()
+    movies = load_delta_movies(session, raw_dir, batch_size, state, state_path)
+    if movies is not None:
+        summary['Movies'] = movies
+    for name, filename, dtypes, clean_chunk, dedupe, loader in DELTA_SOURCES:
+        path = os.path.join(raw_dir, filename)
+        if not os.path.exists(path):
+            print(f"{name}: {path} not found, skipping.")
+            continue
+        fingerprint = file_fingerprint(path)
+        source_state = state.get(name, {})
+        if source_state.get('fingerprint') == fingerprint:
+            print(f"{name}: {filename} unchanged, skipping.")
+            continue
+
+        start = time.perf_counter()
+        since = source_state.get('max_timestamp', -1)
+        delta = clean_delta(path, dtypes, clean_chunk, dedupe, since)
+        delta = delta.sort_values(['userId', 'movieId'], kind='mergesort')
+        for offset in range(0, len(delta), batch_size):
+            rows = delta.iloc[offset:offset + batch_size].to_dict('records')
+            applied = session.execute_write(loader, rows)
+            if applied is not None and applied != len(rows):
+                raise RuntimeError(f"{name}: only {applied} of {len(rows)} rows were applied; "
+                                   f"the high-water mark stays at {since}")
+        elapsed = time.perf_counter() - start
+
+        if len(delta):
+            max_timestamp = int(delta['timestamp'].max())
+            delta.to_csv(os.path.join(delta_dir, f"{name.lower()}_{max(since, 0)}-{max_timestamp}.csv"), index=False)
+            touched_users.update(int(u) for u in delta['userId'].unique())
+            touched_movies.update(int(m) for m in delta['movieId'].unique())
+        else:
+            max_timestamp = since
+        state[name] = {'max_timestamp': max_timestamp, 'fingerprint': fingerprint, 'loaded_at': int(time.time())}
+        # Saved per source, so a failure in a later source does not reload this one
+        write_delta_state(state, state_path)
+        summary[name] = (len(delta), elapsed)
+        print(f"{name}: {len(delta)} rows from {since} on in {elapsed:.2f}s")
+
+    return summary, {'users': sorted(touched_users), 'movies': sorted(touched_movies)}
+
+def print_summary(summary, elapsed):
+    print("\nLoad Summary:")
+    for name, (rows, seconds) in summary.items():
+        rate = rows / seconds if seconds > 0 else 0.0
+        print(f"  {name:<8} {rows:>10} rows  {seconds:>8.2f}s  {rate:>10.0f} rows/s")
+    print(f"  Total time: {elapsed:.2f}s")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Bulk load the cleaned MovieLens CSVs into Neo4j.")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Directory holding the *_cleaned.csv files.")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Rows sent per UNWIND transaction.")
+    parser.add_argument('--skip-constraints', action='store_true', help=f"Do not apply {CONSTRAINTS_FILE} first.")
+    parser.add_argument('--workers', type=int, help="Run the partitioned, resumable pipeline with N sessions.")
+    parser.add_argument('--partitions', type=int, help="userId partitions per entity (default: 4 x workers).")
+    parser.add_argument('--checkpoint-dir', default=CHECKPOINT_DIR, help="Where per-partition checkpoints are kept.")
+    parser.add_argument('--reset', action='store_true', help="Discard existing checkpoints and load from scratch.")
+    parser.add_argument('--stats-only', action='store_true',
+                        help="Skip loading and only refresh the per-movie stats (e.g. after neo4j-admin import).")
+    parser.add_argument('--delta', action='store_true',
+                        help=f"Clean and load only raw ratings/tags in --raw-dir newer than the marks in {DELTA_STATE_FILE}.")
+    parser.add_argument('--raw-dir', default=RAW_DIR, help="Directory of the raw MovieLens CSVs (for --delta).")
+    parser.add_argument('--touched-out', help="With --delta, write the touched userIds and movieIds to this JSON file.")
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    start = time.perf_counter()
+    if args.delta:
+        # apply_ratings keeps the movie stats current, so no refresh afterwards
+        with driver.session() as session:
+            if not args.skip_constraints:
+                apply_constraints(session)
+            summary, touched = load_delta(session, args.raw_dir, args.batch_size)
+            # Loaded users must not be handed out again by the userId allocator
+            session.execute_write(sync_user_id_counter)
+        print(f"Touched {len(touched['users'])} users and {len(touched['movies'])} movies.")
+        if args.touched_out:
+            with open(args.touched_out, 'w') as f:
+                json.dump(touched, f)
+            print(f"Touched ids written to {args.touched_out}")
+    else:
+        with driver.session() as session:
+            if not args.skip_constraints:
+                apply_constraints(session)
+            if args.stats_only:
+                summary = {}
+            elif args.workers is None:
+                summary = load_all(session, args.data_dir, args.batch_size)
+        if args.workers is not None and not args.stats_only:
+            if args.reset:
+                shutil.rmtree(args.checkpoint_dir, ignore_errors=True)
+            summary = load_parallel(args.data_dir, args.batch_size, args.workers, args.partitions, args.checkpoint_dir)
+        with driver.session() as session:
+            refresh_all_movie_stats(session)
+            session.execute_write(sync_user_id_counter)
+        if not args.stats_only:
+            # The cleaned files came from the raw ones, so the next --delta run starts after them
+            mark_loaded(args.raw_dir, args.data_dir)
+    print_summary(summary, time.perf_counter() - start)
+    driver.close()
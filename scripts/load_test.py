@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def build_requests(args):
+    """Random mix of engine and user-management calls."""
+    requests = []
+    for _ in range(args.requests):
+        user_id = random.randint(args.min_user, args.max_user)
+        kind = random.choices(['collaborative', 'context', 'movies', 'likes'], weights=args.mix)[0]
+        if kind == 'collaborative':
+            requests.append((kind, 'GET', f"/users/{user_id}/recommendations/collaborative?limit={args.limit}"))
+        elif kind == 'context':
+            requests.append((kind, 'GET', f"/users/{user_id}/recommendations/context?limit={args.limit}"))
+        elif kind == 'movies':
+            seeds = ','.join(str(m) for m in random.sample(args.movie_ids, min(3, len(args.movie_ids))))
+            requests.append((kind, 'GET', f"/recommendations/movies?ids={seeds}&limit={args.limit}"))
+        else:
+            requests.append((kind, 'GET', f"/users/{user_id}/likes"))
+    return requests
+
+async def worker(session, base_url, queue, results):
+    while True:
+        try:
+            kind, method, path = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        start = time.perf_counter()
+        try:
+            async with session.request(method, base_url + path) as response:
+                await response.read()
+                status = response.status
+        except aiohttp.ClientError:
+            status = 'error'
+        except asyncio.TimeoutError:
+            # Past --timeout, typically an overloaded server; counted, not fatal
+            status = 'timeout'
+        results.append((kind, status, (time.perf_counter() - start) * 1000))
+
+async def run(args):
+    queue = asyncio.Queue()
+    for request in build_requests(args):
+        queue.put_nowait(request)
+    results = []
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(session, args.url, queue, results) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+        async with session.get(args.url + '/metrics') as response:
+            server_metrics = await response.json()
+    return results, elapsed, server_metrics
+
+def print_report(results, elapsed, concurrency):
+    print(f"\n{len(results)} requests, {concurrency} concurrent clients, {elapsed:.2f}s "
+          f"({len(results) / elapsed:.1f} req/s)")
+    print(f"  {'endpoint':<14} {'count':>6} {'errors':>7} {'timeouts':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for kind in sorted({r[0] for r in results}) + ['all']:
+        rows = [r for r in results if kind in ('all', r[0])]
+        latencies = [r[2] for r in rows]
+        timeouts = sum(1 for r in rows if r[1] == 'timeout')
+        errors = sum(1 for r in rows if r[1] == 'error' or (isinstance(r[1], int) and r[1] >= 400))
+        print(f"  {kind:<14} {len(rows):>6} {errors:>7} {timeouts:>9} {percentile(latencies, 0.5):>9.1f} "
+              f"{percentile(latencies, 0.99):>9.1f}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Concurrent load test for server.py.")
+    parser.add_argument('--url', default='http://localhost:8080')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--min-user', type=int, default=1)
+    parser.add_argument('--max-user', type=int, default=610)
+    parser.add_argument('--movie-ids', type=int, nargs='+', default=[1, 2, 32, 50, 260, 296, 318, 356, 480, 593])
+    parser.add_argument('--mix', type=float, nargs=4, default=[1, 1, 1, 1],
+                        metavar=('COLLAB', 'CONTEXT', 'MOVIES', 'LIKES'), help="Relative weight of each endpoint.")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Client-side timeout per request (s).")
+    parser.add_argument('--json', help="Also write the raw server metrics to this file.")
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    results, elapsed, server_metrics = asyncio.run(run(args))
+    print_report(results, elapsed, args.concurrency)
+    print("\nServer-side latency (/metrics):")
+    for route, stats in sorted(server_metrics['routes'].items()):
+        print(f"  {route:<48} n={stats['count']:<6} p50 {stats['p50_ms']:.1f} ms  p99 {stats['p99_ms']:.1f} ms")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(server_metrics, f, indent=2)
@@ -0,0 +1,137 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from neo4j import GraphDatabase
+from dotenv import load_dotenv
+
+from engine.batch_recommendations import iter_collaborative_recommendations, iter_context_recommendations
+from engine.cold_start import cold_start_from_env
+from engine.collaborative_recommendations import budget_from_env
+
+load_dotenv()
+
+# engine name -> (batch engine function, score column)
+ENGINES = {
+    'collaborative': (iter_collaborative_recommendations, 'score'),
+    'context': (iter_context_recommendations, 'finalScore'),
+}
+
+# One driver and cold-start tier per worker process, created by init_worker
+driver = None
+cold_start = None
+
+def create_driver():
+    uri = os.getenv('DB_URI')
+    user = os.getenv('DB_USER')
+    password = os.getenv('DB_PASSWORD')
+    if not uri or not user or not password:
+        raise ValueError('Missing Environment Variables')
+    return GraphDatabase.driver(uri, auth=(user, password))
+
+def init_worker():
+    global driver, cold_start
+    driver = create_driver()
+    # Rankings load once per worker, in its first read transaction
+    cold_start = cold_start_from_env()
+
+def get_users_to_compute(tx, recompute_all):
+    """Users never computed, or whose likes/ratings changed since their last computation."""
+    result = tx.run(
+        """
+        MATCH (u:User)
+        WHERE $recompute_all
+           OR u.recommendationsComputedAt IS NULL
+           // Both are whole seconds and computed_at is taken before the reads, so an
+           // interaction in that same second may not be in the stored lists yet
+           OR u.lastInteractionAt >= u.recommendationsComputedAt
+        RETURN u.userId AS userId
+        ORDER BY userId
+        """,
+        recompute_all=recompute_all
+    )
+    return [record["userId"] for record in result]
+
+def write_recommendations(tx, user_ids, rows, engines, computed_at):
+    """Replace the users' RECOMMENDED edges for `engines` and stamp recommendationsComputedAt."""
+    tx.run(
+        """
+        UNWIND $user_ids AS userId
+        MATCH (u:User {userId: userId})-[old:RECOMMENDED]->()
+        WHERE old.engine IN $engines
+        DELETE old
+        """,
+        user_ids=user_ids,
+        engines=engines
+    )
+    tx.run(
+        """
+        UNWIND $rows AS row
+        MATCH (u:User {userId: row.userId})
+        MATCH (m:Movie {movieId: row.movieId})
+        CREATE (u)-[:RECOMMENDED {rank: row.rank, score: row.score, engine: row.engine, computedAt: $computed_at}]->(m)
+        """,
+        rows=rows,
+        computed_at=computed_at
+    )
+    tx.run(
+        """
+        UNWIND $user_ids AS userId
+        MATCH (u:User {userId: userId})
+        SET u.recommendationsComputedAt = $computed_at
+        """,
+        user_ids=user_ids,
+        computed_at=computed_at
+    )
+
+def compute_shard(user_ids, engines, limit):
+    """Compute top-N lists for a shard of users (one query per engine) and write them back in one transaction."""
+    computed_at = int(time.time())
+    rows = []
+    with driver.session() as session:
+        for engine in engines:
+            recommend, score_key = ENGINES[engine]
+            # Only the collaborative engine has a path-query budget
+            budget = budget_from_env() if engine == 'collaborative' else {}
+            for user_id, recommendations in recommend(session, user_ids, limit, chunk_size=len(user_ids),
+                                                      explain=False, cold_start=cold_start, **budget):
+                for rank, rec in enumerate(recommendations, 1):
+                    rows.append({"userId": user_id, "movieId": rec["movieId"], "rank": rank,
+                                 "score": float(rec[score_key]), "engine": engine})
+        session.execute_write(write_recommendations, user_ids, rows, engines, computed_at)
+    return len(user_ids), len(rows)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Precompute top-N recommendations for every user.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes, each with its own driver.")
+    parser.add_argument('--shard-size', type=int, default=50, help="Users per task (and per write transaction).")
+    parser.add_argument('--limit', type=int, default=10, help="Recommendations kept per user and engine.")
+    parser.add_argument('--engines', nargs='+', choices=list(ENGINES), default=list(ENGINES))
+    parser.add_argument('--all', action='store_true', help="Recompute every user, not only changed ones.")
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    main_driver = create_driver()
+    with main_driver.session() as session:
+        user_ids = session.execute_read(get_users_to_compute, args.all)
+    main_driver.close()
+    print(f"{len(user_ids)} users to compute with {args.workers} workers.")
+
+    start = time.perf_counter()
+    done = 0
+    written = 0
+    shards = [user_ids[i:i + args.shard_size] for i in range(0, len(user_ids), args.shard_size)]
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as pool:
+        futures = [pool.submit(compute_shard, shard, args.engines, args.limit) for shard in shards]
+        for future in as_completed(futures):
+            users, rows = future.result()
+            done += users
+            written += rows
+            elapsed = time.perf_counter() - start
+            print(f"{done}/{len(user_ids)} users ({done / elapsed:.1f} users/s)")
+
+    elapsed = time.perf_counter() - start
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"Computed {done} users ({written} RECOMMENDED edges) in {elapsed:.2f}s ({rate:.1f} users/s)")
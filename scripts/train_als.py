@@ -0,0 +1,47 @@
+import argparse
+import os
+import time
+
+from neo4j import GraphDatabase
+from dotenv import load_dotenv
+
+from engine.als_recommendations import ALSModel, MODEL_DIR
+from engine.sparse_collaborative import SparseRatingMatrix
+
+load_dotenv()
+
+RATINGS_FILE = './data/clean/ratings_cleaned.csv'
+MOVIES_FILE = './data/clean/movies_cleaned.csv'
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train ALS user and movie factors.")
+    parser.add_argument('--ratings', default=RATINGS_FILE, help="Cleaned ratings CSV.")
+    parser.add_argument('--from-graph', action='store_true', help="Read the RATED edges from Neo4j instead.")
+    parser.add_argument('--out', default=MODEL_DIR, help="Directory the .npy factors are written to.")
+    parser.add_argument('--factors', type=int, default=64)
+    parser.add_argument('--iterations', type=int, default=15)
+    parser.add_argument('--reg', type=float, default=0.1, help="L2 regularization.")
+    parser.add_argument('--implicit', action='store_true', help="Treat ratings as confidence weights.")
+    parser.add_argument('--alpha', type=float, default=40.0, help="Confidence scale for --implicit.")
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    start = time.perf_counter()
+    if args.from_graph:
+        uri, user, password = os.getenv('DB_URI'), os.getenv('DB_USER'), os.getenv('DB_PASSWORD')
+        if not uri or not user or not password:
+            raise ValueError('Missing Environment Variables')
+        driver = GraphDatabase.driver(uri, auth=(user, password))
+        with driver.session() as session:
+            matrix = session.execute_read(SparseRatingMatrix.from_graph)
+        driver.close()
+    else:
+        matrix = SparseRatingMatrix.from_csv(args.ratings, MOVIES_FILE)
+    print(f"Training on {matrix.ratings.nnz} ratings from {len(matrix.user_ids)} users "
+          f"and {len(matrix.movie_ids)} movies.")
+
+    model = ALSModel.train(matrix, args.factors, args.iterations, args.reg, args.implicit, args.alpha, args.seed)
+    model.save(args.out)
+    print(f"ALS factors written to {args.out} in {time.perf_counter() - start:.2f}s ({model.meta})")
@@ -23,6 +23,12 @@ def print_recommendations(recommendations, rec_type):
             for path_type, paths in rec["explanations"]["path_descriptions"].items():
                 for path in paths:
                     print(f"    - {path}")
+        elif rec_type == "ALS":
+            print(f"  Average Rating: {rec['avg_rating']:.2f}/5")
+            print(f"  Score: {rec['score']:.2f}")
+            print("  Explanation:")
+            for path in rec["path_descriptions"]:
+                print(f"    - {path}")
         elif rec_type == "Movie ID-Based":
             print(f"  Average Rating: {rec['avg_rating']:.2f}/5")
             print(f"  Common Users: {rec['common_count']}")
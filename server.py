@@ -0,0 +1,498 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+
+from aiohttp import web
+from neo4j import AsyncGraphDatabase, GraphDatabase
+from dotenv import load_dotenv
+
+from engine.cold_start import cold_start_from_env
+from engine.collaborative_recommendations import (
+    BOUNDED_COLLABORATIVE_QUERY, COLLABORATIVE_QUERY, COLLABORATIVE_EXPLANATION_QUERY, budget_from_env, budget_params,
+    format_collaborative_records,
+    format_cold_start_records as format_collaborative_cold_start
+)
+from engine.context_recommendation import (
+    CONTEXT_QUERY, CONTEXT_EXPLANATION_QUERY, format_context_records,
+    format_cold_start_records as format_context_cold_start
+)
+from engine.additional_recommendation import (
+    BOUNDED_MOVIE_IDS_QUERY, MOVIE_IDS_QUERY, MOVIE_IDS_EXPLANATION_QUERY, format_movie_id_records
+)
+from engine.instrumentation import METRICS, async_run_query
+from engine.interaction_queue import InteractionQueue, QueueFull, WAL_PATH, check_id
+from engine.item_similarity import SimilarityIndex, INDEX_DIR, recommend_from_index
+from engine.movie_stats import APPLY_RATINGS_QUERY, POPULARITY_DECAY, latest_rating_rows
+from engine.new_user_recommendation import (
+    ADD_LIKE_QUERY, REMOVE_LIKE_QUERY, LIKED_MOVIES_QUERY, CREATE_USER_QUERY, ALLOCATE_USER_IDS_QUERY,
+    INIT_USER_ID_COUNTER_QUERY, rating_row
+)
+from engine.recommendation_cache import RecommendationCache
+
+load_dotenv()
+
+ENGINES = ['collaborative', 'context', 'movie_ids', 'users']
+LATENCY_WINDOW = 10000
+USER_ID_BLOCK_SIZE = 100
+
+
+class Neo4jBackend:
+    """Runs the engine queries through the async driver."""
+
+    def __init__(self, driver, similarity_index=None, cold_start=None, max_neighbors=None,
+                 max_coraters_per_movie=None):
+        self.driver = driver
+        self.similarity_index = similarity_index
+        self.cold_start = cold_start
+        # Path-query budget; the BOUNDED_* queries run when either is set
+        self.bounded = max_neighbors is not None or max_coraters_per_movie is not None
+        self.budget = budget_params(max_neighbors, max_coraters_per_movie)
+        self._user_ids = iter(())
+        self._user_ids_lock = asyncio.Lock()
+
+    async def _read(self, name, query, formatter, **params):
+        async def work(tx):
+            return formatter(await async_run_query(tx, name, query, **params))
+        async with self.driver.session() as session:
+            return await session.execute_read(work)
+
+    async def _recommend(self, name, query, explanation_query, formatter, cold_formatter=None, **params):
+        """Rank with `query`, then fetch explanation tuples for the top-N in the same transaction.
+
+        With a `cold_formatter` and a ColdStartTier, users below its threshold
+        are served from the tier without running `query`.
+        """
+        async def work(tx):
+            if cold_formatter is not None and self.cold_start is not None:
+                cold = await self.cold_start.recommend_async(tx, params['userId'], params['limit'])
+                if cold is not None:
+                    return cold_formatter(cold)
+            records = await async_run_query(tx, name, query, **params)
+            explanations = []
+            if records:
+                explanations = await async_run_query(tx, f'{name}_explain', explanation_query,
+                                                     candidate_ids=[record["movieId"] for record in records],
+                                                     **params)
+            return formatter(records, explanations)
+        async with self.driver.session() as session:
+            return await session.execute_read(work)
+
+    async def _write(self, work, *args):
+        async with self.driver.session() as session:
+            return await session.execute_write(work, *args)
+
+    async def collaborative(self, user_id, limit):
+        if self.bounded:
+            return await self._recommend('collaborative_bounded', BOUNDED_COLLABORATIVE_QUERY,
+                                         COLLABORATIVE_EXPLANATION_QUERY, format_collaborative_records,
+                                         format_collaborative_cold_start, userId=user_id, limit=limit, **self.budget)
+        return await self._recommend('collaborative', COLLABORATIVE_QUERY, COLLABORATIVE_EXPLANATION_QUERY,
+                                     format_collaborative_records, format_collaborative_cold_start,
+                                     userId=user_id, limit=limit)
+
+    async def context(self, user_id, limit):
+        return await self._recommend('context', CONTEXT_QUERY, CONTEXT_EXPLANATION_QUERY,
+                                     format_context_records, format_context_cold_start,
+                                     userId=user_id, limit=limit)
+
+    async def movie_ids(self, movie_ids, limit):
+        if self.similarity_index is not None:
+            return recommend_from_index(self.similarity_index, movie_ids, limit)
+        if self.bounded:
+            return await self._recommend('movie_ids_bounded', BOUNDED_MOVIE_IDS_QUERY, MOVIE_IDS_EXPLANATION_QUERY,
+                                         format_movie_id_records, movie_ids=movie_ids, limit=limit, **self.budget)
+        return await self._recommend('movie_ids', MOVIE_IDS_QUERY, MOVIE_IDS_EXPLANATION_QUERY,
+                                     format_movie_id_records, movie_ids=movie_ids, limit=limit)
+
+    async def liked_movies(self, user_id):
+        return await self._read('liked_movies', LIKED_MOVIES_QUERY, lambda records: [r.data() for r in records], user_id=user_id)
+
+    async def _next_user_id(self):
+        """Take a userId from the current block, reserving a new block from the counter when it runs out."""
+        async def allocate(tx):
+            records = await async_run_query(tx, 'allocate_user_ids', ALLOCATE_USER_IDS_QUERY, size=USER_ID_BLOCK_SIZE)
+            if not records:
+                await async_run_query(tx, 'init_user_id_counter', INIT_USER_ID_COUNTER_QUERY)
+                records = await async_run_query(tx, 'allocate_user_ids', ALLOCATE_USER_IDS_QUERY,
+                                                size=USER_ID_BLOCK_SIZE)
+            return range(records[0]["first"], records[0]["last"] + 1)
+
+        async with self._user_ids_lock:
+            user_id = next(self._user_ids, None)
+            if user_id is None:
+                self._user_ids = iter(await self._write(allocate))
+                user_id = next(self._user_ids)
+            return user_id
+
+    async def create_user(self):
+        new_user_id = await self._next_user_id()
+
+        async def work(tx):
+            await async_run_query(tx, 'create_user', CREATE_USER_QUERY, user_id=new_user_id)
+            return new_user_id
+        return await self._write(work)
+
+    async def add_like(self, user_id, movie_id):
+        async def work(tx):
+            records = await async_run_query(tx, 'add_like', ADD_LIKE_QUERY, user_id=user_id, movie_id=movie_id,
+                                            now=int(time.time()), decay=POPULARITY_DECAY)
+            return bool(records)
+        return await self._write(work)
+
+    async def remove_like(self, user_id, movie_id):
+        async def work(tx):
+            await async_run_query(tx, 'remove_like', REMOVE_LIKE_QUERY, user_id=user_id, movie_id=movie_id,
+                                  now=int(time.time()), decay=POPULARITY_DECAY)
+            return True
+        return await self._write(work)
+
+    async def rate(self, user_id, movie_id, rating):
+        async def work(tx):
+            records = await async_run_query(tx, 'apply_ratings', APPLY_RATINGS_QUERY,
+                                            rows=latest_rating_rows([rating_row(user_id, movie_id, rating)]),
+                                            now=int(time.time()), decay=POPULARITY_DECAY)
+            return bool(records and records[0]["written"])
+        return await self._write(work)
+
+    async def close(self):
+        if self.cold_start is not None:
+            self.cold_start.close()
+            self.cold_start.driver.close()
+        await self.driver.close()
+
+
+class StubBackend:
+    """In-process stand-in that sleeps `latency` seconds and returns engine-shaped records.
+
+    Lets the HTTP layer, pool limits and timeouts be load tested without Neo4j.
+    """
+
+    def __init__(self, latency=0.005):
+        self.latency = latency
+        self.likes = {}
+
+    async def _records(self, limit):
+        await asyncio.sleep(self.latency)
+        return [{"movieId": i, "title": f"Movie {i}", "avg_rating": 4.0, "common_count": 10,
+                 "score": 4.0 - i * 0.1, "path_descriptions": []} for i in range(1, limit + 1)]
+
+    async def collaborative(self, user_id, limit):
+        return await self._records(limit)
+
+    async def context(self, user_id, limit):
+        await asyncio.sleep(self.latency)
+        return [{"movieId": i, "title": f"Movie {i}", "avgRating": 4.0, "ratingCount": 10, "finalScore": 2.0,
+                 "explanations": {"matched_genres": [], "matched_tags": [], "path_descriptions": {}}}
+                for i in range(1, limit + 1)]
+
+    async def movie_ids(self, movie_ids, limit):
+        return await self._records(limit)
+
+    async def liked_movies(self, user_id):
+        await asyncio.sleep(self.latency)
+        return [{"movieId": m, "title": f"Movie {m}"} for m in sorted(self.likes.get(user_id, ()))]
+
+    async def create_user(self):
+        await asyncio.sleep(self.latency)
+        return random.randint(1000, 9999)
+
+    async def add_like(self, user_id, movie_id):
+        await asyncio.sleep(self.latency)
+        self.likes.setdefault(user_id, set()).add(movie_id)
+        return True
+
+    async def remove_like(self, user_id, movie_id):
+        await asyncio.sleep(self.latency)
+        self.likes.get(user_id, set()).discard(movie_id)
+        return True
+
+    async def rate(self, user_id, movie_id, rating):
+        await asyncio.sleep(self.latency)
+        return True
+
+    async def close(self):
+        pass
+
+
+class RecommendationService:
+    """Per-engine concurrency limits, timeouts, caching and latency tracking."""
+
+    def __init__(self, backend, concurrency=8, timeout=10.0, cache=None, interactions=None):
+        self.backend = backend
+        self.timeout = timeout
+        self.cache = cache
+        self.interactions = interactions
+        self.limits = {engine: asyncio.Semaphore(concurrency) for engine in ENGINES}
+        self.latencies = {}
+
+    async def _limited(self, engine, call):
+        async with self.limits[engine]:
+            return await call()
+
+    async def run(self, engine, call):
+        """Run call() under the engine's semaphore; the timeout covers queueing too."""
+        return await asyncio.wait_for(self._limited(engine, call), self.timeout)
+
+    async def recommend(self, engine, subject, limit, call, user_id=None):
+        if self.cache is None:
+            return await self.run(engine, call)
+        key = self.cache.make_key(engine, subject, limit)
+        found, value = self.cache.get(key)
+        if found:
+            return value
+        value = await self.run(engine, call)
+        if value:
+            self.cache.put(key, value, user_id)
+        return value
+
+    def invalidate(self, user_id):
+        if self.cache is not None:
+            self.cache.invalidate_user(user_id)
+
+    def record_latency(self, route, seconds):
+        self.latencies.setdefault(route, deque(maxlen=LATENCY_WINDOW)).append(seconds * 1000)
+
+    def metrics(self):
+        routes = {}
+        for route, samples in self.latencies.items():
+            ordered = sorted(samples)
+            routes[route] = {
+                "count": len(ordered),
+                "p50_ms": ordered[len(ordered) // 2],
+                "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+            }
+        return {"routes": routes, "cache": self.cache.stats() if self.cache else None, "queries": METRICS.snapshot(),
+                "interactions": self.interactions.stats() if self.interactions else None}
+
+
+def json_response(data, status=200):
+    return web.json_response(data, status=status, dumps=lambda value: json.dumps(value, default=str))
+
+
+@web.middleware
+async def error_middleware(request, handler):
+    service = request.app['service']
+    start = time.perf_counter()
+    try:
+        return await handler(request)
+    except web.HTTPException:
+        raise
+    except (ValueError, KeyError) as e:
+        return json_response({"error": f"Invalid request: {e}"}, status=400)
+    except asyncio.TimeoutError:
+        return json_response({"error": "Request timed out"}, status=504)
+    except QueueFull:
+        return json_response({"error": "Too many pending interactions"}, status=503)
+    except Exception as e:
+        print(f"Request failed for {request.path}: {e}")
+        return json_response({"error": "Internal server error"}, status=500)
+    finally:
+        route = request.match_info.route.resource
+        # One key for every unmatched path, so 404 scans cannot grow the metrics
+        service.record_latency(route.canonical if route else 'unmatched', time.perf_counter() - start)
+
+
+def get_limit(request):
+    limit = int(request.query.get('limit', 10))
+    if not 1 <= limit <= 100:
+        raise ValueError("limit must be between 1 and 100")
+    return limit
+
+
+def match_id(request, key):
+    """An integer path parameter; values Neo4j cannot store raise ValueError (400)."""
+    return check_id(key, int(request.match_info[key]))
+
+
+async def collaborative_handler(request):
+    service = request.app['service']
+    user_id, limit = match_id(request, 'user_id'), get_limit(request)
+    records = await service.recommend('collaborative', user_id, limit,
+                                      lambda: service.backend.collaborative(user_id, limit), user_id=user_id)
+    return json_response({"userId": user_id, "recommendations": records})
+
+
+async def context_handler(request):
+    service = request.app['service']
+    user_id, limit = match_id(request, 'user_id'), get_limit(request)
+    records = await service.recommend('context', user_id, limit,
+                                      lambda: service.backend.context(user_id, limit), user_id=user_id)
+    return json_response({"userId": user_id, "recommendations": records})
+
+
+async def movie_ids_handler(request):
+    service = request.app['service']
+    movie_ids = [check_id('ids', int(id.strip())) for id in request.query.get('ids', '').split(',') if id.strip()]
+    if not movie_ids:
+        raise ValueError("ids must list at least one movieId")
+    limit = get_limit(request)
+    records = await service.recommend('movie_ids', movie_ids, limit,
+                                      lambda: service.backend.movie_ids(movie_ids, limit))
+    return json_response({"movieIds": movie_ids, "recommendations": records})
+
+
+async def create_user_handler(request):
+    service = request.app['service']
+    user_id = await service.run('users', service.backend.create_user)
+    return json_response({"userId": user_id}, status=201)
+
+
+async def liked_movies_handler(request):
+    service = request.app['service']
+    user_id = match_id(request, 'user_id')
+    movies = await service.run('users', lambda: service.backend.liked_movies(user_id))
+    return json_response({"userId": user_id, "likedMovies": movies})
+
+
+async def add_like_handler(request):
+    service = request.app['service']
+    user_id, movie_id = match_id(request, 'user_id'), match_id(request, 'movie_id')
+    if service.interactions is not None:
+        service.interactions.like(user_id, movie_id, timeout=0)
+        return json_response({"userId": user_id, "movieId": movie_id, "liked": True, "queued": True}, status=202)
+    found = await service.run('users', lambda: service.backend.add_like(user_id, movie_id))
+    service.invalidate(user_id)
+    if not found:
+        return json_response({"error": "User or movie not found"}, status=404)
+    return json_response({"userId": user_id, "movieId": movie_id, "liked": True})
+
+
+async def remove_like_handler(request):
+    service = request.app['service']
+    user_id, movie_id = match_id(request, 'user_id'), match_id(request, 'movie_id')
+    if service.interactions is not None:
+        service.interactions.unlike(user_id, movie_id, timeout=0)
+        return json_response({"userId": user_id, "movieId": movie_id, "liked": False, "queued": True}, status=202)
+    await service.run('users', lambda: service.backend.remove_like(user_id, movie_id))
+    service.invalidate(user_id)
+    return json_response({"userId": user_id, "movieId": movie_id, "liked": False})
+
+
+async def rate_handler(request):
+    service = request.app['service']
+    user_id, movie_id = match_id(request, 'user_id'), match_id(request, 'movie_id')
+    rating = float((await request.json())['rating'])
+    if not 0 <= rating <= 5:
+        raise ValueError("rating must be between 0 and 5")
+    if service.interactions is not None:
+        service.interactions.rate(user_id, movie_id, rating, timeout=0)
+        return json_response({"userId": user_id, "movieId": movie_id, "rating": rating, "queued": True}, status=202)
+    found = await service.run('users', lambda: service.backend.rate(user_id, movie_id, rating))
+    service.invalidate(user_id)
+    if not found:
+        return json_response({"error": "User or movie not found"}, status=404)
+    return json_response({"userId": user_id, "movieId": movie_id, "rating": rating})
+
+
+async def metrics_handler(request):
+    if request.query.get('format') == 'prometheus':
+        return web.Response(text=METRICS.to_prometheus(), content_type='text/plain')
+    return json_response(request.app['service'].metrics())
+
+
+async def health_handler(request):
+    return json_response({"status": "ok"})
+
+
+def create_backend(args):
+    if args.stub:
+        return StubBackend(args.stub_latency_ms / 1000)
+    uri = os.getenv('DB_URI')
+    user = os.getenv('DB_USER')
+    password = os.getenv('DB_PASSWORD')
+    if not uri or not user or not password:
+        raise ValueError('Missing Environment Variables')
+    driver = AsyncGraphDatabase.driver(
+        uri,
+        auth=(user, password),
+        max_connection_pool_size=int(os.getenv('NEO4J_POOL_SIZE', '50')),
+        connection_acquisition_timeout=float(os.getenv('NEO4J_ACQUISITION_TIMEOUT', '5')),
+        max_connection_lifetime=int(os.getenv('NEO4J_MAX_CONNECTION_LIFETIME', '3600')),
+    )
+    similarity_index = None
+    if os.getenv('MOVIE_RECOMMENDATION_MODE', 'live') == 'index':
+        similarity_index = SimilarityIndex.load(os.getenv('SIMILARITY_INDEX_DIR', INDEX_DIR))
+    # The cold-start tier refreshes its rankings through its own sync driver
+    cold_start = cold_start_from_env(lambda: GraphDatabase.driver(uri, auth=(user, password)))
+    return Neo4jBackend(driver, similarity_index, cold_start, **budget_from_env())
+
+
+def create_interaction_queue(cache):
+    """Write-behind queue for likes and ratings when WRITE_BEHIND=1; it writes through its own sync driver."""
+    if os.getenv('WRITE_BEHIND', '0') != '1':
+        return None
+    driver = GraphDatabase.driver(os.getenv('DB_URI'), auth=(os.getenv('DB_USER'), os.getenv('DB_PASSWORD')))
+
+    def invalidate_users(user_ids):
+        if cache is not None:
+            for user_id in user_ids:
+                cache.invalidate_user(user_id)
+
+    return InteractionQueue(
+        driver,
+        wal_path=os.getenv('WAL_PATH', WAL_PATH),
+        max_pending=int(os.getenv('WRITE_MAX_PENDING', '10000')),
+        batch_size=int(os.getenv('WRITE_BATCH_SIZE', '500')),
+        flush_interval=float(os.getenv('WRITE_FLUSH_INTERVAL', '1.0')),
+        on_flush=invalidate_users
+    ).start()
+
+
+def create_app(args):
+    app = web.Application(middlewares=[error_middleware])
+
+    async def on_startup(app):
+        cache = None
+        if int(os.getenv('CACHE_SIZE', '1024')) > 0:
+            cache = RecommendationCache(max_size=int(os.getenv('CACHE_SIZE', '1024')),
+                                        ttl=int(os.getenv('CACHE_TTL', '300')))
+        backend = create_backend(args)
+        app['service'] = RecommendationService(
+            backend,
+            concurrency=int(os.getenv('ENGINE_CONCURRENCY', '8')),
+            timeout=float(os.getenv('REQUEST_TIMEOUT', '10')),
+            cache=cache,
+            interactions=None if args.stub else create_interaction_queue(cache),
+        )
+
+    async def on_cleanup(app):
+        interactions = app['service'].interactions
+        if interactions is not None:
+            # close() joins the flusher, which drains the queue first
+            await asyncio.get_running_loop().run_in_executor(None, interactions.close)
+            interactions.driver.close()
+        await app['service'].backend.close()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.add_routes([
+        web.get('/health', health_handler),
+        web.get('/metrics', metrics_handler),
+        web.get('/users/{user_id}/recommendations/collaborative', collaborative_handler),
+        web.get('/users/{user_id}/recommendations/context', context_handler),
+        web.get('/recommendations/movies', movie_ids_handler),
+        web.post('/users', create_user_handler),
+        web.get('/users/{user_id}/likes', liked_movies_handler),
+        web.put('/users/{user_id}/likes/{movie_id}', add_like_handler),
+        web.delete('/users/{user_id}/likes/{movie_id}', remove_like_handler),
+        web.put('/users/{user_id}/ratings/{movie_id}', rate_handler),
+    ])
+    return app
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="HTTP recommendation service.")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--stub', action='store_true', help="Serve canned results instead of querying Neo4j.")
+    parser.add_argument('--stub-latency-ms', type=float, default=5.0, help="Simulated backend latency for --stub.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    web.run_app(create_app(args), host=args.host, port=args.port)